@@ -1,8 +1,14 @@
 from fastapi import HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
 from app import models
+from app.crud.pagination import PAGE_SIZE, paginate
+from app.crud.serialization import to_dict
+from app.database import awaitable
 from app.schemas import contents
+from app.services.links import canonicalize_link
 
 
 def get_content(content_id: int, db: Session):
@@ -10,30 +16,126 @@ def get_content(content_id: int, db: Session):
 
 
 def get_content_by_link(link: str, db: Session):
-    return db.query(models.Content).filter(models.Content.link == link).first()
+    return (
+        db.query(models.Content)
+        .filter(models.Content.canonical_link == canonicalize_link(link))
+        .first()
+    )
 
 
 def get_content_by_title(title: str, db: Session):
     return db.query(models.Content).filter(models.Content.title == title).first()
 
 
-def get_contents(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Content).offset(skip).limit(limit).all()
+def get_contents(
+    db: Session, limit: int = PAGE_SIZE, cursor: str | None = None
+) -> tuple[list[models.Content], str | None]:
+    return paginate(select(models.Content), [models.Content.id], db, limit, cursor)
+
+
+def __content_row__(content: contents.ContentBase, source: str) -> dict:
+    return {
+        "title": content.title,
+        "snippet": content.snippet,
+        "link": content.link,
+        "canonical_link": canonicalize_link(content.link),
+        "source": source,
+        "long_description": content.long_description,
+        "image": content.image,
+    }
+
+
+def __upsert_contents__(rows: list[dict], db: Session) -> dict[str, models.Content]:
+    """INSERT ... ON CONFLICT (canonical_link) DO UPDATE, keyed by canonical link.
+
+    Rows sharing a canonical link are collapsed first, since one statement
+    cannot update the same row twice. Existing contents get the latest
+    metadata and keep their id.
+    """
+    unique_rows = list({row["canonical_link"]: row for row in reversed(rows)}.values())
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(models.Content)
+    statement = statement.on_conflict_do_update(
+        index_elements=[models.Content.canonical_link],
+        set_={
+            column: statement.excluded[column]
+            for column in ("title", "snippet", "link", "long_description", "image")
+        },
+    ).returning(models.Content)
+    db_contents = db.scalars(
+        statement, unique_rows, execution_options={"populate_existing": True}
+    ).all()
+    return {content.canonical_link: content for content in db_contents}
 
 
 def create_content(content: contents.ContentCreate, source: str, db: Session):
     try:
-        db_content = models.Content(
-            title=content.title,
-            snippet=content.snippet,
-            link=content.link,
-            source=source,
-            long_description=content.long_description,
-            image=content.image,
-        )
-        db.add(db_content)
+        row = __content_row__(content, source)
+        db_content = __upsert_contents__([row], db)[row["canonical_link"]]
         db.commit()
         db.refresh(db_content)
         return db_content
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
+
+
+def create_contents_with_response_prompts(
+    prompt_id: int,
+    subjects: list[tuple[str, str, list[contents.ContentCreate]]],
+    db: Session,
+) -> list[list[dict]]:
+    """Store every search result of a prompt in a single transaction.
+
+    ``subjects`` holds ``(ai_response_subject, ai_response_description,
+    contents)`` tuples. All contents are upserted on their canonical link with
+    one multi-row INSERT ... ON CONFLICT ... RETURNING and all response_prompts
+    are written with one executemany, then committed once. Results already in
+    the table point at the existing row. Contents come back grouped like
+    ``subjects``, as ``Content`` shaped dicts.
+    """
+    subject_rows = [
+        [__content_row__(content, content.source) for content in subject_contents]
+        for _, _, subject_contents in subjects
+    ]
+    if not any(subject_rows):
+        return [[] for _ in subjects]
+    try:
+        db_contents = __upsert_contents__(
+            [row for rows in subject_rows for row in rows], db
+        )
+
+        grouped_contents = []
+        response_prompt_rows = []
+        for (subject, description, _), rows in zip(subjects, subject_rows):
+            subject_db_contents = [db_contents[row["canonical_link"]] for row in rows]
+            # Read before the commit expires them, so no refresh is needed.
+            grouped_contents.append(
+                [to_dict(content, contents.Content) for content in subject_db_contents]
+            )
+            response_prompt_rows.extend(
+                {
+                    "prompt_id": prompt_id,
+                    "content_id": content.id,
+                    "ai_response_subject": subject,
+                    "ai_response_description": description,
+                }
+                for content in subject_db_contents
+            )
+        db.execute(insert(models.ResponsePrompt), response_prompt_rows)
+        db.commit()
+        return grouped_contents
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Awaitable versions for routes running on an AsyncSession.
+async_get_content = awaitable(get_content)
+async_get_content_by_link = awaitable(get_content_by_link)
+async_get_content_by_title = awaitable(get_content_by_title)
+async_get_contents = awaitable(get_contents)
+async_create_content = awaitable(create_content)
+async_create_contents_with_response_prompts = awaitable(
+    create_contents_with_response_prompts
+)
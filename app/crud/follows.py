@@ -1,8 +1,13 @@
 from fastapi import HTTPException
+from sqlalchemy import delete, desc, func, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app import models
+from app.crud.pagination import decode_cursor, encode_cursor
+from app.database import awaitable
 from app.schemas.follows import FollowCreate
+from app.schemas.users import UserSummary
 
 
 def get_follows_by_user_id(user_id: int, db: Session):
@@ -13,6 +18,130 @@ def get_followers_by_user_id(user_id: int, db: Session):
     return db.query(models.Follows).filter(models.Follows.follow_id == user_id).all()
 
 
+def __users_page__(
+    user_id_column,
+    listed_id_column,
+    user_id: int,
+    db: Session,
+    limit: int,
+    cursor: str | None,
+    usernames_only: bool,
+) -> tuple[list, str | None]:
+    listed = (
+        (models.User.id, models.User.username) if usernames_only else (models.User,)
+    )
+    query = (
+        select(*listed, models.Follows.created_at, models.Follows.id)
+        .join(models.Follows, listed_id_column == models.User.id)
+        .where(user_id_column == user_id)
+        .order_by(desc(models.Follows.created_at), desc(models.Follows.id))
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        query = query.where(
+            tuple_(models.Follows.created_at, models.Follows.id) < decode_cursor(cursor)
+        )
+    rows = db.execute(query).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        *_, created_at, follow_id = rows[limit - 1]
+        next_cursor = encode_cursor(created_at, follow_id)
+    if usernames_only:
+        return [
+            UserSummary(id=row.id, username=row.username) for row in rows[:limit]
+        ], next_cursor
+    return [row[0] for row in rows[:limit]], next_cursor
+
+
+def get_followed_users(
+    user_id: int,
+    db: Session,
+    limit: int = 50,
+    cursor: str | None = None,
+    usernames_only: bool = False,
+) -> tuple[list, str | None]:
+    """Return a page of the users ``user_id`` follows, latest follows first.
+
+    Users come joined to their follows in one query, keyset-paginated on the
+    follow's (created_at, id). With ``usernames_only`` only ``id`` and
+    ``username`` are loaded, as ``UserSummary`` items. Returns the page and
+    the next cursor, or None.
+    """
+    return __users_page__(
+        models.Follows.user_id,
+        models.Follows.follow_id,
+        user_id,
+        db,
+        limit,
+        cursor,
+        usernames_only,
+    )
+
+
+def get_follower_users(
+    user_id: int,
+    db: Session,
+    limit: int = 50,
+    cursor: str | None = None,
+    usernames_only: bool = False,
+) -> tuple[list, str | None]:
+    """Return a page of the users following ``user_id``; see get_followed_users."""
+    return __users_page__(
+        models.Follows.follow_id,
+        models.Follows.user_id,
+        user_id,
+        db,
+        limit,
+        cursor,
+        usernames_only,
+    )
+
+
+def get_follow_ids_by_user_id(
+    user_id: int, db: Session, among: list[int] | None = None
+) -> list[int]:
+    query = db.query(models.Follows.follow_id).filter(models.Follows.user_id == user_id)
+    if among is not None:
+        query = query.filter(models.Follows.follow_id.in_(among))
+    return [follow_id for follow_id, in query]
+
+
+def get_follower_ids_by_user_id(user_id: int, db: Session) -> list[int]:
+    return [
+        follower_id
+        for follower_id, in db.query(models.Follows.user_id).filter(
+            models.Follows.follow_id == user_id
+        )
+    ]
+
+
+def get_follow_counts(user_id: int, db: Session) -> tuple[int, int]:
+    """Return the (follows, followers) counters of a user."""
+    counts = db.execute(
+        select(models.User.follows_count, models.User.followers_count).where(
+            models.User.id == user_id
+        )
+    ).first()
+    return (0, 0) if counts is None else tuple(counts)
+
+
+def __shift_follow_counts__(user_id: int, follow_id: int, delta: int, db: Session):
+    # Relative updates, so concurrent follows of the same user never lose a count.
+    db.execute(
+        update(models.User)
+        .where(models.User.id == user_id)
+        .values(follows_count=models.User.follows_count + delta)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(models.User)
+        .where(models.User.id == follow_id)
+        .values(followers_count=models.User.followers_count + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
 def get_follow_by_user_id_and_follow_id(user_id: int, follow_id: int, db: Session):
     follow = (
         db.query(models.Follows).filter_by(user_id=user_id, follow_id=follow_id).first()
@@ -37,10 +166,16 @@ def create_follow(follow: FollowCreate, db: Session):
             follow_id=follow.follow_id,
         )
         db.add(db_follow)
+        db.flush()
+        __shift_follow_counts__(follow.user_id, follow.follow_id, 1, db)
         db.commit()
         db.refresh(db_follow)
         return db_follow
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Follow already exists")
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
 
@@ -56,13 +191,59 @@ def create_follow_by_username(username: str, user_id: int, db: Session):
 
 
 def delete_follow(user_id: int, follow_id: int, db: Session):
-    db_unfollow = (
-        db.query(models.Follows).filter_by(follow_id=follow_id, user_id=user_id).first()
+    # One DELETE statement, so of two concurrent unfollows only the one that
+    # removed the row shifts the counts.
+    result = db.execute(
+        delete(models.Follows).where(
+            models.Follows.user_id == user_id, models.Follows.follow_id == follow_id
+        )
     )
-
-    if db_unfollow is not None:
-        db.delete(db_unfollow)
-        db.commit()
-        return db_unfollow
-    else:
+    if result.rowcount != 1:
+        db.rollback()
         raise HTTPException(status_code=400, detail="Unfollow failed")
+    __shift_follow_counts__(user_id, follow_id, -1, db)
+    db.commit()
+
+
+def reconcile_follow_counts(db: Session) -> int:
+    """Recount every user's follows and followers; return how many drifted."""
+    follows_count = (
+        select(func.count())
+        .where(models.Follows.user_id == models.User.id)
+        .scalar_subquery()
+    )
+    followers_count = (
+        select(func.count())
+        .where(models.Follows.follow_id == models.User.id)
+        .scalar_subquery()
+    )
+    result = db.execute(
+        update(models.User)
+        .where(
+            or_(
+                models.User.follows_count != follows_count,
+                models.User.followers_count != followers_count,
+            )
+        )
+        .values(follows_count=follows_count, followers_count=followers_count)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+# Awaitable versions for routes running on an AsyncSession.
+async_get_follows_by_user_id = awaitable(get_follows_by_user_id)
+async_get_followers_by_user_id = awaitable(get_followers_by_user_id)
+async_get_followed_users = awaitable(get_followed_users)
+async_get_follower_users = awaitable(get_follower_users)
+async_get_follow_ids_by_user_id = awaitable(get_follow_ids_by_user_id)
+async_get_follower_ids_by_user_id = awaitable(get_follower_ids_by_user_id)
+async_get_follow_counts = awaitable(get_follow_counts)
+async_get_follow_by_user_id_and_follow_id = awaitable(
+    get_follow_by_user_id_and_follow_id
+)
+async_get_user_by_username = awaitable(get_user_by_username)
+async_create_follow = awaitable(create_follow)
+async_create_follow_by_username = awaitable(create_follow_by_username)
+async_delete_follow = awaitable(delete_follow)
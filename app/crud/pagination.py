@@ -0,0 +1,89 @@
+import base64
+import json
+import os
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import DateTime, Select, desc, tuple_
+from sqlalchemy.orm import Session
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+
+def __encode__(keys: list) -> str:
+    raw = json.dumps(
+        [key.isoformat() if isinstance(key, datetime) else key for key in keys]
+    ).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def __decode__(cursor: str, length: int) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        keys = json.loads(raw)
+    except ValueError:
+        keys = None
+    if not isinstance(keys, list) or len(keys) != length:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return keys
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """Encode a (created_at, id) keyset position as an opaque cursor."""
+    return __encode__([created_at, id])
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    created_at, id = __decode__(cursor, 2)
+    try:
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_id_cursor(id: int) -> str:
+    """Encode the position of a list keyset-paginated on id alone."""
+    return __encode__([id])
+
+
+def decode_id_cursor(cursor: str) -> int:
+    (id,) = __decode__(cursor, 1)
+    try:
+        return int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(
+    query: Select, keys: list, db: Session, limit: int, cursor: str | None = None
+) -> tuple[list, str | None]:
+    """Return one keyset page of ``query``'s entities and the next cursor.
+
+    Rows are ordered by ``keys`` descending, which should end with a unique
+    column, and the page starts after the position encoded in ``cursor``. The
+    cursor is None on the last page. Unlike ``offset``, the cost of a page
+    does not grow with its depth.
+    """
+    if cursor is not None:
+        position = __decode__(cursor, len(keys))
+        try:
+            position = [
+                (
+                    datetime.fromisoformat(value)
+                    if isinstance(key.type, DateTime)
+                    else key.type.python_type(value)
+                )
+                for key, value in zip(keys, position)
+            ]
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(tuple_(*keys) < tuple_(*position))
+    rows = db.execute(
+        query.add_columns(*keys).order_by(*(desc(key) for key in keys)).limit(limit + 1)
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = __encode__(list(rows[limit - 1][1:]))
+    return [row[0] for row in rows[:limit]], next_cursor
@@ -1,16 +1,23 @@
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, exists, func, select
 from sqlalchemy.exc import SQLAlchemyError
 
 from app import models
-from app.crud.response_prompt import (
-    get_content_ids_by_ai_response_subject,
-    get_response_prompts_by_id,
-    get_three_response_prompts_by_id,
+from app.database import awaitable
+from app.crud.pagination import (
+    PAGE_SIZE,
+    decode_id_cursor,
+    encode_id_cursor,
+    paginate,
 )
 from app.schemas import prompts
-from app.schemas.contents import PromptSubjectAndContents, UserPromptSubjectAndContents
+from app.crud.serialization import to_dict
+from app.schemas.contents import (
+    Content,
+    UserPromptSubjectAndContents,
+)
+from app.schemas.users import User
 
 
 def get_prompt_by_id(prompt_id: int, db: Session) -> models.Prompt:
@@ -24,11 +31,19 @@ def get_prompt_by_title(title: str, db: Session) -> models.Prompt:
     return db.query(models.Prompt).filter(models.Prompt.title == title).first()
 
 
-def get_prompts_by_user_id(user_id: int, db: Session) -> list[models.Prompt]:
-    prompts = db.query(models.Prompt).filter(models.Prompt.user_id == user_id).all()
+def get_prompts_by_user_id(
+    user_id: int, db: Session, limit: int = PAGE_SIZE, cursor: str | None = None
+) -> tuple[list[models.Prompt], str | None]:
+    prompts, next_cursor = paginate(
+        select(models.Prompt).where(models.Prompt.user_id == user_id),
+        [models.Prompt.id],
+        db,
+        limit,
+        cursor,
+    )
     if not prompts:
         raise HTTPException(status_code=404, detail="Prompt not found")
-    return prompts
+    return prompts, next_cursor
 
 
 def get_last_three_public_prompts_by_user_id(
@@ -60,11 +75,15 @@ def get_last_three_prompts_by_user_id(user_id: int, db: Session) -> list[models.
     return prompts
 
 
-def get_prompts(db: Session, skip: int = 0, limit: int = 100) -> list[models.Prompt]:
-    prompts = db.query(models.Prompt).offset(skip).limit(limit).all()
+def get_prompts(
+    db: Session, limit: int = PAGE_SIZE, cursor: str | None = None
+) -> tuple[list[models.Prompt], str | None]:
+    prompts, next_cursor = paginate(
+        select(models.Prompt), [models.Prompt.id], db, limit, cursor
+    )
     if not prompts:
         raise HTTPException(status_code=404, detail="Prompt not found")
-    return prompts
+    return prompts, next_cursor
 
 
 def get_user_by_id(user_id: int, db: Session):
@@ -89,6 +108,7 @@ def create_prompt(prompt: prompts.PromptCreate, db: Session) -> models.Prompt:
             keywords=prompt.keywords,
             is_private=prompt.is_private,
             user_id=prompt.user_id,
+            status=prompt.status,
         )
         db.add(db_prompt)
         db.commit()
@@ -111,6 +131,17 @@ def switch_prompt_visibility(prompt_id: int, db: Session) -> models.Prompt:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def set_prompt_status(
+    prompt_id: int, status: str, db: Session, keywords: str | None = None
+) -> models.Prompt:
+    db_prompt = get_prompt_by_id(prompt_id, db)
+    db_prompt.status = status
+    if keywords is not None:
+        db_prompt.keywords = keywords
+    db.commit()
+    return db_prompt
+
+
 def get_content_by_id(content_id: int, db: Session):
     return db.query(models.Content).filter(models.Content.id == content_id).first()
 
@@ -122,12 +153,21 @@ def get_prompt_contents(prompt_id: int, db: Session) -> UserPromptSubjectAndCont
     db_user = get_user_by_id(db_prompt.user_id, db)
     if db_user is None:
         raise HTTPException(status_code=400, detail="User not found.")
-    db_response_prompts = get_three_response_prompts_by_id(prompt_id, db)
-    if db_response_prompts is None:
+    # Contents come joined to their response_prompts, not one query each.
+    rows = (
+        db.query(models.ResponsePrompt, models.Content)
+        .outerjoin(
+            models.Content, models.Content.id == models.ResponsePrompt.content_id
+        )
+        .filter(models.ResponsePrompt.prompt_id == prompt_id)
+        .order_by(models.ResponsePrompt.id)
+        .limit(3)
+        .all()
+    )
+    if not rows:
         raise HTTPException(status_code=400, detail="No response prompts found.")
-    db_contents = []
-    for db_response_prompt in db_response_prompts:
-        db_contents.append(get_content_by_id(db_response_prompt.content_id, db))
+    db_response_prompt = rows[-1][0]
+    db_contents = [db_content for _, db_content in rows]
 
     return UserPromptSubjectAndContents(
         user=db_user,
@@ -138,46 +178,221 @@ def get_prompt_contents(prompt_id: int, db: Session) -> UserPromptSubjectAndCont
     )
 
 
-def get_prompt_contents_history(
-    prompt_id: int, db: Session
-) -> list[PromptSubjectAndContents]:
+def get_prompt_contents_history(prompt_id: int, db: Session) -> list[dict]:
+    """Return the prompt's subjects with their contents in two queries.
+
+    Items are ``PromptSubjectAndContents`` shaped dicts.
+    """
     db_prompt = get_prompt_by_id(prompt_id, db)
     if db_prompt is None:
         raise HTTPException(status_code=400, detail="Prompt not found.")
-    db_response_prompts = get_response_prompts_by_id(prompt_id, db)
-    if db_response_prompts is None:
-        raise HTTPException(status_code=400, detail="No response prompts found.")
+    db_response_prompts = (
+        db.query(models.ResponsePrompt, models.Content)
+        .outerjoin(
+            models.Content, models.Content.id == models.ResponsePrompt.content_id
+        )
+        .filter(models.ResponsePrompt.prompt_id == prompt_id)
+        .order_by(models.ResponsePrompt.id)
+        .all()
+    )
     subject_contents_map = {}
     description_contents_map = {}
 
     processed_content_ids = set()
 
-    for db_response_prompt in db_response_prompts:
+    for db_response_prompt, content in db_response_prompts:
         subject = db_response_prompt.ai_response_subject
-        description = db_response_prompt.ai_response_description
 
         if subject not in subject_contents_map:
             subject_contents_map[subject] = []
-            description_contents_map[subject] = description
+            description_contents_map[subject] = (
+                db_response_prompt.ai_response_description
+            )
 
-        db_content_ids = get_content_ids_by_ai_response_subject(subject, db)
-
-        for content_id_tuple in db_content_ids:
-            content_id = content_id_tuple[0]
-            if content_id in processed_content_ids:
-                continue
-            content = get_content_by_id(content_id, db)
-            subject_contents_map[subject].append(content)
-            processed_content_ids.add(content_id)
+        if content is None or content.id in processed_content_ids:
+            continue
+        subject_contents_map[subject].append(to_dict(content, Content))
+        processed_content_ids.add(content.id)
 
+    prompt = to_dict(db_prompt, prompts.Prompt)
     result = [
-        PromptSubjectAndContents(
-            prompt=db_prompt,
-            subject=subject,
-            description=description_contents_map[subject],
-            contents=subject_contents_map[subject],
-        )
+        {
+            "prompt": prompt,
+            "subject": subject,
+            "description": description_contents_map[subject],
+            "contents": subject_contents_map[subject],
+        }
         for subject in subject_contents_map.keys()
     ]
 
     return result
+
+
+def __prompt_summaries__(page, db: Session) -> list[dict]:
+    """Load the prompts of the ``page`` subquery (an ``id`` column) in one query.
+
+    Each prompt comes with its author, the contents of its first three
+    response_prompts and the subject of the last of them, newest prompt first,
+    as ``UserPromptSubjectAndContents`` shaped dicts.
+    """
+    ranked_response_prompts = (
+        select(
+            models.ResponsePrompt.id,
+            func.row_number()
+            .over(
+                partition_by=models.ResponsePrompt.prompt_id,
+                order_by=models.ResponsePrompt.id,
+            )
+            .label("position"),
+        )
+        .where(models.ResponsePrompt.prompt_id.in_(select(page.c.id)))
+        .subquery()
+    )
+    rows = db.execute(
+        select(models.Prompt, models.User, models.ResponsePrompt, models.Content)
+        .join(page, page.c.id == models.Prompt.id)
+        .join(models.User, models.User.id == models.Prompt.user_id)
+        .join(models.ResponsePrompt, models.ResponsePrompt.prompt_id == page.c.id)
+        .join(
+            ranked_response_prompts,
+            ranked_response_prompts.c.id == models.ResponsePrompt.id,
+        )
+        .join(models.Content, models.Content.id == models.ResponsePrompt.content_id)
+        .where(ranked_response_prompts.c.position <= 3)
+        .order_by(desc(models.Prompt.id), models.ResponsePrompt.id)
+    ).all()
+
+    prompt_rows = {}
+    for db_prompt, db_user, db_response_prompt, db_content in rows:
+        prompt_rows.setdefault(db_prompt.id, []).append(
+            (db_prompt, db_user, db_response_prompt, db_content)
+        )
+
+    summaries = []
+    for items in prompt_rows.values():
+        db_prompt, db_user, db_response_prompt, _ = items[-1]
+        summaries.append(
+            {
+                "user": to_dict(db_user, User),
+                "prompt": to_dict(db_prompt, prompts.Prompt),
+                "subject": db_response_prompt.ai_response_subject,
+                "description": db_response_prompt.ai_response_description,
+                "contents": [
+                    to_dict(db_content, Content) for _, _, _, db_content in items
+                ],
+            }
+        )
+    return summaries
+
+
+def get_feed(
+    user_id: int, db: Session, limit: int = 20, cursor: str | None = None
+) -> tuple[list[dict], str | None]:
+    """Return a page of public prompts from followed users, newest first.
+
+    The page is read in a single statement: followed users' prompts are
+    keyset-paginated on id, which grows with created_at, and joined to their
+    authors, their first three response_prompts and those contents. Ordering
+    on id lets the (user_id, is_private, id desc) index serve both the order
+    and the cursor, as it does for the Redis timeline, which takes the same
+    cursors. Returns the page and the cursor of the next one, or None on the
+    last page.
+    """
+    page_query = (
+        select(models.Prompt.id)
+        .where(
+            models.Prompt.user_id.in_(
+                select(models.Follows.follow_id).where(
+                    models.Follows.user_id == user_id
+                )
+            ),
+            models.Prompt.is_private == False,
+            exists().where(models.ResponsePrompt.prompt_id == models.Prompt.id),
+        )
+        .order_by(desc(models.Prompt.id))
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        page_query = page_query.where(models.Prompt.id < decode_id_cursor(cursor))
+    summaries = __prompt_summaries__(page_query.subquery(), db)
+
+    feed = summaries[:limit]
+    next_cursor = None
+    if len(summaries) > limit:
+        next_cursor = encode_id_cursor(feed[-1]["prompt"]["id"])
+    return feed, next_cursor
+
+
+def get_prompt_summaries(
+    prompt_ids: list[int], db: Session, include_private: bool = False
+) -> list[dict]:
+    """Hydrate prompts by id in one query, newest first.
+
+    Ids of prompts that are gone or without results are skipped, and so are
+    private ones unless ``include_private`` is set.
+    """
+    if not prompt_ids:
+        return []
+    page = select(models.Prompt.id).where(models.Prompt.id.in_(prompt_ids))
+    if not include_private:
+        page = page.where(models.Prompt.is_private == False)
+    return __prompt_summaries__(page.subquery(), db)
+
+
+def get_public_prompt_ids_by_user_ids(
+    user_ids: list[int], db: Session, limit: int, before_id: int | None = None
+) -> list[int]:
+    """Ids of the latest public prompts with results of ``user_ids``."""
+    if not user_ids:
+        return []
+    query = (
+        db.query(models.Prompt.id)
+        .filter(models.Prompt.user_id.in_(user_ids))
+        .filter(models.Prompt.is_private == False)
+        .filter(exists().where(models.ResponsePrompt.prompt_id == models.Prompt.id))
+    )
+    if before_id is not None:
+        query = query.filter(models.Prompt.id < before_id)
+    return [id for id, in query.order_by(desc(models.Prompt.id)).limit(limit)]
+
+
+def get_prompt_ids_by_user_id(user_id: int, db: Session, limit: int) -> list[int]:
+    return [
+        id
+        for id, in db.query(models.Prompt.id)
+        .filter(models.Prompt.user_id == user_id)
+        .order_by(desc(models.Prompt.id))
+        .limit(limit)
+    ]
+
+
+def get_prompt_ids_by_status(status: str, db: Session) -> list[int]:
+    return [
+        id
+        for id, in db.query(models.Prompt.id)
+        .filter(models.Prompt.status == status)
+        .order_by(models.Prompt.id)
+    ]
+
+
+# Awaitable versions for routes running on an AsyncSession.
+async_get_prompt_by_id = awaitable(get_prompt_by_id)
+async_get_prompt_by_title = awaitable(get_prompt_by_title)
+async_get_prompts_by_user_id = awaitable(get_prompts_by_user_id)
+async_get_last_three_public_prompts_by_user_id = awaitable(
+    get_last_three_public_prompts_by_user_id
+)
+async_get_last_three_prompts_by_user_id = awaitable(get_last_three_prompts_by_user_id)
+async_get_prompts = awaitable(get_prompts)
+async_get_user_by_id = awaitable(get_user_by_id)
+async_create_prompt = awaitable(create_prompt)
+async_switch_prompt_visibility = awaitable(switch_prompt_visibility)
+async_set_prompt_status = awaitable(set_prompt_status)
+async_get_content_by_id = awaitable(get_content_by_id)
+async_get_prompt_contents = awaitable(get_prompt_contents)
+async_get_prompt_contents_history = awaitable(get_prompt_contents_history)
+async_get_feed = awaitable(get_feed)
+async_get_prompt_summaries = awaitable(get_prompt_summaries)
+async_get_public_prompt_ids_by_user_ids = awaitable(get_public_prompt_ids_by_user_ids)
+async_get_prompt_ids_by_user_id = awaitable(get_prompt_ids_by_user_id)
+async_get_prompt_ids_by_status = awaitable(get_prompt_ids_by_status)
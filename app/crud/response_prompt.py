@@ -1,7 +1,10 @@
 from fastapi import HTTPException
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
 
 from app import models
+from app.crud.pagination import PAGE_SIZE, paginate
+from app.database import awaitable
 from app.schemas.response_prompt import ResponsePromptCreate
 
 
@@ -30,8 +33,12 @@ def get_content_ids_by_ai_response_subject(ai_response_subject: str, db: Session
     )
 
 
-def get_response_prompts(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.ResponsePrompt).offset(skip).limit(limit).all()
+def get_response_prompts(
+    db: Session, limit: int = PAGE_SIZE, cursor: str | None = None
+) -> tuple[list[models.ResponsePrompt], str | None]:
+    return paginate(
+        select(models.ResponsePrompt), [models.ResponsePrompt.id], db, limit, cursor
+    )
 
 
 def create_response_prompt(response_prompt: ResponsePromptCreate, db: Session):
@@ -48,3 +55,25 @@ def create_response_prompt(response_prompt: ResponsePromptCreate, db: Session):
         return db_response_prompt
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+def delete_response_prompts_by_prompt_id(prompt_id: int, db: Session):
+    db.execute(
+        delete(models.ResponsePrompt).where(
+            models.ResponsePrompt.prompt_id == prompt_id
+        )
+    )
+    db.commit()
+
+
+# Awaitable versions for routes running on an AsyncSession.
+async_get_three_response_prompts_by_id = awaitable(get_three_response_prompts_by_id)
+async_get_response_prompts_by_id = awaitable(get_response_prompts_by_id)
+async_get_content_ids_by_ai_response_subject = awaitable(
+    get_content_ids_by_ai_response_subject
+)
+async_get_response_prompts = awaitable(get_response_prompts)
+async_create_response_prompt = awaitable(create_response_prompt)
+async_delete_response_prompts_by_prompt_id = awaitable(
+    delete_response_prompts_by_prompt_id
+)
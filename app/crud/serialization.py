@@ -0,0 +1,17 @@
+from functools import cache
+
+from pydantic import BaseModel
+
+
+@cache
+def __fields__(schema: type[BaseModel]) -> tuple[str, ...]:
+    return tuple(schema.__fields__)
+
+
+def to_dict(obj, schema: type[BaseModel]) -> dict:
+    """Read the fields of a flat ``schema`` off an ORM object.
+
+    This skips pydantic validation for rows we just loaded: the columns
+    already hold the schema's types, and the result is ready for orjson.
+    """
+    return {name: getattr(obj, name) for name in __fields__(schema)}
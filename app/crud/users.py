@@ -1,10 +1,14 @@
 from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 
 from app import models
+from app.crud.pagination import PAGE_SIZE, paginate
+from app.database import awaitable
 from app.schemas import users as user_schemas
-from app.services.auth import get_password_hash
+from app.services.auth import async_get_password_hash, get_password_hash
 
 
 def get_user(user_id: int, db: Session):
@@ -36,12 +40,17 @@ def get_user_by_username(username: str, db: Session):
     return user
 
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+def get_users(
+    db: Session, limit: int = PAGE_SIZE, cursor: str | None = None
+) -> tuple[list[models.User], str | None]:
+    return paginate(select(models.User), [models.User.id], db, limit, cursor)
 
 
-def create_user(user: user_schemas.UserCreate, db: Session):
-    hashed_password = get_password_hash(user.password)
+def create_user(
+    user: user_schemas.UserCreate, db: Session, hashed_password: str | None = None
+):
+    if hashed_password is None:
+        hashed_password = get_password_hash(user.password)
     db_user = models.User(
         email=user.email,
         hashed_password=hashed_password,
@@ -60,3 +69,16 @@ def create_user(user: user_schemas.UserCreate, db: Session):
         )
 
     return db_user
+
+
+# Awaitable versions for routes running on an AsyncSession.
+async_get_user = awaitable(get_user)
+async_get_user_by_email = awaitable(get_user_by_email)
+async_get_user_by_username = awaitable(get_user_by_username)
+async_get_users = awaitable(get_users)
+
+
+async def async_create_user(user: user_schemas.UserCreate, db: AsyncSession):
+    # Hash in the password pool so the event loop is not blocked by bcrypt.
+    hashed_password = await async_get_password_hash(user.password)
+    return await awaitable(create_user)(user, db, hashed_password=hashed_password)
@@ -1,10 +1,287 @@
+import functools
+import inspect
+import logging
 import os
-from sqlalchemy import create_engine
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 SQLALCHEMY_DATABASE_URL = os.getenv("POSGTRES_URI")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Every worker opens up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections per
+# engine, so keep workers x that sum below Postgres max_connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# A request over DB_QUERY_WARN_COUNT statements, or running one statement
+# DB_REPEATED_QUERY_WARN_COUNT times (likely an N+1), is logged as a warning.
+DB_QUERY_WARN_COUNT = int(os.getenv("DB_QUERY_WARN_COUNT", "20"))
+DB_REPEATED_QUERY_WARN_COUNT = int(os.getenv("DB_REPEATED_QUERY_WARN_COUNT", "5"))
+
+ASYNC_DRIVERS = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Swap the sync driver of ``url`` for its asyncio counterpart."""
+    url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(url.drivername, url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+@dataclass
+class PoolMetrics:
+    checkouts: int = 0
+    checkout_timeouts: int = 0
+    checkout_wait_seconds_total: float = 0.0
+    max_checkout_wait_seconds: float = 0.0
+    checked_out: int = 0
+    max_checked_out: int = 0
+    connects: int = 0
+    closes: int = 0
+    invalidations: int = 0
+
+
+pool_metrics = {"sync": PoolMetrics(), "async": PoolMetrics()}
+
+
+class TimedCheckoutMixin:
+    """Records how long checkouts wait for a free connection.
+
+    The pool has no event before a checkout, so the wait is timed around
+    ``_do_get``. Metrics are looked up by the pool's logging name, which
+    survives ``Pool.recreate``.
+    """
+
+    def _do_get(self):
+        metrics = pool_metrics[self.logging_name]
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            metrics.checkout_timeouts += 1
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            metrics.checkout_wait_seconds_total += wait
+            metrics.max_checkout_wait_seconds = max(
+                metrics.max_checkout_wait_seconds, wait
+            )
+
+
+class InstrumentedQueuePool(TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(url: str, name: str, poolclass) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    # SQLite keeps its own single-connection pools.
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            poolclass=poolclass,
+            pool_logging_name=name,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    return options
+
+
+def instrument_pool(engine: Engine, metrics: PoolMetrics):
+    """Count checkouts and connection churn on ``engine``'s pool."""
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.connects += 1
+
+    @event.listens_for(engine, "close")
+    def on_close(dbapi_connection, connection_record):
+        metrics.closes += 1
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.invalidations += 1
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.checkouts += 1
+        metrics.checked_out += 1
+        metrics.max_checked_out = max(metrics.max_checked_out, metrics.checked_out)
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        metrics.checked_out -= 1
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+
+    def add(self, other: "QueryStats"):
+        self.count += other.count
+        self.seconds += other.seconds
+        self.statements.update(other.statements)
+
+    def most_repeated(self) -> tuple[str, int]:
+        return self.statements.most_common(1)[0] if self.statements else ("", 0)
+
+
+query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries():
+    """Count the statements run by every engine in this context.
+
+    Tasks started inside the block, like the ones running a request, add to
+    the same ``QueryStats``. An enclosing block gets the totals on exit.
+    """
+    stats = QueryStats()
+    token = query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        query_stats.reset(token)
+        parent = query_stats.get()
+        if parent is not None:
+            parent.add(stats)
+
+
+# Listening on the Engine class covers every engine, test engines included.
+@event.listens_for(Engine, "before_cursor_execute")
+def __before_cursor_execute__(
+    connection, cursor, statement, parameters, context, executemany
+):
+    if query_stats.get() is not None:
+        connection.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def __after_cursor_execute__(
+    connection, cursor, statement, parameters, context, executemany
+):
+    stats = query_stats.get()
+    if stats is None or not connection.info.get("query_start"):
+        return
+    stats.count += 1
+    stats.seconds += time.perf_counter() - connection.info["query_start"].pop()
+    stats.statements[statement] += 1
+
+
+@event.listens_for(Engine, "handle_error")
+def __handle_error__(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start"):
+        connection.info["query_start"].pop()
+
+
+def warn_on_queries(label: str, stats: QueryStats):
+    """Log a warning naming the repeated statement when ``stats`` look off."""
+    statement, repeats = stats.most_repeated()
+    if repeats < DB_REPEATED_QUERY_WARN_COUNT and stats.count <= DB_QUERY_WARN_COUNT:
+        return
+    logging.warning(
+        f"{label}: {stats.count} queries in {stats.seconds * 1000:.1f} ms, "
+        f"this one {repeats} times: {' '.join(statement.split())[:500]}"
+    )
+
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    **pool_options(SQLALCHEMY_DATABASE_URL, "sync", InstrumentedQueuePool),
+)
+instrument_pool(engine, pool_metrics["sync"])
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    async_database_url(SQLALCHEMY_DATABASE_URL),
+    **pool_options(SQLALCHEMY_DATABASE_URL, "async", InstrumentedAsyncQueuePool),
+)
+instrument_pool(async_engine.sync_engine, pool_metrics["async"])
+# Attributes must stay readable after commit: expired ones would need a lazy
+# load, which an AsyncSession cannot do outside of run_sync.
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def pool_stats() -> dict:
+    stats = {}
+    for name, pool_engine in (("sync", engine), ("async", async_engine.sync_engine)):
+        metrics = pool_metrics[name]
+        pool = pool_engine.pool
+        capacity = (
+            DB_POOL_SIZE + DB_MAX_OVERFLOW
+            if isinstance(pool, TimedCheckoutMixin)
+            else None
+        )
+        stats[name] = {
+            "pool": type(pool).__name__,
+            "capacity": capacity,
+            "checked_out": metrics.checked_out,
+            "max_checked_out": metrics.max_checked_out,
+            "saturation": metrics.checked_out / capacity if capacity else None,
+            "checkouts": metrics.checkouts,
+            "checkout_timeouts": metrics.checkout_timeouts,
+            "checkout_wait_seconds_total": round(
+                metrics.checkout_wait_seconds_total, 6
+            ),
+            "max_checkout_wait_seconds": round(metrics.max_checkout_wait_seconds, 6),
+            "connects": metrics.connects,
+            "closes": metrics.closes,
+            "invalidations": metrics.invalidations,
+        }
+    return stats
+
+
+def awaitable(fn):
+    """Make a crud function that takes ``db: Session`` run on an ``AsyncSession``.
+
+    The wrapped function gets the session's sync facade through
+    ``AsyncSession.run_sync``, so its queries go through the async driver
+    without blocking the event loop, and the sync version stays available to
+    scripts and tests.
+    """
+    signature = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        arguments = signature.bind(*args, **kwargs)
+        db: AsyncSession = arguments.arguments["db"]
+
+        def call(session):
+            arguments.arguments["db"] = session
+            return fn(*arguments.args, **arguments.kwargs)
+
+        return await db.run_sync(call)
+
+    return wrapper
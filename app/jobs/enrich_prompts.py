@@ -0,0 +1,36 @@
+"""Enrich prompts created with POST /curious?background=true.
+
+Pulls jobs from the Redis queue shared with the API, so run as many of these
+as the upstream LLM and search quotas allow:
+
+    python -m app.jobs.enrich_prompts
+"""
+
+import asyncio
+import logging
+
+from app import database
+from app.services import enrichment, http_client, job_queue, redis_client, tracing
+
+
+async def run():
+    http_client.open_client()
+    if redis_client.open_client() is None:
+        raise SystemExit("REDIS_HOST must be set to share the job queue")
+    tracing.start_exporter()
+    try:
+        await enrichment.run_worker(job_queue.get_queue())
+    finally:
+        await tracing.stop_exporter()
+        await http_client.close_client()
+        await redis_client.close_client()
+        await database.async_engine.dispose()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
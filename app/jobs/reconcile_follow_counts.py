@@ -0,0 +1,26 @@
+"""Repair drift between the users' follow counters and the follows table.
+
+Follows and unfollows keep the counters in step, so this only fixes rows
+written outside crud.follows. Run it from cron or by hand:
+
+    python -m app.jobs.reconcile_follow_counts
+"""
+
+import logging
+
+from app.crud import follows
+from app.database import SessionLocal
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        repaired = follows.reconcile_follow_counts(db)
+    finally:
+        db.close()
+    logging.info(f"Repaired follow counters of {repaired} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,14 @@
 import logging
 import os
+import time
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from api_analytics.fastapi import Analytics
 
-from .routers import contents, users, prompts
+from . import database
+from .routers import contents, users, prompts, stats
+from .services import enrichment, http_client, metrics, redis_client, tracing
 
 logging.basicConfig(
     level=logging.INFO,
@@ -30,6 +33,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Queries", "Server-Timing", "X-Trace-Id"],
 )
 
 app.add_middleware(
@@ -38,9 +42,71 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def count_queries(request: Request, call_next):
+    with database.track_queries() as stats:
+        response = await call_next(request)
+    # Streamed bodies run their queries after the headers are sent.
+    response.headers["X-DB-Queries"] = str(stats.count)
+    response.headers["Server-Timing"] = f"db;dur={stats.seconds * 1000:.1f}"
+    database.warn_on_queries(f"{request.method} {request.url.path}", stats)
+    return response
+
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    route = metrics.route_template(request)
+    in_flight = metrics.http_requests_in_flight.labels(request.method, route)
+    in_flight.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        in_flight.dec()
+        metrics.http_request_seconds.labels(request.method, route, status).observe(
+            time.perf_counter() - start
+        )
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    route = metrics.route_template(request)
+    with tracing.start_trace(
+        f"{request.method} {route}",
+        request.headers.get("traceparent"),
+        **{"http.method": request.method, "http.route": route},
+    ) as root:
+        response = await call_next(request)
+        if root is not None:
+            root.set(**{"http.status_code": response.status_code})
+            response.headers["X-Trace-Id"] = root.trace_id
+    return response
+
+
 app.include_router(users.router)
 app.include_router(contents.router)
 app.include_router(prompts.router)
+app.include_router(stats.router)
+
+
+@app.on_event("startup")
+async def startup_event():
+    http_client.open_client()
+    redis_client.open_client()
+    enrichment.start_local_worker()
+    tracing.start_exporter()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await enrichment.stop_local_worker()
+    await tracing.stop_exporter()
+    await http_client.close_client()
+    await redis_client.close_client()
+    await database.async_engine.dispose()
 
 
 @app.get("/", tags=["root"], response_description="Hello World")
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -8,36 +8,38 @@ from .database import Base
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     username = Column(String, unique=True, index=True)
-    full_name = Column(String, index=True)
-    bio = Column(String, index=True, default="Lorem ipsum")
+    full_name = Column(String)
+    bio = Column(String, default="Lorem ipsum")
     profile_picture = Column(
         String,
-        index=True,
         default="https://media.licdn.com/dms/image/D4E03AQFuIj2EaSDYbg/profile-displayphoto-shrink_400_400/0/1685128811345?e=1692230400&v=beta&t=KeMgavxd3GBhIJLcYvQZtsv4yeNg3LdPsYzHQZ41MQw",
     )
     profile_banner = Column(
         String,
-        index=True,
         default="https://pbs.twimg.com/profile_banners/1500074670917312513/1646482168/1500x500",
     )
     is_active = Column(Boolean, default=True)
+    # Kept in step with the follows table by crud.follows.
+    follows_count = Column(Integer, nullable=False, default=0, server_default="0")
+    followers_count = Column(Integer, nullable=False, default=0, server_default="0")
     prompts = relationship("Prompt", backref="user")
 
 
 class Content(Base):
     __tablename__ = "contents"
 
-    id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, index=True)
-    snippet = Column(String, index=True)
-    link = Column(String, index=True)
-    source = Column(String, index=True)
-    long_description = Column(String, index=True)
-    image = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    title = Column(String)
+    snippet = Column(String)
+    link = Column(String)
+    canonical_link = Column(String, unique=True, index=True)
+    source = Column(String)
+    long_description = Column(String)
+    image = Column(String)
     is_active = Column(Boolean, default=True)
     responses = relationship("ResponsePrompt", backref="content")
 
@@ -45,30 +47,44 @@ class Content(Base):
 class Prompt(Base):
     __tablename__ = "prompts"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     title = Column(String, index=True)
-    keywords = Column(String, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), index=True)
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    keywords = Column(String)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime, default=datetime.utcnow)
     is_private = Column(Boolean, default=False)
+    # Pending while a worker enriches it, then ready or failed.
+    status = Column(String, nullable=False, default="ready", server_default="ready")
     responses = relationship("ResponsePrompt", backref="prompt")
 
 
 class ResponsePrompt(Base):
     __tablename__ = "response_prompts"
 
-    id = Column(Integer, primary_key=True, index=True)
-    prompt_id = Column(Integer, ForeignKey("prompts.id"), index=True)
-    content_id = Column(Integer, ForeignKey("contents.id"), index=True)
-    ai_response_subject = Column(String, index=True)
-    ai_response_description = Column(String, index=True)
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    id = Column(Integer, primary_key=True)
+    prompt_id = Column(Integer, ForeignKey("prompts.id"))
+    content_id = Column(Integer, ForeignKey("contents.id"))
+    ai_response_subject = Column(String)
+    ai_response_description = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 
 class Follows(Base):
     __tablename__ = "follows"
 
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
     follow_id = Column(Integer, ForeignKey("users.id"), index=True)
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+# Indexes follow the queries the app runs; large text columns are not indexed.
+# Changes here need a migration in migrations/versions.
+Index(
+    "ix_prompts_user_id_is_private_id",
+    Prompt.user_id,
+    Prompt.is_private,
+    Prompt.id.desc(),
+)
+Index("ix_response_prompts_prompt_id_id", ResponsePrompt.prompt_id, ResponsePrompt.id)
+Index("ix_follows_user_id_follow_id", Follows.user_id, Follows.follow_id, unique=True)
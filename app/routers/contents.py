@@ -1,64 +1,37 @@
-import json
-import logging
-import os
-import redis
+from typing import AsyncIterator, Literal
 
 from fastapi import APIRouter, HTTPException
 from fastapi import Depends
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+from redis.exceptions import RedisError
 
 from app import models
 from app.crud import prompts
-from app.database import SessionLocal, engine
-from sqlalchemy.orm import Session
-from app.schemas.openai_response import LLMResponse, Subject, CuriousInput
+from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.openai_response import CuriousInput, LLMResponse, Subject
 from app.schemas.contents import PromptSubjectAndContents
-from app.schemas.prompts import PromptCreate
+from app.schemas.prompts import Prompt, PromptCreate
 from app.schemas.users import User
 from app.services.auth import get_current_user
-from app.services.chatgpt import gpt_json_response
-from app.services.search import LLMResponseSubjectSearchEngines
-
-models.Base.metadata.create_all(bind=engine)
+from app.services.chatgpt import async_gpt_json_response
+from app.services.llm_cache import get_or_generate
+from app.services.search import search_subjects, stream_subjects
+from app.services import enrichment, streaming, timeline
 
 router = APIRouter()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-@router.on_event("startup")
-async def startup_event():
-    global cache
-    pool = redis.ConnectionPool(
-        host=os.getenv("REDIS_HOST"),
-        port=os.getenv("REDIS_PORT"),
-        db=os.getenv("REDIS_DB"),
-        password=os.getenv("REDIS_PASSWORD"),
-    )
-    cache = redis.Redis(connection_pool=pool)
-
-
 @router.post(
     "/chat",
     response_description="ChatGPT response",
     tags=["contents"],
 )
 async def chat(request: CuriousInput, current_user: User = Depends(get_current_user)):
-    if cache.get(request.prompt):
-        logging.info("Cache hit")
-        response: str = cache.get(request)
-        json_dict = json.loads(response)
-        ai_response = LLMResponse.parse_obj(json_dict)
-    else:
-        logging.info("Cache miss")
-        ai_response: LLMResponse = gpt_json_response(request)
-        json_string = ai_response.json()
-        cache.set(request, str(json_string))
+    ai_response = await get_or_generate(
+        request.prompt, lambda: async_gpt_json_response(request.prompt)
+    )
 
     if (
         ai_response.basic_subjects[0].detailed_name
@@ -70,44 +43,85 @@ async def chat(request: CuriousInput, current_user: User = Depends(get_current_u
         return ai_response.json()
 
 
+async def __curious_events__(
+    stream_format: str,
+    ai_response: LLMResponse,
+    created_prompt: models.Prompt,
+    subjects: list[Subject],
+    user_id: int,
+    db: AsyncSession,
+) -> AsyncIterator[str]:
+    yield streaming.encode_event(stream_format, "subjects", ai_response)
+    try:
+        async for stored_data in stream_subjects(
+            created_prompt, subjects, db, user_id=user_id
+        ):
+            yield streaming.encode_event(stream_format, "subject", stored_data)
+        await timeline.fan_out_prompt(created_prompt, db)
+    except HTTPException as exc:
+        yield streaming.encode_event(stream_format, "error", {"detail": exc.detail})
+        return
+    yield streaming.encode_event(stream_format, "done", {})
+
+
+async def __enqueue_curious__(
+    request: CuriousInput, user_id: int, db: AsyncSession
+) -> JSONResponse:
+    created_prompt = await prompts.async_create_prompt(
+        PromptCreate(
+            title=request.prompt,
+            keywords="",
+            is_private=request.is_private,
+            user_id=user_id,
+            status=enrichment.PENDING,
+        ),
+        db,
+    )
+    try:
+        await enrichment.enqueue(created_prompt.id)
+    except RedisError:
+        await prompts.async_set_prompt_status(created_prompt.id, enrichment.FAILED, db)
+        raise HTTPException(status_code=503, detail="Job queue unavailable")
+    return JSONResponse(
+        status_code=202,
+        content=jsonable_encoder(Prompt.from_orm(created_prompt)),
+        headers={"Location": f"/prompts/{created_prompt.id}/contents"},
+    )
+
+
 @router.post(
     "/curious",
     response_model=list[PromptSubjectAndContents],
+    response_class=ORJSONResponse,
     response_description="ChatGPT response and Google retrieved contents",
     tags=["contents"],
 )
 async def curious(
     request: CuriousInput,
+    stream: Literal["ndjson", "sse"] | None = None,
+    background: bool = False,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    cached_response = cache.get(request.prompt)
+    """Generate subjects for the prompt and search contents for each of them.
+
+    With ``stream`` set, the response is NDJSON lines or server-sent events
+    instead of one JSON list: a ``subjects`` event with the LLM response, a
+    ``subject`` event per subject as soon as its contents are stored, then
+    ``done``, or ``error`` if the searches fail midway.
+
+    With ``background``, the prompt is created pending and returned with a
+    202 right away; a worker enriches it and ``/prompts/{id}/contents``
+    answers 202 until its contents are ready.
+    """
+    if background:
+        return await __enqueue_curious__(request, current_user.id, db)
+
+    ai_response = await get_or_generate(
+        request.prompt, lambda: async_gpt_json_response(request.prompt)
+    )
 
-    if cached_response:
-        logging.info("Cache hit")
-        json_dict = json.loads(cached_response)
-        ai_response = LLMResponse.parse_obj(json_dict)
-    else:
-        logging.info("Cache miss")
-        ai_response = gpt_json_response(request.prompt)
-        json_string = ai_response.json()
-        cache.set(request.prompt, json_string)
-
-    all_prompt_subjects_and_contents = []
-
-    async def process_subjects(
-        prompt: str,
-        subjects: list[Subject],
-        all_prompt_subjects_and_contents: list[PromptSubjectAndContents],
-    ):
-        for subject in subjects:
-            prompt_subject_and_contents = await LLMResponseSubjectSearchEngines(
-                prompt, subject.detailed_name, subject.description, db
-            )
-            all_prompt_subjects_and_contents.append(prompt_subject_and_contents)
-        return all_prompt_subjects_and_contents
-
-    created_prompt = prompts.create_prompt(
+    created_prompt = await prompts.async_create_prompt(
         PromptCreate(
             title=request.prompt,
             keywords=ai_response.main_subject_of_the_prompt,
@@ -117,32 +131,28 @@ async def curious(
         db,
     )
 
-    if ai_response.basic_subjects != "string":
-        all_prompt_subjects_and_contents = await process_subjects(
-            created_prompt,
-            ai_response.basic_subjects,
-            all_prompt_subjects_and_contents,
-        )
-    else:
+    if ai_response.basic_subjects == "string":
         raise HTTPException(
             status_code=404, detail="No basic subjects found, LLM failed"
         )
-
-    if ai_response.deeper_subjects != "string":
-        all_prompt_subjects_and_contents = await process_subjects(
-            created_prompt,
-            ai_response.deeper_subjects,
-            all_prompt_subjects_and_contents,
-        )
-    else:
+    if ai_response.deeper_subjects == "string":
         raise HTTPException(
             status_code=404, detail="No deeper subjects found, LLM failed"
         )
 
-    return all_prompt_subjects_and_contents
+    subjects = ai_response.basic_subjects + ai_response.deeper_subjects
+    if stream is not None:
+        return StreamingResponse(
+            __curious_events__(
+                stream, ai_response, created_prompt, subjects, current_user.id, db
+            ),
+            media_type=streaming.MEDIA_TYPES[stream],
+        )
 
+    all_prompt_subjects_and_contents = await search_subjects(
+        created_prompt, subjects, db, user_id=current_user.id
+    )
+    await timeline.fan_out_prompt(created_prompt, db)
 
-@router.on_event("shutdown")
-async def shutdown_event():
-    cache.close()
-    logging.warning("Cache closed")
+    # Already plain dicts: skip response_model validation.
+    return ORJSONResponse(all_prompt_subjects_and_contents)
@@ -1,49 +1,34 @@
-import os
-import redis
-from requests import Session
-from fastapi import APIRouter, Depends, HTTPException
-
-from app import models
-from app.crud import follows, prompts
-from app.database import SessionLocal, engine
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud import prompts
+from app.crud.pagination import MAX_PAGE_SIZE, PAGE_SIZE
+from app.database import get_db
 from app.schemas.contents import (
     PromptSubjectAndContents,
     UserPromptSubjectAndContents,
 )
-from app.schemas.prompts import PromptBase, Prompt
+from app.schemas.pagination import Page
+from app.schemas.prompts import PromptBase, Prompt, PromptCreate
 from app.schemas.users import User
 from app.services.auth import get_current_user
-
-models.Base.metadata.create_all(bind=engine)
+from app.services import enrichment, timeline
 
 router = APIRouter()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-@router.on_event("startup")
-async def startup_event():
-    global cache
-    pool = redis.ConnectionPool(
-        host=os.getenv("REDIS_HOST"),
-        port=os.getenv("REDIS_PORT"),
-        db=os.getenv("REDIS_DB"),
-        password=os.getenv("REDIS_PASSWORD"),
-    )
-    cache = redis.Redis(connection_pool=pool)
-
-
-@router.get("/prompts/me", response_model=list[Prompt], tags=["prompts"])
+@router.get("/prompts/me", response_model=Page[Prompt], tags=["prompts"])
 async def get_prompts(
-    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+    cursor: str | None = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
 ):
-    return prompts.get_prompts_by_user_id(current_user.id, db)
+    items, next_cursor = await prompts.async_get_prompts_by_user_id(
+        current_user.id, db, limit, cursor
+    )
+    return Page(items=items, next_cursor=next_cursor)
 
 
 @router.get(
@@ -52,27 +37,26 @@ async def get_prompts(
     tags=["prompts"],
 )
 async def get_prompts(
-    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)
 ):
-    list_of_prompts = prompts.get_last_three_prompts_by_user_id(current_user.id, db)
-    if len(list_of_prompts) == 0:
-        return []
-    else:
-        list_of_contents = []
-        for prompt in list_of_prompts:
-            content_for_prompt = prompts.get_prompt_contents(prompt.id, db)
-            list_of_contents.append(content_for_prompt)
-        return list_of_contents
+    list_of_prompts = await prompts.async_get_last_three_prompts_by_user_id(
+        current_user.id, db
+    )
+    # Hydrated together, not one query per prompt; owners see private ones.
+    return await prompts.async_get_prompt_summaries(
+        [prompt.id for prompt in list_of_prompts], db, include_private=True
+    )
 
 
 @router.get("/prompts/{prompt_id}", response_model=Prompt, tags=["prompts"])
 async def get_prompt_by_id(
     prompt_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    if prompts.get_prompt_by_id(prompt_id, db).user_id == current_user.id:
-        return prompts.get_prompt_by_id(prompt_id, db)
+    db_prompt = await prompts.async_get_prompt_by_id(prompt_id, db)
+    if db_prompt.user_id == current_user.id:
+        return db_prompt
     else:
         raise HTTPException(
             status_code=403, detail="You are not the owner of this prompt"
@@ -82,24 +66,35 @@ async def get_prompt_by_id(
 @router.post("/prompts", response_model=Prompt, tags=["prompts"])
 async def create_prompt(
     request: PromptBase,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    return prompts.create_prompt(request, db)
+    # Clients cannot pick the status; prompts created here are ready.
+    return await prompts.async_create_prompt(PromptCreate(**request.dict()), db)
 
 
 @router.get(
     "/prompts/{prompt_id}/contents",
     response_model=list[PromptSubjectAndContents],
+    response_class=ORJSONResponse,
     tags=["prompts"],
 )
 async def get_prompt_contents(
     prompt_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    if prompts.get_prompt_by_id(prompt_id, db).user_id == current_user.id:
-        return prompts.get_prompt_contents_history(prompt_id, db)
+    db_prompt = await prompts.async_get_prompt_by_id(prompt_id, db)
+    if db_prompt.user_id == current_user.id:
+        if db_prompt.status == enrichment.PENDING:
+            response.status_code = 202
+            return []
+        if db_prompt.status == enrichment.FAILED:
+            raise HTTPException(status_code=502, detail="Failed to enrich prompt")
+        return ORJSONResponse(
+            await prompts.async_get_prompt_contents_history(prompt_id, db)
+        )
     else:
         raise HTTPException(
             status_code=403, detail="You are not the owner of this prompt"
@@ -113,11 +108,17 @@ async def get_prompt_contents(
 )
 async def change_prompt_visibility(
     prompt_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    if prompts.get_prompt_by_id(prompt_id, db).user_id == current_user.id:
-        return prompts.switch_prompt_visibility(prompt_id, db)
+    db_prompt = await prompts.async_get_prompt_by_id(prompt_id, db)
+    if db_prompt.user_id == current_user.id:
+        db_prompt = await prompts.async_switch_prompt_visibility(prompt_id, db)
+        if db_prompt.is_private:
+            await timeline.remove_prompt(db_prompt, db)
+        else:
+            await timeline.fan_out_prompt(db_prompt, db)
+        return db_prompt
     else:
         raise HTTPException(
             status_code=403, detail="You are not the owner of this prompt"
@@ -125,19 +126,17 @@ async def change_prompt_visibility(
 
 
 @router.get(
-    "/feed", response_model=list[UserPromptSubjectAndContents], tags=["prompts"]
+    "/feed",
+    response_model=Page[UserPromptSubjectAndContents],
+    response_class=ORJSONResponse,
+    tags=["prompts"],
 )
 async def get_feed(
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    list_of_follows = follows.get_follows_by_user_id(current_user.id, db)
-    feed = []
-    for follow in list_of_follows:
-        list_of_prompts = prompts.get_last_three_public_prompts_by_user_id(
-            follow.follow_id, db
-        )
-        for prompt in list_of_prompts:
-            prompt_subject_and_contents = prompts.get_prompt_contents(prompt.id, db)
-            feed.append(prompt_subject_and_contents)
-    return feed
+    feed, next_cursor = await timeline.get_feed(current_user.id, db, limit, cursor)
+    # Feed items are already plain dicts: skip response_model validation.
+    return ORJSONResponse({"items": feed, "next_cursor": next_cursor})
@@ -0,0 +1,77 @@
+import os
+import secrets
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from app import database
+from app.services import (
+    http_client,
+    llm_cache,
+    metrics,
+    principal_cache,
+    search_cache,
+)
+
+# Bearer token for the /stats endpoints and /metrics, which expose pool, cache
+# and traffic internals. Without it they answer 401 to everyone.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+bearer = HTTPBearer(auto_error=False)
+
+
+def require_metrics_token(
+    credentials: HTTPAuthorizationCredentials | None = Depends(bearer),
+):
+    if (
+        METRICS_TOKEN is None
+        or credentials is None
+        or not secrets.compare_digest(
+            credentials.credentials.encode(), METRICS_TOKEN.encode()
+        )
+    ):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+router = APIRouter(dependencies=[Depends(require_metrics_token)])
+
+
+@router.get("/stats/http", tags=["stats"], response_description="HTTP pool stats")
+async def get_http_pool_stats():
+    return http_client.pool_stats()
+
+
+@router.get(
+    "/stats/search-cache", tags=["stats"], response_description="Search cache stats"
+)
+async def get_search_cache_stats():
+    return search_cache.cache_stats()
+
+
+@router.get("/stats/llm-cache", tags=["stats"], response_description="LLM cache stats")
+async def get_llm_cache_stats():
+    return llm_cache.cache_stats()
+
+
+@router.get(
+    "/stats/principal-cache",
+    tags=["stats"],
+    response_description="Principal cache stats",
+)
+async def get_principal_cache_stats():
+    return principal_cache.cache_stats()
+
+
+@router.get("/stats/db", tags=["stats"], response_description="Database pool stats")
+async def get_db_pool_stats():
+    return database.pool_stats()
+
+
+@router.get("/metrics", tags=["stats"], response_description="Prometheus metrics")
+async def get_metrics():
+    return Response(generate_latest(metrics.registry), media_type=CONTENT_TYPE_LATEST)
@@ -1,34 +1,32 @@
 import os
 from fastapi import APIRouter
 from datetime import timedelta
-from typing import Annotated
+from typing import Annotated, Literal
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordRequestForm
-from app import models
-from app.database import SessionLocal, engine
-from sqlalchemy.orm import Session
+from app.crud.pagination import MAX_PAGE_SIZE, PAGE_SIZE
+from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.schemas.auth import Token
-from app.schemas.follows import Follow
-from app.schemas.users import User, UserCreate, UserWithSocialNetwork
-from app.services.auth import authenticate_user, create_access_token, get_current_user
+from app.schemas.follows import Follow, FollowCreate
+from app.schemas.pagination import Page
+from app.schemas.users import User, UserCreate, UserSummary, UserWithSocialNetwork
+from app.services.auth import (
+    async_authenticate_user,
+    create_access_token,
+    get_current_user,
+)
 from app.crud import follows, users
-
-models.Base.metadata.create_all(bind=engine)
+from app.services import timeline
 
 router = APIRouter()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 ACCESS_TOKEN_EXPIRE_MINUTES = float(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+FOLLOW_PAGE_SIZE = int(os.getenv("FOLLOW_PAGE_SIZE", "50"))
+FOLLOW_MAX_PAGE_SIZE = int(os.getenv("FOLLOW_MAX_PAGE_SIZE", "200"))
 
 
 @router.post(
@@ -37,16 +35,16 @@ ACCESS_TOKEN_EXPIRE_MINUTES = float(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
     status_code=status.HTTP_201_CREATED,
     tags=["users"],
 )
-async def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    return users.create_user(user, db)
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    return await users.async_create_user(user, db)
 
 
 @router.post("/token", response_model=Token, tags=["users"])
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    user = authenticate_user(form_data.username, form_data.password, db)
+    user = await async_authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -55,16 +53,20 @@ async def login_for_access_token(
         )
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "uid": user.id}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-@router.get("/users/all", response_model=list[User], tags=["users"])
+@router.get("/users/all", response_model=Page[User], tags=["users"])
 async def read_users(
-    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+    cursor: str | None = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
 ):
-    return users.get_users(db)
+    items, next_cursor = await users.async_get_users(db, limit, cursor)
+    return Page(items=items, next_cursor=next_cursor)
 
 
 @router.get(
@@ -72,10 +74,10 @@ async def read_users(
 )
 async def read_user(
     id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    return users.get_user(id, db)
+    return await users.async_get_user(id, db)
 
 
 @router.get(
@@ -83,10 +85,10 @@ async def read_user(
 )
 async def read_user(
     email: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    return users.get_user_by_email(email, db)
+    return await users.async_get_user_by_email(email, db)
 
 
 @router.get(
@@ -97,10 +99,10 @@ async def read_user(
 )
 async def read_user(
     username: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    return users.get_user_by_username(username, db)
+    return await users.async_get_user_by_username(username, db)
 
 
 @router.get(
@@ -110,13 +112,14 @@ async def read_user(
     name="Get Current User",
 )
 async def read_user(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
+    follows_count, followers_count = await follows.async_get_follow_counts(
+        current_user.id, db
+    )
     return UserWithSocialNetwork(
-        user=current_user,
-        follows=len(follows.get_follows_by_user_id(current_user.id, db)),
-        followers=len(follows.get_followers_by_user_id(current_user.id, db)),
+        user=current_user, follows=follows_count, followers=followers_count
     )
 
 
@@ -128,22 +131,17 @@ async def read_user(
 )
 async def follow_user(
     follow_username: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     if follow_username == current_user.username:
         raise HTTPException(status_code=400, detail="Cannot follow yourself")
-    followed_user = users.get_user_by_username(follow_username, db)
-    follow_exists = follows.get_follow_by_user_id_and_follow_id(
-        current_user.id, followed_user.id, db
-    )
-    if follow_exists != None:
-        raise HTTPException(status_code=409, detail="Follow already exists")
-    follow = follows.create_follow_by_username(
-        follow_username,
-        current_user.id,
-        db,
+    followed_user = await users.async_get_user_by_username(follow_username, db)
+    # The unique (user_id, follow_id) index turns a second follow into a 409.
+    follow = await follows.async_create_follow(
+        FollowCreate(user_id=current_user.id, follow_id=followed_user.id), db
     )
+    await timeline.backfill(current_user.id, followed_user.id, db)
     return follow
 
 
@@ -154,66 +152,87 @@ async def follow_user(
 )
 async def unfollow_user(
     follow_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    follows.delete_follow(current_user.id, follow_id, db)
+    await follows.async_delete_follow(current_user.id, follow_id, db)
+    await timeline.prune(current_user.id, follow_id, db)
     return {"message": "Unfollowed successfully user_id: {}".format(follow_id)}
 
 
 @router.get(
     "/users/follows/me",
-    response_model=list[User],
+    response_model=Page[User] | Page[UserSummary],
     tags=["users"],
     name="Get follows",
 )
 async def get_follows(
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    limit: int = Query(FOLLOW_PAGE_SIZE, ge=1, le=FOLLOW_MAX_PAGE_SIZE),
+    fields: Literal["all", "username"] = "all",
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    follow_list = follows.get_follows_by_user_id(current_user.id, db)
-    return [users.get_user(follow.follow_id, db) for follow in follow_list]
+    items, next_cursor = await follows.async_get_followed_users(
+        current_user.id, db, limit, cursor, usernames_only=fields == "username"
+    )
+    return Page(items=items, next_cursor=next_cursor)
 
 
 @router.get(
     "/users/follows/id/{user_id}",
-    response_model=list[User],
+    response_model=Page[User] | Page[UserSummary],
     tags=["users"],
     name="Get follows",
 )
 async def get_follows(
     user_id: int,
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    limit: int = Query(FOLLOW_PAGE_SIZE, ge=1, le=FOLLOW_MAX_PAGE_SIZE),
+    fields: Literal["all", "username"] = "all",
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    follow_list = follows.get_follows_by_user_id(user_id, db)
-    return [users.get_user(follow.follow_id, db) for follow in follow_list]
+    items, next_cursor = await follows.async_get_followed_users(
+        user_id, db, limit, cursor, usernames_only=fields == "username"
+    )
+    return Page(items=items, next_cursor=next_cursor)
 
 
 @router.get(
     "/users/followers/me",
-    response_model=list[User],
+    response_model=Page[User] | Page[UserSummary],
     tags=["users"],
     name="Get followers",
 )
 async def get_followers(
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    limit: int = Query(FOLLOW_PAGE_SIZE, ge=1, le=FOLLOW_MAX_PAGE_SIZE),
+    fields: Literal["all", "username"] = "all",
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    follower_list = follows.get_followers_by_user_id(current_user.id, db)
-    return [users.get_user(follower.user_id, db) for follower in follower_list]
+    items, next_cursor = await follows.async_get_follower_users(
+        current_user.id, db, limit, cursor, usernames_only=fields == "username"
+    )
+    return Page(items=items, next_cursor=next_cursor)
 
 
 @router.get(
     "/users/followers/id/{user_id}",
-    response_model=list[User],
+    response_model=Page[User] | Page[UserSummary],
     tags=["users"],
     name="Get followers",
 )
 async def get_followers(
     user_id: int,
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    limit: int = Query(FOLLOW_PAGE_SIZE, ge=1, le=FOLLOW_MAX_PAGE_SIZE),
+    fields: Literal["all", "username"] = "all",
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    follower_list = follows.get_followers_by_user_id(user_id, db)
-    return [users.get_user(follower.user_id, db) for follower in follower_list]
+    items, next_cursor = await follows.async_get_follower_users(
+        user_id, db, limit, cursor, usernames_only=fields == "username"
+    )
+    return Page(items=items, next_cursor=next_cursor)
@@ -17,6 +17,9 @@ class LLMResponse(BaseModel):
     deeper_subjects: list[Subject]
 
 
+# Bump whenever json_template changes so cached LLM responses are not reused.
+JSON_TEMPLATE_VERSION = 1
+
 json_template = """
 Generate a realistic advice in the following JSON format:
 ---
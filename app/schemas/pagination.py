@@ -0,0 +1,10 @@
+from typing import Generic, TypeVar
+
+from pydantic.generics import GenericModel
+
+Item = TypeVar("Item")
+
+
+class Page(GenericModel, Generic[Item]):
+    items: list[Item]
+    next_cursor: str | None = None
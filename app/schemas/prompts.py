@@ -10,12 +10,13 @@ class PromptBase(BaseModel):
 
 
 class PromptCreate(PromptBase):
-    pass
+    status: str = "ready"
 
 
 class Prompt(PromptBase):
     id: int
     created_at: datetime
+    status: str = "ready"
 
     class Config:
         orm_mode = True
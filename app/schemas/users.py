@@ -26,6 +26,14 @@ class User(UserBase):
         orm_mode = True
 
 
+class UserSummary(BaseModel):
+    id: int
+    username: str
+
+    class Config:
+        orm_mode = True
+
+
 class UserWithSocialNetwork(BaseModel):
     user: User
     follows: int
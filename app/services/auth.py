@@ -1,8 +1,11 @@
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Annotated
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from fastapi import Depends, HTTPException, status
@@ -11,11 +14,24 @@ from fastapi.security import OAuth2PasswordBearer
 from app import models
 from app.schemas.auth import TokenData
 from app.schemas.users import User
-from app.database import SessionLocal, engine
+from app.database import awaitable, get_db
+from app.services import principal_cache
 
-models.Base.metadata.create_all(bind=engine)
+# Each extra round doubles the cost of a hash; existing hashes keep their own.
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(
+    os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1))
+)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=PASSWORD_HASH_ROUNDS
+)
+
+# bcrypt releases the GIL, so one thread per core hashes in parallel while the
+# event loop keeps serving other requests. Extra hashes queue for a thread.
+password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -23,14 +39,6 @@ SECRET_KEY = os.getenv("AUTH_SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -39,10 +47,30 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+async def __run_in_password_pool__(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(
+        password_executor, fn, *args
+    )
+
+
+async def async_verify_password(plain_password, hashed_password):
+    return await __run_in_password_pool__(
+        verify_password, plain_password, hashed_password
+    )
+
+
+async def async_get_password_hash(password):
+    return await __run_in_password_pool__(get_password_hash, password)
+
+
 def get_user_by_username(username: str, db: Session):
     return db.query(models.User).filter(models.User.username == username).first()
 
 
+def get_user_by_id(user_id: int, db: Session):
+    return db.get(models.User, user_id)
+
+
 def authenticate_user(username: str, password: str, db: Session):
     user = get_user_by_username(username=username, db=db)
     if not user:
@@ -52,6 +80,21 @@ def authenticate_user(username: str, password: str, db: Session):
     return user
 
 
+async_get_user_by_username = awaitable(get_user_by_username)
+async_get_user_by_id = awaitable(get_user_by_id)
+
+
+async def async_authenticate_user(username: str, password: str, db: AsyncSession):
+    user = await async_get_user_by_username(username=username, db=db)
+    # Hand the connection back before waiting on the password pool.
+    await db.commit()
+    if not user:
+        return False
+    if not await async_verify_password(password, user.hashed_password):
+        return False
+    return user
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     if expires_delta:
@@ -64,7 +107,7 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
 
 
 async def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
 ) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -76,10 +119,25 @@ async def get_current_user(
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-        token_data = TokenData(username=username)
+        token_data = TokenData(username=username, user_id=payload.get("uid"))
     except JWTError:
         raise credentials_exception
-    user = get_user_by_username(db=db, username=token_data.username)
+
+    async def load_user():
+        if token_data.user_id is not None:
+            user = await async_get_user_by_id(token_data.user_id, db=db)
+        else:
+            # Tokens issued before they carried the user id.
+            user = await async_get_user_by_username(token_data.username, db=db)
+        # End the read so the connection goes back to the pool while the route
+        # waits on the LLM or search APIs; the route's next query checks out again.
+        await db.commit()
+        return None if user is None else User.from_orm(user)
+
+    if token_data.user_id is None:
+        user = await load_user()
+    else:
+        user = await principal_cache.get_or_load(token_data.user_id, load_user)
     if user is None:
         raise credentials_exception
     return user
@@ -88,6 +146,6 @@ async def get_current_user(
 async def get_current_active_user(
     current_user: Annotated[User, Depends(get_current_user)]
 ):
-    if current_user.disabled:
+    if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
@@ -1,3 +1,8 @@
+import asyncio
+import logging
+import os
+
+from fastapi import HTTPException
 from langchain.prompts import PromptTemplate
 from langchain.llms import OpenAI
 from langchain.chat_models import ChatOpenAI
@@ -9,8 +14,15 @@ from app.schemas.openai_response import (
     json_template,
     LLMResponse,
 )
+from app.services import metrics, tracing
+from app.services.singleflight import SingleFlight
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
 
 llm = OpenAI(temperature=0.4)
+fixing_llm = ChatOpenAI()
+response_parser = PydanticOutputParser(pydantic_object=LLMResponse)
+llm_calls = SingleFlight()
 
 
 def gpt_response(prompt: str) -> str:
@@ -38,21 +50,82 @@ def gpt_list_response(prompt: str) -> list:
     return output_list
 
 
-def gpt_json_response(prompt: str) -> dict:
+def json_response_chain() -> LLMChain:
     crafted_prompt = PromptTemplate(
         input_variables=["json_format", "subject"],
         template="{json_format} \n The advice is about {subject}.",
     )
-    chain = LLMChain(llm=llm, prompt=crafted_prompt)
-    ai_response = chain.run({"json_format": json_template, "subject": prompt})
-    parser = PydanticOutputParser(pydantic_object=LLMResponse)
+    return LLMChain(llm=llm, prompt=crafted_prompt)
+
 
+def __parse__(text: str) -> tuple[LLMResponse | None, Exception | None]:
+    """Parse LLM output; on failure return None and the error for the fixer."""
     try:
-        print("Trying to parse...")
-        res: LLMResponse = parser.parse(ai_response)
+        return response_parser.parse(text), None
     except Exception as e:
-        print("Error in JSON... Fixing...")
-        new_parser = OutputFixingParser.from_llm(parser=parser, llm=ChatOpenAI())
-        res = new_parser.parse(ai_response)
+        logging.info(f"LLM output did not parse, fixing it: {e}")
+        metrics.llm_parse_fallbacks.inc()
+        return None, e
+
+
+def __fix_input__(text: str, error: Exception) -> dict:
+    """Inputs of the fixing chain for output ``__parse__`` rejected."""
+    return {
+        "instructions": response_parser.get_format_instructions(),
+        "completion": text,
+        "error": repr(error),
+    }
+
+
+def __fixing_chain__() -> LLMChain:
+    # OutputFixingParser has no async parse, so both paths run its chain.
+    return OutputFixingParser.from_llm(
+        parser=response_parser, llm=fixing_llm
+    ).retry_chain
+
+
+@tracing.traced("gpt_json_response")
+def gpt_json_response(prompt: str) -> LLMResponse:
+    chain = json_response_chain()
+    ai_response = chain.run({"json_format": json_template, "subject": prompt})
 
+    res, error = __parse__(ai_response)
+    if error is not None:
+        fixed_response = __fixing_chain__().run(**__fix_input__(ai_response, error))
+        res = response_parser.parse(fixed_response)
     return res
+
+
+async def __with_timeout__(call, name: str):
+    try:
+        with tracing.span(f"llm.{name}", tracing.CLIENT), metrics.observe(
+            metrics.llm_request_seconds, call=name
+        ):
+            return await asyncio.wait_for(call, LLM_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="LLM call timed out")
+
+
+async def __async_gpt_json_response__(prompt: str) -> LLMResponse:
+    chain = json_response_chain()
+    ai_response = await __with_timeout__(
+        chain.arun({"json_format": json_template, "subject": prompt}), "generate"
+    )
+
+    res, error = __parse__(ai_response)
+    if error is not None:
+        fixed_response = await __with_timeout__(
+            __fixing_chain__().arun(**__fix_input__(ai_response, error)), "fix"
+        )
+        res = response_parser.parse(fixed_response)
+    return res
+
+
+@tracing.traced("gpt_json_response")
+async def async_gpt_json_response(prompt: str) -> LLMResponse:
+    """Async version of ``gpt_json_response`` that never blocks the event loop.
+
+    Each upstream call is bounded by ``LLM_TIMEOUT`` and concurrent requests
+    for the same prompt share a single generation.
+    """
+    return await llm_calls.do(prompt, lambda: __async_gpt_json_response__(prompt))
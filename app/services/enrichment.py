@@ -0,0 +1,200 @@
+import asyncio
+import json
+import logging
+import os
+
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.crud import prompts, response_prompt
+from app.database import AsyncSessionLocal
+from app.services import job_queue, redis_client, timeline, tracing
+from app.services.chatgpt import async_gpt_json_response
+from app.services.llm_cache import get_or_generate
+from app.services.search import search_subjects
+
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+JOB_POLL_TIMEOUT = float(os.getenv("JOB_POLL_TIMEOUT", "5"))
+# Jobs recovered from dead workers this many times fail their prompt instead.
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Pause before retrying the queue after a Redis error.
+JOB_QUEUE_RETRY_DELAY = float(os.getenv("JOB_QUEUE_RETRY_DELAY", "1"))
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+STATUS_CHANNEL = "prompts:status"
+
+local_worker: asyncio.Task | None = None
+
+
+async def enqueue(prompt_id: int):
+    await job_queue.get_queue().push({"prompt_id": prompt_id})
+
+
+async def __notify__(prompt_id: int, status: str):
+    if redis_client.client is None:
+        return
+    try:
+        await redis_client.client.publish(
+            STATUS_CHANNEL, json.dumps({"prompt_id": prompt_id, "status": status})
+        )
+    except RedisError as exc:
+        logging.warning(f"Prompt status notification failed: {exc}")
+
+
+async def __fail__(prompt_id: int, db: AsyncSession):
+    await db.rollback()
+    await prompts.async_set_prompt_status(prompt_id, FAILED, db)
+    await __notify__(prompt_id, FAILED)
+
+
+async def enrich_prompt(prompt_id: int, db: AsyncSession) -> str:
+    """Generate the subjects of a pending prompt and store their contents.
+
+    The prompt ends up ready, or failed if the LLM or the searches fail, and
+    its new status is published on ``STATUS_CHANNEL`` when Redis is set up.
+    A cancelled enrichment leaves the prompt pending for its redelivered job.
+    Prompts that are no longer pending, like redelivered jobs that already
+    ran, are left alone; a retried prompt's earlier results are replaced.
+    """
+    db_prompt = await prompts.async_get_prompt_by_id(prompt_id, db)
+    if db_prompt.status != PENDING:
+        return db_prompt.status
+    try:
+        ai_response = await get_or_generate(
+            db_prompt.title, lambda: async_gpt_json_response(db_prompt.title)
+        )
+        db_prompt = await prompts.async_set_prompt_status(
+            prompt_id, PENDING, db, keywords=ai_response.main_subject_of_the_prompt
+        )
+        # A job redelivered after a crash may have stored results already.
+        await response_prompt.async_delete_response_prompts_by_prompt_id(prompt_id, db)
+        await search_subjects(
+            db_prompt,
+            ai_response.basic_subjects + ai_response.deeper_subjects,
+            db,
+            user_id=db_prompt.user_id,
+        )
+        db_prompt = await prompts.async_set_prompt_status(prompt_id, READY, db)
+    except asyncio.CancelledError:
+        logging.warning(f"Enrichment of prompt {prompt_id} cancelled")
+        await db.rollback()
+        raise
+    except Exception:
+        logging.exception(f"Enrichment of prompt {prompt_id} failed")
+        await __fail__(prompt_id, db)
+        return FAILED
+    await timeline.fan_out_prompt(db_prompt, db)
+    await __notify__(prompt_id, READY)
+    return READY
+
+
+async def __pop__(queue) -> dict | None:
+    try:
+        return await queue.pop(JOB_POLL_TIMEOUT)
+    except RedisError as exc:
+        logging.warning(f"Job queue pop failed: {exc}")
+        await asyncio.sleep(JOB_QUEUE_RETRY_DELAY)
+        return None
+
+
+async def __ack__(queue, job: dict):
+    # An unacknowledged job is only redelivered once this worker dies, so keep
+    # trying.
+    while True:
+        try:
+            await queue.ack(job)
+            return
+        except RedisError as exc:
+            logging.warning(f"Job queue ack failed: {exc}")
+            await asyncio.sleep(JOB_QUEUE_RETRY_DELAY)
+
+
+async def __consume__(queue, session_factory: async_sessionmaker):
+    while True:
+        job = await __pop__(queue)
+        if job is None:
+            continue
+        with tracing.start_trace(
+            "enrich_prompt", kind=tracing.CONSUMER, prompt_id=job["prompt_id"]
+        ):
+            async with session_factory() as db:
+                try:
+                    if job.get("attempts", 0) >= JOB_MAX_ATTEMPTS:
+                        logging.error(f"Job {job} failed after too many attempts")
+                        await __fail__(job["prompt_id"], db)
+                    else:
+                        await enrich_prompt(job["prompt_id"], db)
+                except Exception:
+                    logging.exception(f"Job {job} failed")
+        # Cancelled jobs skip this and are redelivered.
+        await __ack__(queue, job)
+
+
+async def __keep_lease__(queue):
+    while True:
+        try:
+            await queue.heartbeat()
+            recovered = await queue.recover()
+            if recovered:
+                logging.warning(f"Requeued {recovered} jobs of dead workers")
+        except RedisError as exc:
+            logging.warning(f"Job queue lease refresh failed: {exc}")
+        await asyncio.sleep(job_queue.JOB_LEASE_TTL / 3)
+
+
+async def run_worker(
+    queue,
+    session_factory: async_sessionmaker = AsyncSessionLocal,
+    concurrency: int = JOB_WORKER_CONCURRENCY,
+):
+    """Enrich prompts from ``queue``, ``concurrency`` jobs at a time, forever.
+
+    Jobs are acknowledged once handled. A worker killed or cancelled mid-job
+    leaves its jobs to be requeued by the others once its lease expires, and
+    Redis errors are retried instead of stopping the worker.
+    """
+    await queue.heartbeat()
+    await asyncio.gather(
+        __keep_lease__(queue),
+        *(__consume__(queue, session_factory) for _ in range(concurrency)),
+    )
+
+
+async def requeue_pending_prompts(
+    queue, session_factory: async_sessionmaker = AsyncSessionLocal
+) -> int:
+    """Queue again the prompts still pending, whose jobs died with a process."""
+    async with session_factory() as db:
+        prompt_ids = await prompts.async_get_prompt_ids_by_status(PENDING, db)
+    for prompt_id in prompt_ids:
+        await queue.push({"prompt_id": prompt_id})
+    return len(prompt_ids)
+
+
+async def __run_local_worker__():
+    requeued = await requeue_pending_prompts(job_queue.local_queue)
+    if requeued:
+        logging.info(f"Requeued {requeued} pending prompts")
+    await run_worker(job_queue.local_queue)
+
+
+def start_local_worker():
+    """Run the worker inside the API when there is no Redis queue to share."""
+    global local_worker
+    if redis_client.client is None and local_worker is None:
+        local_worker = asyncio.create_task(__run_local_worker__())
+        logging.info("Local enrichment worker started")
+
+
+async def stop_local_worker():
+    global local_worker
+    if local_worker is not None:
+        local_worker.cancel()
+        try:
+            await local_worker
+        except asyncio.CancelledError:
+            pass
+        local_worker = None
@@ -0,0 +1,106 @@
+import logging
+import os
+import time
+from dataclasses import dataclass
+
+import httpx
+
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "5"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "5"))
+
+
+@dataclass
+class RequestCounters:
+    requests_total: int = 0
+    request_errors: int = 0
+    requests_in_flight: int = 0
+    max_requests_in_flight: int = 0
+    request_seconds_total: float = 0.0
+
+
+client: httpx.AsyncClient | None = None
+counters = RequestCounters()
+
+
+def create_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=HTTP2_ENABLED,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            HTTP_READ_TIMEOUT,
+            connect=HTTP_CONNECT_TIMEOUT,
+            pool=HTTP_POOL_TIMEOUT,
+        ),
+    )
+
+
+def open_client() -> httpx.AsyncClient:
+    global client
+    if client is None:
+        client = create_client()
+        logging.info("HTTP client opened")
+    return client
+
+
+async def close_client():
+    global client
+    if client is not None:
+        await client.aclose()
+        client = None
+        logging.warning("HTTP client closed")
+
+
+async def get(url: str, params: dict) -> httpx.Response:
+    """GET through the app-lifetime client, or a one-off client outside the app."""
+    counters.requests_total += 1
+    counters.requests_in_flight += 1
+    counters.max_requests_in_flight = max(
+        counters.max_requests_in_flight, counters.requests_in_flight
+    )
+    start = time.perf_counter()
+    try:
+        if client is not None:
+            return await client.get(url, params=params)
+        async with create_client() as one_off_client:
+            return await one_off_client.get(url, params=params)
+    except Exception:
+        counters.request_errors += 1
+        raise
+    finally:
+        counters.requests_in_flight -= 1
+        counters.request_seconds_total += time.perf_counter() - start
+
+
+def pool_stats() -> dict:
+    stats = {
+        "open": client is not None,
+        "http2": HTTP2_ENABLED,
+        "max_connections": HTTP_MAX_CONNECTIONS,
+        "max_keepalive_connections": HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        "connections": 0,
+        "idle_connections": 0,
+        "http2_connections": 0,
+        "requests_total": counters.requests_total,
+        "request_errors": counters.request_errors,
+        "requests_in_flight": counters.requests_in_flight,
+        "max_requests_in_flight": counters.max_requests_in_flight,
+        "request_seconds_total": round(counters.request_seconds_total, 6),
+    }
+    # httpx does not expose its connection pool, so read it off the transport.
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    for connection in getattr(pool, "connections", []):
+        stats["connections"] += 1
+        if connection.is_idle():
+            stats["idle_connections"] += 1
+        if "HTTP/2" in connection.info():
+            stats["http2_connections"] += 1
+    return stats
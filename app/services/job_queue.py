@@ -0,0 +1,129 @@
+import asyncio
+import json
+import os
+import uuid
+
+from redis import asyncio as aioredis
+
+from app.services import redis_client
+
+JOB_QUEUE_KEY = os.getenv("JOB_QUEUE_KEY", "jobs:curious")
+# A worker that has not refreshed its lease for this long is considered dead
+# and the jobs it was running go back on the queue.
+JOB_LEASE_TTL = int(os.getenv("JOB_LEASE_TTL", "60"))
+
+
+class RedisJobQueue:
+    """FIFO of JSON jobs on a Redis list, shared by the API and the workers.
+
+    Delivery is at least once: a popped job moves to this worker's processing
+    list until it is acknowledged. While the worker is alive it keeps a lease
+    key fresh; once the lease expires, ``recover`` run by any other worker
+    puts its unacknowledged jobs back on the queue with ``attempts`` raised.
+    """
+
+    def __init__(self, client: aioredis.Redis, key: str = JOB_QUEUE_KEY):
+        self.client = client
+        self.key = key
+        self.worker_id = uuid.uuid4().hex
+
+    def __processing_key__(self, worker_id: str) -> str:
+        return f"{self.key}:processing:{worker_id}"
+
+    def __lease_key__(self, worker_id: str) -> str:
+        return f"{self.key}:lease:{worker_id}"
+
+    async def push(self, job: dict):
+        await self.client.lpush(self.key, json.dumps(job))
+
+    async def pop(self, timeout: float) -> dict | None:
+        item = await self.client.blmove(
+            self.key,
+            self.__processing_key__(self.worker_id),
+            timeout,
+            src="RIGHT",
+            dest="LEFT",
+        )
+        return None if item is None else json.loads(item)
+
+    async def ack(self, job: dict):
+        await self.client.lrem(
+            self.__processing_key__(self.worker_id), 1, json.dumps(job)
+        )
+
+    async def size(self) -> int:
+        return await self.client.llen(self.key)
+
+    async def heartbeat(self):
+        # Lease first, so no other worker sees this one listed without it.
+        await self.client.set(self.__lease_key__(self.worker_id), 1, ex=JOB_LEASE_TTL)
+        await self.client.sadd(f"{self.key}:workers", self.worker_id)
+
+    async def recover(self) -> int:
+        """Requeue the jobs of workers whose lease expired; returns how many."""
+        recovered = 0
+        for worker_id in await self.client.smembers(f"{self.key}:workers"):
+            if isinstance(worker_id, bytes):
+                worker_id = worker_id.decode()
+            if worker_id == self.worker_id or await self.client.exists(
+                self.__lease_key__(worker_id)
+            ):
+                continue
+            # Only the worker that removes the dead one from the set requeues.
+            if not await self.client.srem(f"{self.key}:workers", worker_id):
+                continue
+            processing_key = self.__processing_key__(worker_id)
+            jobs = [
+                json.loads(item)
+                for item in await self.client.lrange(processing_key, 0, -1)
+            ]
+            for job in jobs:
+                job["attempts"] = job.get("attempts", 0) + 1
+            if jobs:
+                # Back at the head of the queue, oldest first.
+                await self.client.rpush(self.key, *(json.dumps(job) for job in jobs))
+            await self.client.delete(processing_key)
+            recovered += len(jobs)
+        return recovered
+
+
+class MemoryJobQueue:
+    """In-process stand-in for ``RedisJobQueue``, for tests and Redis-less runs.
+
+    Jobs live only as long as the process; the local worker requeues prompts
+    left pending when it starts again.
+    """
+
+    def __init__(self):
+        self._jobs: asyncio.Queue[dict] = asyncio.Queue()
+
+    async def push(self, job: dict):
+        self._jobs.put_nowait(job)
+
+    async def pop(self, timeout: float) -> dict | None:
+        try:
+            return await asyncio.wait_for(self._jobs.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def ack(self, job: dict):
+        pass
+
+    async def size(self) -> int:
+        return self._jobs.qsize()
+
+    async def heartbeat(self):
+        pass
+
+    async def recover(self) -> int:
+        return 0
+
+
+local_queue = MemoryJobQueue()
+
+
+def get_queue() -> RedisJobQueue | MemoryJobQueue:
+    """The Redis queue when Redis is configured, the in-process one otherwise."""
+    if redis_client.client is not None:
+        return RedisJobQueue(redis_client.client)
+    return local_queue
@@ -0,0 +1,54 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+HOST_ALIASES = {
+    "youtu.be": "youtube.com",
+    "old.reddit.com": "reddit.com",
+    "new.reddit.com": "reddit.com",
+    "x.com": "twitter.com",
+}
+HOST_PREFIXES = ("www.", "m.", "mobile.")
+TRACKING_PARAMS = {"fbclid", "gclid", "igshid", "ref_src", "si"}
+
+
+def __canonical_host__(host: str) -> str:
+    host = host.lower().rstrip(".")
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix) :]
+            break
+    return HOST_ALIASES.get(host, host)
+
+
+def canonicalize_link(link: str) -> str:
+    """Return a stable form of ``link`` so the same page is stored only once.
+
+    Scheme, host aliases, tracking parameters, fragments and trailing slashes
+    are normalized; YouTube video links keep only their video id and Reddit
+    and Twitter links drop their query string.
+    """
+    parts = urlsplit(link.strip())
+    if not parts.netloc:
+        return link.strip()
+    original_host = parts.netloc.lower()
+    host = __canonical_host__(parts.hostname or "")
+    path = parts.path.rstrip("/") or "/"
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.startswith("utm_") and key not in TRACKING_PARAMS
+    ]
+
+    if host == "youtube.com":
+        video_id = None
+        if original_host.endswith("youtu.be"):
+            video_id = path.strip("/")
+        elif path.startswith("/shorts/") or path.startswith("/embed/"):
+            video_id = path.split("/")[2]
+        elif path == "/watch":
+            video_id = dict(query).get("v")
+        if video_id:
+            path, query = "/watch", [("v", video_id)]
+    elif host in ("reddit.com", "twitter.com"):
+        query = []
+
+    return urlunsplit(("https", host, path, urlencode(sorted(query)), ""))
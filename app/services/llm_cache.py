@@ -0,0 +1,135 @@
+import hashlib
+import logging
+import os
+import zlib
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from redis.exceptions import LockError, RedisError
+
+from app.schemas.openai_response import LLMResponse, JSON_TEMPLATE_VERSION
+from app.services import redis_client
+from app.services.singleflight import SingleFlight
+
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "604800"))
+LLM_CACHE_LOCK_TIMEOUT = float(os.getenv("LLM_CACHE_LOCK_TIMEOUT", "90"))
+LLM_CACHE_LOCK_WAIT = float(os.getenv("LLM_CACHE_LOCK_WAIT", "60"))
+
+KEY_PREFIX = "llm:"
+
+
+@dataclass
+class CacheCounters:
+    hits: int = 0
+    misses: int = 0
+    redis_errors: int = 0
+
+
+in_flight = SingleFlight()
+counters = CacheCounters()
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.casefold().split())
+
+
+def cache_key(prompt: str) -> str:
+    digest = hashlib.sha256(normalize_prompt(prompt).encode()).hexdigest()
+    return f"{KEY_PREFIX}v{JSON_TEMPLATE_VERSION}:{digest}"
+
+
+def encode(response: LLMResponse) -> bytes:
+    return zlib.compress(response.json().encode())
+
+
+def decode(payload: bytes) -> LLMResponse:
+    return LLMResponse.parse_raw(zlib.decompress(payload))
+
+
+async def __get__(key: str) -> LLMResponse | None:
+    try:
+        payload = await redis_client.client.get(key)
+    except RedisError as exc:
+        counters.redis_errors += 1
+        logging.warning(f"LLM cache read failed: {exc}")
+        return None
+    return None if payload is None else decode(payload)
+
+
+async def __set__(key: str, response: LLMResponse):
+    try:
+        await redis_client.client.set(key, encode(response), ex=LLM_CACHE_TTL)
+    except RedisError as exc:
+        counters.redis_errors += 1
+        logging.warning(f"LLM cache write failed: {exc}")
+
+
+async def __load__(
+    key: str, generate: Callable[[], Awaitable[LLMResponse]]
+) -> LLMResponse:
+    if redis_client.client is None:
+        counters.misses += 1
+        return await generate()
+
+    response = await __get__(key)
+    if response is not None:
+        counters.hits += 1
+        logging.info("Cache hit")
+        return response
+
+    # Only the lock holder calls the LLM on a cold key; the other workers
+    # wait for it and read its result instead.
+    lock = redis_client.client.lock(
+        f"{key}:lock",
+        timeout=LLM_CACHE_LOCK_TIMEOUT,
+        blocking_timeout=LLM_CACHE_LOCK_WAIT,
+    )
+    try:
+        acquired = await lock.acquire()
+    except RedisError as exc:
+        counters.redis_errors += 1
+        logging.warning(f"LLM cache lock failed: {exc}")
+        acquired = False
+    try:
+        # Whether we hold the lock or gave up waiting, another worker may
+        # have filled the key in the meantime.
+        response = await __get__(key)
+        if response is not None:
+            counters.hits += 1
+            logging.info("Cache hit")
+            return response
+        counters.misses += 1
+        logging.info("Cache miss")
+        response = await generate()
+        await __set__(key, response)
+        return response
+    finally:
+        if acquired:
+            try:
+                await lock.release()
+            except (LockError, RedisError) as exc:
+                logging.warning(f"LLM cache lock release failed: {exc}")
+
+
+async def get_or_generate(
+    prompt: str, generate: Callable[[], Awaitable[LLMResponse]]
+) -> LLMResponse:
+    """Return the cached ``LLMResponse`` for ``prompt``, generating it on a miss.
+
+    Prompts are compared after case and whitespace normalization, and keys
+    include ``JSON_TEMPLATE_VERSION`` so a template change starts a fresh
+    cache. Payloads are zlib-compressed JSON with a ``LLM_CACHE_TTL`` expiry.
+    """
+    key = cache_key(prompt)
+    return await in_flight.do(key, lambda: __load__(key, generate))
+
+
+def cache_stats() -> dict:
+    lookups = counters.hits + counters.misses
+    return {
+        "hits": counters.hits,
+        "misses": counters.misses,
+        "hit_ratio": counters.hits / lookups if lookups else 0.0,
+        "coalesced": in_flight.coalesced,
+        "redis_errors": counters.redis_errors,
+    }
@@ -0,0 +1,184 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    PlatformCollector,
+    ProcessCollector,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.requests import Request
+from starlette.routing import Match
+
+from app import database
+from app.services import http_client, llm_cache, principal_cache, search_cache
+
+# Each worker process keeps its own registry, so scrape every worker.
+registry = CollectorRegistry()
+ProcessCollector(registry=registry)
+PlatformCollector(registry=registry)
+
+UPSTREAM_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+http_request_seconds = Histogram(
+    "curious_http_request_seconds",
+    "Time to the response headers, by route template.",
+    ["method", "route", "status"],
+    registry=registry,
+)
+http_requests_in_flight = Gauge(
+    "curious_http_requests_in_flight",
+    "Requests being handled, by route template.",
+    ["method", "route"],
+    registry=registry,
+)
+search_request_seconds = Histogram(
+    "curious_search_request_seconds",
+    "Google CSE call latency, cache misses only.",
+    ["source"],
+    buckets=UPSTREAM_BUCKETS,
+    registry=registry,
+)
+search_errors = Counter(
+    "curious_search_errors",
+    "Failed Google CSE calls.",
+    ["source", "error"],
+    registry=registry,
+)
+llm_request_seconds = Histogram(
+    "curious_llm_request_seconds",
+    "LLM call latency; call is generate or fix for the parse fallback.",
+    ["call"],
+    buckets=UPSTREAM_BUCKETS,
+    registry=registry,
+)
+llm_parse_fallbacks = Counter(
+    "curious_llm_parse_fallbacks",
+    "LLM outputs that failed to parse and were sent to the fixing LLM.",
+    registry=registry,
+)
+trace_spans_dropped = Counter(
+    "curious_trace_spans_dropped",
+    "Finished spans dropped by a full queue or a failed export.",
+    registry=registry,
+)
+
+
+def route_template(request: Request) -> str:
+    """The path template of the route ``request`` matches, like /prompts/{id}.
+
+    Raw paths would give every prompt id its own time series.
+    """
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+@contextmanager
+def observe(histogram: Histogram, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - start)
+
+
+class StatsCollector:
+    """Exposes the counters behind the /stats endpoints at scrape time."""
+
+    def collect(self):
+        llm = llm_cache.cache_stats()
+        yield CounterMetricFamily(
+            "curious_llm_cache_hits", "LLM cache hits.", value=llm["hits"]
+        )
+        yield CounterMetricFamily(
+            "curious_llm_cache_misses", "LLM cache misses.", value=llm["misses"]
+        )
+        yield GaugeMetricFamily(
+            "curious_llm_cache_hit_ratio",
+            "LLM cache hits over lookups since the worker started.",
+            value=llm["hit_ratio"],
+        )
+        yield CounterMetricFamily(
+            "curious_llm_cache_coalesced",
+            "LLM generations shared by concurrent identical prompts.",
+            value=llm["coalesced"],
+        )
+
+        for name, stats in (
+            ("search", search_cache.cache_stats()),
+            ("principal", principal_cache.cache_stats()),
+        ):
+            lookups = CounterMetricFamily(
+                f"curious_{name}_cache_lookups",
+                f"{name.capitalize()} cache lookups by result.",
+                labels=["result"],
+            )
+            for result in ["local_hits", "redis_hits", "misses"]:
+                lookups.add_metric([result.removesuffix("s")], stats[result])
+            yield lookups
+            yield GaugeMetricFamily(
+                f"curious_{name}_cache_local_entries",
+                f"Entries in the in-process {name} cache.",
+                value=stats["local_entries"],
+            )
+
+        http = http_client.pool_stats()
+        yield GaugeMetricFamily(
+            "curious_http_pool_connections",
+            "Open upstream HTTP connections.",
+            value=http["connections"],
+        )
+        yield GaugeMetricFamily(
+            "curious_http_pool_idle_connections",
+            "Idle upstream HTTP connections.",
+            value=http["idle_connections"],
+        )
+
+        pools = database.pool_stats()
+        families = {
+            "checked_out": GaugeMetricFamily(
+                "curious_db_pool_checked_out",
+                "Connections checked out of the pool.",
+                labels=["pool"],
+            ),
+            "capacity": GaugeMetricFamily(
+                "curious_db_pool_capacity",
+                "Pool size plus overflow; absent for SQLite.",
+                labels=["pool"],
+            ),
+            "checkouts": CounterMetricFamily(
+                "curious_db_pool_checkouts", "Pool checkouts.", labels=["pool"]
+            ),
+            "checkout_timeouts": CounterMetricFamily(
+                "curious_db_pool_checkout_timeouts",
+                "Checkouts that gave up waiting for a connection.",
+                labels=["pool"],
+            ),
+            "checkout_wait_seconds_total": CounterMetricFamily(
+                "curious_db_pool_checkout_wait_seconds",
+                "Time spent waiting for a connection.",
+                labels=["pool"],
+            ),
+            "connects": CounterMetricFamily(
+                "curious_db_pool_connects", "New connections.", labels=["pool"]
+            ),
+            "invalidations": CounterMetricFamily(
+                "curious_db_pool_invalidations",
+                "Invalidated connections.",
+                labels=["pool"],
+            ),
+        }
+        for pool, stats in pools.items():
+            for key, family in families.items():
+                if stats[key] is not None:
+                    family.add_metric([pool], stats[key])
+        yield from families.values()
+
+
+registry.register(StatsCollector())
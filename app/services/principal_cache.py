@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app import models
+from app.schemas.users import User
+from app.services import redis_client
+from app.services.search_cache import LRUCache
+
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+# Bounds how long a lookup racing an invalidation can keep a stale user.
+PRINCIPAL_CACHE_REDIS_TTL = int(os.getenv("PRINCIPAL_CACHE_REDIS_TTL", "60"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "4096"))
+
+KEY_PREFIX = "principal:v1:"
+# Session.info key of the users written in the session's transaction.
+WRITTEN_USERS = "principal_cache_written_users"
+
+
+@dataclass
+class CacheCounters:
+    local_hits: int = 0
+    redis_hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+    redis_errors: int = 0
+
+
+local_cache = LRUCache(PRINCIPAL_CACHE_MAX_ENTRIES)
+counters = CacheCounters()
+pending_invalidations: set[asyncio.Task] = set()
+
+
+def cache_key(user_id: int) -> str:
+    return f"{KEY_PREFIX}{user_id}"
+
+
+async def __redis_get__(key: str) -> User | None:
+    if redis_client.client is None:
+        return None
+    try:
+        cached = await redis_client.client.get(key)
+        return None if cached is None else User.parse_raw(cached)
+    except (RedisError, ValueError) as exc:
+        # A corrupt or legacy value is a miss, reloaded and overwritten.
+        counters.redis_errors += 1
+        logging.warning(f"Principal cache read failed: {exc}")
+        return None
+
+
+async def __redis_set__(key: str, user: User):
+    if redis_client.client is None:
+        return
+    try:
+        await redis_client.client.set(key, user.json(), ex=PRINCIPAL_CACHE_REDIS_TTL)
+    except RedisError as exc:
+        counters.redis_errors += 1
+        logging.warning(f"Principal cache write failed: {exc}")
+
+
+async def get_or_load(
+    user_id: int, load: Callable[[], Awaitable[User | None]]
+) -> User | None:
+    """Return the authenticated user for ``user_id``, loading it on a miss.
+
+    Entries live ``PRINCIPAL_CACHE_TTL`` seconds in this worker and
+    ``PRINCIPAL_CACHE_REDIS_TTL`` seconds in Redis. Unknown users are not
+    cached.
+    """
+    key = cache_key(user_id)
+    user = local_cache.get(key)
+    if user is not None:
+        counters.local_hits += 1
+        return user
+    user = await __redis_get__(key)
+    if user is not None:
+        counters.redis_hits += 1
+    else:
+        counters.misses += 1
+        user = await load()
+        if user is None:
+            return None
+        await __redis_set__(key, user)
+    local_cache.set(key, user, PRINCIPAL_CACHE_TTL)
+    return user
+
+
+async def invalidate(user_id: int):
+    """Forget a user everywhere; call it when a user is changed or deactivated.
+
+    Other workers drop their own copy when its ``PRINCIPAL_CACHE_TTL`` ends.
+    """
+    key = cache_key(user_id)
+    local_cache.pop(key)
+    counters.invalidations += 1
+    if redis_client.client is None:
+        return
+    try:
+        await redis_client.client.delete(key)
+    except RedisError as exc:
+        counters.redis_errors += 1
+        logging.warning(f"Principal cache invalidation failed: {exc}")
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def __record_write__(mapper, connection, target: models.User):
+    # Flushes run before the commit: invalidating here would let a request
+    # re-cache the old row before the new one is visible.
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(WRITTEN_USERS, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def __invalidate_on_commit__(session: Session):
+    # Commits run in sync code, so the Redis delete is left to the event loop
+    # when there is one; the local entry goes right away.
+    for user_id in session.info.pop(WRITTEN_USERS, ()):
+        local_cache.pop(cache_key(user_id))
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            continue
+        task = loop.create_task(invalidate(user_id))
+        pending_invalidations.add(task)
+        task.add_done_callback(pending_invalidations.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def __forget_writes__(session: Session):
+    session.info.pop(WRITTEN_USERS, None)
+
+
+def cache_stats() -> dict:
+    return {
+        "local_entries": len(local_cache),
+        "local_hits": counters.local_hits,
+        "redis_hits": counters.redis_hits,
+        "misses": counters.misses,
+        "invalidations": counters.invalidations,
+        "redis_errors": counters.redis_errors,
+    }
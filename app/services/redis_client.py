@@ -0,0 +1,33 @@
+import logging
+import os
+
+from redis import asyncio as aioredis
+
+REDIS_HOST = os.getenv("REDIS_HOST")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_DB = int(os.getenv("REDIS_DB", "0"))
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
+
+client: aioredis.Redis | None = None
+
+
+def open_client() -> aioredis.Redis | None:
+    """Open the shared async Redis client, if Redis is configured."""
+    global client
+    if client is None and REDIS_HOST:
+        client = aioredis.Redis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            password=REDIS_PASSWORD,
+        )
+        logging.info("Redis client opened")
+    return client
+
+
+async def close_client():
+    global client
+    if client is not None:
+        await client.close()
+        client = None
+        logging.warning("Redis client closed")
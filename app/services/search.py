@@ -1,16 +1,18 @@
 import os
 import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 import httpx
-from app.crud import contents, response_prompt
+from app.crud import contents
+from app.crud.serialization import to_dict
+from app.schemas.openai_response import Subject
 from app.schemas.prompts import Prompt
-from app.schemas.response_prompt import ResponsePromptCreate
-from sqlalchemy.orm import Session
+from app.services import http_client, metrics, search_cache, tracing
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.schemas.contents import (
-    Content,
-    ContentBase,
-    PromptSubjectAndContents,
-)
+from app.schemas.contents import ContentCreate
 
 SEARCH_API_KEY = os.getenv("SEARCH_API_KEY")
 YOUTUBE_SEARCH_ENGINE_ID = os.getenv("YOUTUBE_SEARCH_ENGINE_ID")
@@ -18,9 +20,54 @@ REDDIT_SEARCH_ENGINE_ID = os.getenv("REDDIT_SEARCH_ENGINE_ID")
 TWITTER_SEARCH_ENGINE_ID = os.getenv("TWITTER_SEARCH_ENGINE_ID")
 
 BASE_URL = "https://www.googleapis.com/customsearch/v1"
+SEARCH_NUM_RESULTS = 2
+
+SEARCH_SOURCES = [
+    ("youtube", YOUTUBE_SEARCH_ENGINE_ID),
+    ("reddit", REDDIT_SEARCH_ENGINE_ID),
+    ("twitter", TWITTER_SEARCH_ENGINE_ID),
+]
+
+SEARCH_MAX_CONCURRENCY = int(os.getenv("SEARCH_MAX_CONCURRENCY", "24"))
+SEARCH_MAX_CONCURRENCY_PER_USER = int(os.getenv("SEARCH_MAX_CONCURRENCY_PER_USER", "6"))
+
+
+class SearchLimiter:
+    """Caps the number of in-flight upstream searches, globally and per user."""
+
+    def __init__(self, max_concurrency: int, max_concurrency_per_user: int):
+        self.max_concurrency = max_concurrency
+        self.max_concurrency_per_user = max_concurrency_per_user
+        self._global = asyncio.Semaphore(max_concurrency)
+        # Entries disappear once no search of that user holds the semaphore.
+        self._per_user: weakref.WeakValueDictionary[int, asyncio.Semaphore] = (
+            weakref.WeakValueDictionary()
+        )
+
+    def _user_semaphore(self, user_id: int) -> asyncio.Semaphore:
+        semaphore = self._per_user.get(user_id)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency_per_user)
+            self._per_user[user_id] = semaphore
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self, user_id: int | None = None):
+        if user_id is None:
+            async with self._global:
+                yield
+            return
+        # Wait on the user's own quota first so a busy user never sits on
+        # global slots that other users could be using.
+        async with self._user_semaphore(user_id):
+            async with self._global:
+                yield
+
+
+search_limiter = SearchLimiter(SEARCH_MAX_CONCURRENCY, SEARCH_MAX_CONCURRENCY_PER_USER)
 
 
-async def __parse_results__(search_items, source) -> list[ContentBase]:
+async def __parse_results__(search_items, source) -> list[ContentCreate]:
     cleaned_results = []
     for search_item in search_items:
         try:
@@ -30,9 +77,9 @@ async def __parse_results__(search_items, source) -> list[ContentBase]:
             image = search_item["pagemap"]["metatags"][0].get("og:image", "N/A")
             title = search_item.get("title", "N/A")
             snippet = search_item.get("snippet", "N/A")
-            link = search_item.get("link", "N/A")
+            link = search_item["link"]
             cleaned_results.append(
-                ContentBase(
+                ContentCreate(
                     title=title,
                     snippet=snippet,
                     link=link,
@@ -46,88 +93,190 @@ async def __parse_results__(search_items, source) -> list[ContentBase]:
     return cleaned_results
 
 
+def __source_of__(search_engine_id: str) -> str:
+    for source, engine_id in SEARCH_SOURCES:
+        if engine_id == search_engine_id:
+            return source
+    return "unknown"
+
+
+async def __fetch_search__(query: str, search_engine_id: str) -> list:
+    source = __source_of__(search_engine_id)
+    params = {
+        "key": SEARCH_API_KEY,
+        "cx": search_engine_id,
+        "q": query,
+        "start": 1,
+        "num": SEARCH_NUM_RESULTS,
+    }
+    try:
+        with tracing.span("google_cse", tracing.CLIENT), metrics.observe(
+            metrics.search_request_seconds, source=source
+        ):
+            resp = await http_client.get(BASE_URL, params=params)
+        resp.raise_for_status()
+    except Exception as exc:
+        metrics.search_errors.labels(source=source, error=type(exc).__name__).inc()
+        raise
+    return resp.json().get("items", [])
+
+
 async def __search__(query: str, search_engine_id: str):
-    async with httpx.AsyncClient() as client:
-        params = {
-            "key": SEARCH_API_KEY,
-            "cx": search_engine_id,
-            "q": query,
-            "start": 1,
-            "num": 2,
+    try:
+        # A search span without a google_cse child was served from the cache.
+        with tracing.span(
+            "search", source=__source_of__(search_engine_id), query=query
+        ):
+            return await search_cache.get_or_fetch(
+                search_engine_id,
+                query,
+                SEARCH_NUM_RESULTS,
+                lambda: __fetch_search__(query, search_engine_id),
+            )
+    except httpx.HTTPStatusError as exc:
+        print(f"An HTTP error occurred: {exc}")
+        return []
+    except Exception as exc:
+        print(f"An error occurred: {exc}")
+        return []
+
+
+@tracing.traced("save_subjects_and_results")
+async def save_subjects_and_results(
+    created_prompt: Prompt,
+    subjects: list[Subject],
+    subject_results: list[list[ContentCreate]],
+    db: AsyncSession,
+) -> list[dict]:
+    """Store the results and return them as ``PromptSubjectAndContents`` dicts."""
+    prompt = to_dict(created_prompt, Prompt)
+    subject_contents = await contents.async_create_contents_with_response_prompts(
+        prompt["id"],
+        [
+            (subject.detailed_name, subject.description, results)
+            for subject, results in zip(subjects, subject_results)
+        ],
+        db,
+    )
+    return [
+        {
+            "prompt": prompt,
+            "subject": subject.detailed_name,
+            "description": subject.description,
+            "contents": list_of_contents,
         }
-        try:
-            resp = await client.get(BASE_URL, params=params)
-            resp.raise_for_status()
-            return resp.json().get("items", [])
-        except httpx.HTTPStatusError as exc:
-            print(f"An HTTP error occurred: {exc}")
-            return []
-        except Exception as exc:
-            print(f"An error occurred: {exc}")
-            return []
+        for subject, list_of_contents in zip(subjects, subject_contents)
+    ]
 
 
+@tracing.traced("save_search_and_results")
 async def save_search_and_results(
     created_prompt: Prompt,
     ai_response_subject: str,
     ai_response_description: str,
-    youtube_results: list[Content],
-    reddit_results: list[Content],
-    twitter_results: list[Content],
-    db: Session,
-) -> PromptSubjectAndContents:
-    async def save_results(
-        results: list[ContentBase], source: str, created_prompt_id: int, db: Session
-    ):
-        list_of_contents: list[Content] = []
-        for result in results:
-            created_content: Content = contents.create_content(result, source, db)
-            list_of_contents.append(created_content)
-            response_prompt.create_response_prompt(
-                ResponsePromptCreate(
-                    prompt_id=created_prompt_id,
-                    content_id=created_content.id,
-                    ai_response_subject=ai_response_subject,
-                    ai_response_description=ai_response_description,
-                ),
-                db,
+    youtube_results: list[ContentCreate],
+    reddit_results: list[ContentCreate],
+    twitter_results: list[ContentCreate],
+    db: AsyncSession,
+) -> dict:
+    stored_data = await save_subjects_and_results(
+        created_prompt,
+        [
+            Subject(
+                detailed_name=ai_response_subject, description=ai_response_description
             )
-        return list_of_contents
-
-    youtube_results = await save_results(
-        youtube_results, "youtube", created_prompt.id, db
+        ],
+        [youtube_results + reddit_results + twitter_results],
+        db,
     )
-    reddit_results = await save_results(reddit_results, "reddit", created_prompt.id, db)
-    twitter_results = await save_results(
-        twitter_results, "twitter", created_prompt.id, db
+    return stored_data[0]
+
+
+async def __limited_search__(
+    query: str, search_engine_id: str, source: str, user_id: int | None
+) -> list[ContentCreate]:
+    async with search_limiter.slot(user_id):
+        search_items = await __search__(query, search_engine_id)
+    return await __parse_results__(search_items, source)
+
+
+async def __search_subject__(
+    prompt: Prompt, subject: Subject, user_id: int | None
+) -> tuple[Subject, list[ContentCreate]]:
+    results = await asyncio.gather(
+        *(
+            __limited_search__(
+                f"{prompt.keywords} {subject.detailed_name}", engine_id, source, user_id
+            )
+            for source, engine_id in SEARCH_SOURCES
+        )
     )
+    # One list per subject, sources in SEARCH_SOURCES order.
+    return subject, [
+        content for source_results in results for content in source_results
+    ]
 
-    all_sources_content = youtube_results + reddit_results + twitter_results
 
-    return PromptSubjectAndContents(
-        prompt=created_prompt,
-        subject=ai_response_subject,
-        description=ai_response_description,
-        contents=all_sources_content,
+async def search_subjects(
+    prompt: Prompt,
+    subjects: list[Subject],
+    db: AsyncSession,
+    user_id: int | None = None,
+) -> list[dict]:
+    """Run every subject x source search at once, then store the results.
+
+    Searches are bounded by ``search_limiter``. Results are saved and returned
+    in subject order, with youtube, reddit and twitter contents in that order,
+    whatever order the searches complete in.
+    """
+    results = await asyncio.gather(
+        *(__search_subject__(prompt, subject, user_id) for subject in subjects)
     )
+    subject_results = [subject_contents for _, subject_contents in results]
+    return await save_subjects_and_results(prompt, subjects, subject_results, db)
+
+
+async def stream_subjects(
+    prompt: Prompt,
+    subjects: list[Subject],
+    db: AsyncSession,
+    user_id: int | None = None,
+) -> AsyncIterator[dict]:
+    """Like ``search_subjects``, but yield each subject as soon as it is stored.
+
+    All searches still start at once. Subjects come out in the order their
+    searches complete, each saved in its own transaction. Closing the
+    iterator cancels the searches still running.
+    """
+    pending = [
+        asyncio.ensure_future(__search_subject__(prompt, subject, user_id))
+        for subject in subjects
+    ]
+    try:
+        for next_subject in asyncio.as_completed(pending):
+            subject, subject_contents = await next_subject
+            stored_data = await save_subjects_and_results(
+                prompt, [subject], [subject_contents], db
+            )
+            yield stored_data[0]
+    finally:
+        for subject_search in pending:
+            subject_search.cancel()
 
 
 async def LLMResponseSubjectSearchEngines(
-    prompt: Prompt, ai_response_subject: str, ai_response_description: str, db: Session
-) -> PromptSubjectAndContents:
-    query = f"{prompt.keywords} {ai_response_subject}"
-    youtube_results, reddit_results, twitter_results = await asyncio.gather(
-        __parse_results__(await __search__(query, YOUTUBE_SEARCH_ENGINE_ID), "youtube"),
-        __parse_results__(await __search__(query, REDDIT_SEARCH_ENGINE_ID), "reddit"),
-        __parse_results__(await __search__(query, TWITTER_SEARCH_ENGINE_ID), "twitter"),
-    )
-    stored_data = await save_search_and_results(
+    prompt: Prompt,
+    ai_response_subject: str,
+    ai_response_description: str,
+    db: AsyncSession,
+) -> dict:
+    stored_data = await search_subjects(
         prompt,
-        ai_response_subject,
-        ai_response_description,
-        youtube_results,
-        reddit_results,
-        twitter_results,
+        [
+            Subject(
+                detailed_name=ai_response_subject, description=ai_response_description
+            )
+        ],
         db,
     )
-    return stored_data
+    return stored_data[0]
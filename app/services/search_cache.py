@@ -0,0 +1,147 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from redis.exceptions import RedisError
+
+from app.services import redis_client
+from app.services.singleflight import SingleFlight
+
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "86400"))
+SEARCH_CACHE_NEGATIVE_TTL = int(os.getenv("SEARCH_CACHE_NEGATIVE_TTL", "900"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2048"))
+
+KEY_PREFIX = "search:v1:"
+
+
+class LRUCache:
+    """In-process LRU cache whose entries also expire after their own TTL."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+@dataclass
+class CacheCounters:
+    local_hits: int = 0
+    redis_hits: int = 0
+    misses: int = 0
+    redis_errors: int = 0
+
+
+local_cache = LRUCache(SEARCH_CACHE_MAX_ENTRIES)
+in_flight = SingleFlight()
+counters = CacheCounters()
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.casefold().split())
+
+
+def cache_key(search_engine_id: str, query: str, num: int) -> str:
+    raw = json.dumps([search_engine_id, normalize_query(query), num])
+    return KEY_PREFIX + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def ttl_for(items: list) -> int:
+    return SEARCH_CACHE_TTL if items else SEARCH_CACHE_NEGATIVE_TTL
+
+
+async def __redis_get__(key: str) -> list | None:
+    if redis_client.client is None:
+        return None
+    try:
+        cached = await redis_client.client.get(key)
+        return None if cached is None else json.loads(cached)
+    except (RedisError, ValueError) as exc:
+        # A corrupt or legacy value is a miss, refetched and overwritten.
+        counters.redis_errors += 1
+        logging.warning(f"Search cache read failed: {exc}")
+        return None
+
+
+async def __redis_set__(key: str, items: list):
+    if redis_client.client is None:
+        return
+    try:
+        await redis_client.client.set(key, json.dumps(items), ex=ttl_for(items))
+    except RedisError as exc:
+        counters.redis_errors += 1
+        logging.warning(f"Search cache write failed: {exc}")
+
+
+async def get_or_fetch(
+    search_engine_id: str,
+    query: str,
+    num: int,
+    fetch: Callable[[], Awaitable[list]],
+) -> list:
+    """Return cached search items, calling ``fetch`` at most once per key.
+
+    The in-process LRU is checked first, then Redis. Concurrent misses on the
+    same key in this worker share a single upstream call. Empty results are
+    cached for ``SEARCH_CACHE_NEGATIVE_TTL``; errors raised by ``fetch`` are
+    not cached.
+    """
+    key = cache_key(search_engine_id, query, num)
+    items = local_cache.get(key)
+    if items is not None:
+        counters.local_hits += 1
+        return items
+
+    async def load() -> list:
+        items = await __redis_get__(key)
+        if items is not None:
+            counters.redis_hits += 1
+        else:
+            counters.misses += 1
+            items = await fetch()
+            await __redis_set__(key, items)
+        local_cache.set(key, items, ttl_for(items))
+        return items
+
+    return await in_flight.do(key, load)
+
+
+def cache_stats() -> dict:
+    return {
+        "local_entries": len(local_cache),
+        "local_hits": counters.local_hits,
+        "redis_hits": counters.redis_hits,
+        "misses": counters.misses,
+        "coalesced": in_flight.coalesced,
+        "in_flight": len(in_flight),
+        "redis_errors": counters.redis_errors,
+    }
@@ -0,0 +1,20 @@
+import json
+
+import orjson
+from pydantic import BaseModel
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def encode_event(stream_format: str, event: str, data: BaseModel | dict) -> str:
+    """Frame one event as an NDJSON line or a server-sent event."""
+    if isinstance(data, BaseModel):
+        payload = data.json()
+    else:
+        payload = orjson.dumps(data).decode()
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f'{{"event": {json.dumps(event)}, "data": {payload}}}\n'
@@ -0,0 +1,194 @@
+import logging
+import os
+
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.crud import follows, prompts
+from app.crud.pagination import decode_id_cursor, encode_id_cursor
+from app.services import redis_client
+
+TIMELINE_MAX_LENGTH = int(os.getenv("TIMELINE_MAX_LENGTH", "500"))
+TIMELINE_TTL = int(os.getenv("TIMELINE_TTL", "604800"))
+TIMELINE_CELEBRITY_FOLLOWERS = int(os.getenv("TIMELINE_CELEBRITY_FOLLOWERS", "5000"))
+
+CELEBRITIES_KEY = "timeline:celebrities"
+# Member scored below every prompt id, added when a timeline is rebuilt. It
+# keeps timelines without prompts from being rebuilt on every read, and as
+# trimming removes it first, reaching it means no older prompt was dropped.
+COMPLETE_MARKER = 0
+
+
+def timeline_key(user_id: int) -> str:
+    return f"timeline:{user_id}"
+
+
+async def __existing_timelines__(user_ids: list[int]) -> list[int]:
+    pipe = redis_client.client.pipeline(transaction=False)
+    for user_id in user_ids:
+        pipe.exists(timeline_key(user_id))
+    exists = await pipe.execute()
+    return [user_id for user_id, found in zip(user_ids, exists) if found]
+
+
+async def __add_to_timelines__(user_ids: list[int], prompt_ids: list[int]):
+    if not user_ids or not prompt_ids:
+        return
+    pipe = redis_client.client.pipeline(transaction=False)
+    for user_id in user_ids:
+        key = timeline_key(user_id)
+        # Prompt ids grow with created_at, so they double as the sort score.
+        pipe.zadd(key, {prompt_id: prompt_id for prompt_id in prompt_ids})
+        pipe.zremrangebyrank(key, 0, -(TIMELINE_MAX_LENGTH + 1))
+    await pipe.execute()
+
+
+async def fan_out_prompt(prompt: models.Prompt, db: AsyncSession):
+    """Push a public prompt onto its author's followers' timelines.
+
+    Only timelines that already exist are updated; the others are rebuilt
+    from the database on their next read. Authors with more than
+    ``TIMELINE_CELEBRITY_FOLLOWERS`` followers are not fanned out: their
+    prompts are merged into the feed at read time instead.
+    """
+    if redis_client.client is None or prompt.is_private:
+        return
+    try:
+        follower_ids = await follows.async_get_follower_ids_by_user_id(
+            prompt.user_id, db
+        )
+        if len(follower_ids) > TIMELINE_CELEBRITY_FOLLOWERS:
+            await redis_client.client.sadd(CELEBRITIES_KEY, prompt.user_id)
+            return
+        await redis_client.client.srem(CELEBRITIES_KEY, prompt.user_id)
+        follower_ids = await __existing_timelines__(follower_ids)
+        await __add_to_timelines__(follower_ids, [prompt.id])
+    except RedisError as exc:
+        logging.warning(f"Timeline fan-out failed: {exc}")
+
+
+async def remove_prompt(prompt: models.Prompt, db: AsyncSession):
+    """Take a prompt that became private off its followers' timelines."""
+    if redis_client.client is None:
+        return
+    try:
+        follower_ids = await follows.async_get_follower_ids_by_user_id(
+            prompt.user_id, db
+        )
+        if len(follower_ids) > TIMELINE_CELEBRITY_FOLLOWERS:
+            return
+        pipe = redis_client.client.pipeline(transaction=False)
+        for follower_id in follower_ids:
+            pipe.zrem(timeline_key(follower_id), prompt.id)
+        await pipe.execute()
+    except RedisError as exc:
+        logging.warning(f"Timeline removal failed: {exc}")
+
+
+async def backfill(user_id: int, follow_id: int, db: AsyncSession):
+    """Add a newly followed user's latest public prompts to the timeline."""
+    if redis_client.client is None:
+        return
+    try:
+        if not await __existing_timelines__([user_id]):
+            return
+        prompt_ids = await prompts.async_get_public_prompt_ids_by_user_ids(
+            [follow_id], db, limit=TIMELINE_MAX_LENGTH
+        )
+        await __add_to_timelines__([user_id], prompt_ids)
+    except RedisError as exc:
+        logging.warning(f"Timeline backfill failed: {exc}")
+
+
+async def prune(user_id: int, follow_id: int, db: AsyncSession):
+    """Drop an unfollowed user's prompts from the timeline."""
+    if redis_client.client is None:
+        return
+    try:
+        prompt_ids = await prompts.async_get_prompt_ids_by_user_id(
+            follow_id, db, limit=TIMELINE_MAX_LENGTH
+        )
+        if prompt_ids:
+            await redis_client.client.zrem(timeline_key(user_id), *prompt_ids)
+    except RedisError as exc:
+        logging.warning(f"Timeline prune failed: {exc}")
+
+
+async def __rebuild__(user_id: int, db: AsyncSession):
+    prompt_ids = await prompts.async_get_public_prompt_ids_by_user_ids(
+        await follows.async_get_follow_ids_by_user_id(user_id, db),
+        db,
+        limit=TIMELINE_MAX_LENGTH,
+    )
+    key = timeline_key(user_id)
+    pipe = redis_client.client.pipeline(transaction=False)
+    pipe.zadd(key, {COMPLETE_MARKER: COMPLETE_MARKER})
+    pipe.expire(key, TIMELINE_TTL)
+    await pipe.execute()
+    await __add_to_timelines__([user_id], prompt_ids)
+
+
+async def get_feed(
+    user_id: int, db: AsyncSession, limit: int = 20, cursor: str | None = None
+) -> tuple[list[dict], str | None]:
+    """Read a feed page from the precomputed timeline, hydrated in bulk.
+
+    Prompt ids come from the user's sorted set, merged with the latest
+    prompts of followed celebrities, then loaded in one query as
+    ``UserPromptSubjectAndContents`` shaped dicts. Without Redis, and past
+    the oldest prompt a trimmed timeline kept, this falls back to
+    ``crud.prompts.get_feed``, which takes the same cursors.
+    """
+    if redis_client.client is None:
+        return await prompts.async_get_feed(user_id, db, limit, cursor)
+    before_id = decode_id_cursor(cursor) if cursor is not None else None
+    key = timeline_key(user_id)
+    try:
+        if not await redis_client.client.exists(key):
+            await __rebuild__(user_id, db)
+        prompt_ids = [
+            int(prompt_id)
+            for prompt_id in await redis_client.client.zrevrangebyscore(
+                key,
+                f"({before_id}" if before_id is not None else "+inf",
+                "-inf",
+                start=0,
+                num=limit + 1,
+            )
+        ]
+        await redis_client.client.expire(key, TIMELINE_TTL)
+        celebrity_ids = [
+            int(celebrity_id)
+            for celebrity_id in await redis_client.client.smembers(CELEBRITIES_KEY)
+        ]
+    except RedisError as exc:
+        logging.warning(f"Timeline read failed: {exc}")
+        return await prompts.async_get_feed(user_id, db, limit, cursor)
+
+    if COMPLETE_MARKER in prompt_ids:
+        prompt_ids.remove(COMPLETE_MARKER)
+    elif len(prompt_ids) <= limit:
+        return await prompts.async_get_feed(user_id, db, limit, cursor)
+
+    if celebrity_ids:
+        followed_celebrity_ids = await follows.async_get_follow_ids_by_user_id(
+            user_id, db, among=celebrity_ids
+        )
+        prompt_ids = sorted(
+            set(prompt_ids)
+            | set(
+                await prompts.async_get_public_prompt_ids_by_user_ids(
+                    followed_celebrity_ids, db, limit=limit + 1, before_id=before_id
+                )
+            ),
+            reverse=True,
+        )[: limit + 1]
+
+    # Ids of prompts made private or left without results are skipped here,
+    # so a page can come out short, or even empty, before the last one.
+    summaries = await prompts.async_get_prompt_summaries(prompt_ids[:limit], db)
+    next_cursor = None
+    if len(prompt_ids) > limit:
+        next_cursor = encode_id_cursor(prompt_ids[limit - 1])
+    return summaries, next_cursor
@@ -0,0 +1,310 @@
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import random
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+import httpx
+import orjson
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.services import metrics
+
+# Share of requests traced; 0 turns tracing off. An incoming W3C traceparent
+# header decides for its own request when tracing is on.
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "file")
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv(
+    "TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"
+)
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "5"))
+TRACE_MAX_QUEUE = int(os.getenv("TRACE_MAX_QUEUE", "4096"))
+
+SERVICE_NAME = "curious-api"
+STATEMENT_MAX_LENGTH = 1000
+
+# OTLP span kinds.
+INTERNAL, SERVER, CLIENT, CONSUMER = 1, 2, 3, 5
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None = None
+    kind: int = INTERNAL
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int = 0
+    attributes: dict = field(default_factory=dict)
+    error: str | None = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def child(self, name: str, kind: int, attributes: dict) -> "Span":
+        return Span(
+            name=name,
+            trace_id=self.trace_id,
+            span_id=__new_id__(64),
+            parent_id=self.span_id,
+            kind=kind,
+            attributes=attributes,
+        )
+
+
+current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+finished: deque[Span] = deque()
+exporter_task: asyncio.Task | None = None
+exporter_client: httpx.AsyncClient | None = None
+
+
+def __new_id__(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def __finish__(span: Span):
+    span.end_ns = time.time_ns()
+    if len(finished) >= TRACE_MAX_QUEUE:
+        metrics.trace_spans_dropped.inc()
+        return
+    finished.append(span)
+
+
+def __sampled_root__(name: str, traceparent: str | None, kind: int) -> Span | None:
+    if TRACE_SAMPLE_RATE <= 0:
+        return None
+    match = TRACEPARENT.match(traceparent or "")
+    if match is None:
+        if random.random() >= TRACE_SAMPLE_RATE:
+            return None
+        trace_id, parent_id = __new_id__(128), None
+    else:
+        trace_id, parent_id, flags = match.groups()
+        if not int(flags, 16) & 1:
+            return None
+    return Span(
+        name=name,
+        trace_id=trace_id,
+        span_id=__new_id__(64),
+        parent_id=parent_id,
+        kind=kind,
+    )
+
+
+@contextmanager
+def __run__(span: Span):
+    token = current_span.set(span)
+    try:
+        yield span
+    except BaseException as exc:
+        span.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        current_span.reset(token)
+        __finish__(span)
+
+
+@contextmanager
+def start_trace(
+    name: str, traceparent: str | None = None, kind: int = SERVER, **attributes
+):
+    """Open a sampled root span, or yield None when this trace is not sampled.
+
+    Spans opened in this context, including the asyncio tasks it starts,
+    become children of the root. Nothing is recorded for unsampled traces.
+    """
+    root = __sampled_root__(name, traceparent, kind)
+    if root is None:
+        yield None
+        return
+    root.set(**attributes)
+    with __run__(root):
+        yield root
+
+
+@contextmanager
+def span(name: str, kind: int = INTERNAL, **attributes):
+    """Time a block as a child of the current span, if this trace is sampled."""
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+    with __run__(parent.child(name, kind, attributes)) as child:
+        yield child
+
+
+def traced(name: str, kind: int = INTERNAL):
+    """Decorator running every call of a sync or async function in ``span``."""
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, kind):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, kind):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# SQL spans are opened and closed by cursor events, so they are kept on the
+# connection instead of in the context.
+@event.listens_for(Engine, "before_cursor_execute")
+def __start_query_span__(
+    connection, cursor, statement, parameters, context, executemany
+):
+    parent = current_span.get()
+    if parent is None:
+        return
+    query_span = parent.child(
+        "db.query",
+        CLIENT,
+        {
+            "db.system": connection.dialect.name,
+            "db.statement": " ".join(statement.split())[:STATEMENT_MAX_LENGTH],
+        },
+    )
+    connection.info.setdefault("trace_spans", []).append(query_span)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def __end_query_span__(connection, cursor, statement, parameters, context, executemany):
+    if current_span.get() is not None and connection.info.get("trace_spans"):
+        __finish__(connection.info["trace_spans"].pop())
+
+
+@event.listens_for(Engine, "handle_error")
+def __fail_query_span__(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("trace_spans"):
+        query_span = connection.info["trace_spans"].pop()
+        query_span.error = repr(exception_context.original_exception)
+        __finish__(query_span)
+
+
+def __attribute__(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def encode_spans(spans: list[Span]) -> dict:
+    """An OTLP/HTTP JSON ``ExportTraceServiceRequest`` holding ``spans``."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [__attribute__("service.name", SERVICE_NAME)]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": __name__},
+                        "spans": [
+                            {
+                                "traceId": span.trace_id,
+                                "spanId": span.span_id,
+                                "parentSpanId": span.parent_id or "",
+                                "name": span.name,
+                                "kind": span.kind,
+                                "startTimeUnixNano": str(span.start_ns),
+                                "endTimeUnixNano": str(span.end_ns),
+                                "attributes": [
+                                    __attribute__(key, value)
+                                    for key, value in span.attributes.items()
+                                    if value is not None
+                                ],
+                                "status": (
+                                    {"code": 2, "message": span.error}
+                                    if span.error
+                                    else {"code": 1}
+                                ),
+                            }
+                            for span in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+def __append__(path: str, payload: bytes):
+    with open(path, "ab") as file:
+        file.write(payload)
+
+
+async def flush():
+    """Export the finished spans, one OTLP JSON document per batch."""
+    spans = [finished.popleft() for _ in range(len(finished))]
+    if not spans:
+        return
+    payload = orjson.dumps(encode_spans(spans))
+    try:
+        if TRACE_EXPORTER == "otlp":
+            response = await exporter_client.post(
+                TRACE_OTLP_ENDPOINT,
+                content=payload,
+                headers={"Content-Type": "application/json"},
+            )
+            response.raise_for_status()
+        else:
+            await asyncio.to_thread(__append__, TRACE_FILE, payload + b"\n")
+    except (httpx.HTTPError, OSError) as exc:
+        metrics.trace_spans_dropped.inc(len(spans))
+        logging.warning(f"Trace export failed: {exc}")
+
+
+async def __run_exporter__():
+    while True:
+        await asyncio.sleep(TRACE_EXPORT_INTERVAL)
+        await flush()
+
+
+def start_exporter():
+    global exporter_client, exporter_task
+    if TRACE_SAMPLE_RATE <= 0 or exporter_task is not None:
+        return
+    if TRACE_EXPORTER == "otlp":
+        exporter_client = httpx.AsyncClient(timeout=10)
+    exporter_task = asyncio.create_task(__run_exporter__())
+
+
+async def stop_exporter():
+    global exporter_client, exporter_task
+    if exporter_task is None:
+        return
+    exporter_task.cancel()
+    try:
+        await exporter_task
+    except asyncio.CancelledError:
+        pass
+    exporter_task = None
+    await flush()
+    if exporter_client is not None:
+        await exporter_client.aclose()
+        exporter_client = None
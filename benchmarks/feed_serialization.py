@@ -0,0 +1,156 @@
+"""Serialization cost of a large feed, pydantic models against plain dicts.
+
+Loads a feed of --items prompts (three contents each) once, then times turning
+the loaded rows into a response body two ways:
+
+* models: ``UserPromptSubjectAndContents`` built through ``orm_mode``, then
+  FastAPI's response_model validation and ``JSONResponse``, as /feed did;
+* dicts: ``crud.serialization.to_dict`` and ``ORJSONResponse``, as /feed does.
+
+    python -m benchmarks.feed_serialization --items 500
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("POSGTRES_URI", "sqlite://")
+
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+from sqlalchemy import create_engine, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app import models  # noqa: E402
+from app.crud.serialization import to_dict  # noqa: E402
+from app.schemas.contents import Content, UserPromptSubjectAndContents  # noqa: E402
+from app.schemas.prompts import Prompt  # noqa: E402
+from app.schemas.users import User  # noqa: E402
+
+CONTENTS_PER_PROMPT = 3
+
+response_field = create_response_field("feed", list[UserPromptSubjectAndContents])
+
+
+def load_feed(item_count: int) -> list[tuple]:
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autoflush=False, bind=engine)()
+    for user_id in range(1, 11):
+        db.add(
+            models.User(
+                id=user_id,
+                email=f"user{user_id}@example.com",
+                username=f"user{user_id}",
+                full_name=f"User {user_id}",
+            )
+        )
+    for index in range(item_count):
+        prompt = models.Prompt(
+            title=f"Prompt {index}", keywords="physics", user_id=index % 10 + 1
+        )
+        db.add(prompt)
+        db.flush()
+        for position in range(CONTENTS_PER_PROMPT):
+            link = f"https://example.com/{index}/{position}"
+            content = models.Content(
+                title=f"Result {index}-{position}",
+                snippet="snippet " * 20,
+                link=link,
+                canonical_link=link,
+                long_description="long description " * 40,
+                image=f"{link}.jpg",
+                source="youtube",
+            )
+            db.add(content)
+            db.flush()
+            db.add(
+                models.ResponsePrompt(
+                    prompt_id=prompt.id,
+                    content_id=content.id,
+                    ai_response_subject=f"Subject {index}",
+                    ai_response_description="Description " * 10,
+                )
+            )
+    db.commit()
+
+    rows = db.execute(
+        select(models.Prompt, models.User, models.ResponsePrompt, models.Content)
+        .join(models.User, models.User.id == models.Prompt.user_id)
+        .join(
+            models.ResponsePrompt, models.ResponsePrompt.prompt_id == models.Prompt.id
+        )
+        .join(models.Content, models.Content.id == models.ResponsePrompt.content_id)
+        .order_by(models.Prompt.id, models.ResponsePrompt.id)
+    ).all()
+    feed = {}
+    for db_prompt, db_user, db_response_prompt, db_content in rows:
+        feed.setdefault(db_prompt.id, (db_prompt, db_user, db_response_prompt, []))[
+            3
+        ].append(db_content)
+    return list(feed.values())
+
+
+def models_body(feed: list[tuple]) -> bytes:
+    items = [
+        UserPromptSubjectAndContents(
+            user=db_user,
+            prompt=db_prompt,
+            subject=db_response_prompt.ai_response_subject,
+            description=db_response_prompt.ai_response_description,
+            contents=db_contents,
+        )
+        for db_prompt, db_user, db_response_prompt, db_contents in feed
+    ]
+    content = asyncio.run(
+        serialize_response(field=response_field, response_content=items)
+    )
+    return JSONResponse(content).body
+
+
+def dicts_body(feed: list[tuple]) -> bytes:
+    items = [
+        {
+            "user": to_dict(db_user, User),
+            "prompt": to_dict(db_prompt, Prompt),
+            "subject": db_response_prompt.ai_response_subject,
+            "description": db_response_prompt.ai_response_description,
+            "contents": [to_dict(db_content, Content) for db_content in db_contents],
+        }
+        for db_prompt, db_user, db_response_prompt, db_contents in feed
+    ]
+    return ORJSONResponse(items).body
+
+
+def timed(render, feed: list[tuple], repeat: int) -> float:
+    """Median milliseconds of ``repeat`` renders of ``feed``."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(feed)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    feed = load_feed(args.items)
+    if json.loads(models_body(feed)) != json.loads(dicts_body(feed)):
+        raise SystemExit("The two paths render different feeds")
+    models_ms = timed(models_body, feed, args.repeat)
+    dicts_ms = timed(dicts_body, feed, args.repeat)
+    print(f"{args.items} feed items, median of {args.repeat} renders")
+    print(f"models + JSONResponse   {models_ms:8.2f} ms")
+    print(f"dicts + ORJSONResponse  {dicts_ms:8.2f} ms  ({models_ms / dicts_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
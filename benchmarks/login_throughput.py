@@ -0,0 +1,138 @@
+"""Login throughput, and the latency of other requests during a login burst.
+
+Sends --logins POST /token requests, --concurrency at a time, through the
+ASGI app while another client polls GET /users/me. Runs once with bcrypt on
+the event loop, as before the password pool, and once through the pool.
+
+    python -m benchmarks.login_throughput --logins 200 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+DATABASE_DIR = tempfile.mkdtemp(prefix="curious-bench-")
+DATABASE_URL = f"sqlite:///{Path(DATABASE_DIR) / 'bench.db'}"
+os.environ.setdefault("POSGTRES_URI", DATABASE_URL)
+for name in ["OPENAI_API_KEY", "AUTH_SECRET_KEY"]:
+    os.environ.setdefault(name, "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+import httpx  # noqa: E402
+
+from app.database import SessionLocal  # noqa: E402
+from app.crud import users  # noqa: E402
+from app.main import app  # noqa: E402
+from app.schemas.users import UserCreate  # noqa: E402
+from app.services import auth  # noqa: E402
+from benchmarks.common import migrate, percentile  # noqa: E402
+
+USER_COUNT = 10
+PASSWORD = "benchmark-password"
+
+
+async def __run_inline__(fn, *args):
+    return fn(*args)
+
+
+def create_users():
+    migrate(os.environ["POSGTRES_URI"])
+    db = SessionLocal()
+    for index in range(USER_COUNT):
+        users.create_user(
+            UserCreate(
+                email=f"user{index}@example.com",
+                username=f"user{index}",
+                full_name=f"User {index}",
+                password=PASSWORD,
+            ),
+            db,
+        )
+    db.close()
+
+
+async def run(logins: int, concurrency: int) -> dict:
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        token = (
+            await client.post(
+                "/token", data={"username": "user0", "password": PASSWORD}
+            )
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        semaphore = asyncio.Semaphore(concurrency)
+        login_latencies, probe_latencies = [], []
+        burst_done = asyncio.Event()
+
+        async def login(index: int):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(
+                    "/token",
+                    data={
+                        "username": f"user{index % USER_COUNT}",
+                        "password": PASSWORD,
+                    },
+                )
+                response.raise_for_status()
+                login_latencies.append(time.perf_counter() - start)
+
+        async def probe():
+            while not burst_done.is_set():
+                start = time.perf_counter()
+                (await client.get("/users/me", headers=headers)).raise_for_status()
+                probe_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        prober = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*(login(index) for index in range(logins)))
+        elapsed = time.perf_counter() - start
+        burst_done.set()
+        await prober
+
+    return {
+        "logins_per_second": logins / elapsed,
+        "login_p50_ms": percentile(login_latencies, 0.5) * 1000,
+        "login_p95_ms": percentile(login_latencies, 0.95) * 1000,
+        "other_p50_ms": percentile(probe_latencies, 0.5) * 1000,
+        "other_p95_ms": percentile(probe_latencies, 0.95) * 1000,
+        "other_max_ms": max(probe_latencies) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    create_users()
+    print(
+        f"bcrypt rounds {auth.PASSWORD_HASH_ROUNDS}, "
+        f"{auth.PASSWORD_HASH_WORKERS} hashing threads"
+    )
+    run_in_password_pool = auth.__run_in_password_pool__
+    for label, runner in [
+        ("on the loop", __run_inline__),
+        ("password pool", run_in_password_pool),
+    ]:
+        auth.__run_in_password_pool__ = runner
+        results = asyncio.run(run(args.logins, args.concurrency))
+        print(
+            f"{label:<14} {results['logins_per_second']:.1f} logins/s, "
+            f"login p50 {results['login_p50_ms']:.0f} ms "
+            f"p95 {results['login_p95_ms']:.0f} ms; "
+            f"/users/me p50 {results['other_p50_ms']:.0f} ms "
+            f"p95 {results['other_p95_ms']:.0f} ms "
+            f"max {results['other_max_ms']:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Initial schema, as created by Base.metadata.create_all
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Every column carried index=True; unique ones got unique indexes.
+INDEXES = {
+    "users": [
+        "id",
+        "email",
+        "username",
+        "full_name",
+        "bio",
+        "profile_picture",
+        "profile_banner",
+    ],
+    "contents": [
+        "id",
+        "title",
+        "snippet",
+        "link",
+        "source",
+        "long_description",
+        "image",
+    ],
+    "prompts": ["id", "title", "keywords", "user_id", "created_at"],
+    "response_prompts": [
+        "id",
+        "prompt_id",
+        "content_id",
+        "ai_response_subject",
+        "ai_response_description",
+        "created_at",
+    ],
+    "follows": ["id", "user_id", "follow_id", "created_at"],
+}
+UNIQUE_COLUMNS = {("users", "email"), ("users", "username")}
+
+
+def upgrade():
+    # Databases created before migrations already have these tables; they
+    # are adopted as they are.
+    if sa.inspect(op.get_bind()).has_table("users"):
+        return
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("email", sa.String(), nullable=True),
+        sa.Column("hashed_password", sa.String(), nullable=True),
+        sa.Column("username", sa.String(), nullable=True),
+        sa.Column("full_name", sa.String(), nullable=True),
+        sa.Column("bio", sa.String(), nullable=True),
+        sa.Column("profile_picture", sa.String(), nullable=True),
+        sa.Column("profile_banner", sa.String(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "contents",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(), nullable=True),
+        sa.Column("snippet", sa.String(), nullable=True),
+        sa.Column("link", sa.String(), nullable=True),
+        sa.Column("source", sa.String(), nullable=True),
+        sa.Column("long_description", sa.String(), nullable=True),
+        sa.Column("image", sa.String(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "prompts",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(), nullable=True),
+        sa.Column("keywords", sa.String(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("is_private", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "response_prompts",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("prompt_id", sa.Integer(), nullable=True),
+        sa.Column("content_id", sa.Integer(), nullable=True),
+        sa.Column("ai_response_subject", sa.String(), nullable=True),
+        sa.Column("ai_response_description", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["content_id"], ["contents.id"]),
+        sa.ForeignKeyConstraint(["prompt_id"], ["prompts.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "follows",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("follow_id", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["follow_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    for table, columns in INDEXES.items():
+        for column in columns:
+            op.create_index(
+                f"ix_{table}_{column}",
+                table,
+                [column],
+                unique=(table, column) in UNIQUE_COLUMNS,
+            )
+
+
+def downgrade():
+    for table in ["follows", "response_prompts", "prompts", "contents", "users"]:
+        op.drop_table(table)
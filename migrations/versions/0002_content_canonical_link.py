@@ -0,0 +1,128 @@
+"""Add contents.canonical_link and merge duplicate contents
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:10:00.000000
+"""
+
+from collections import defaultdict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+contents = sa.table(
+    "contents",
+    sa.column("id", sa.Integer),
+    sa.column("link", sa.String),
+    sa.column("canonical_link", sa.String),
+)
+response_prompts = sa.table("response_prompts", sa.column("content_id", sa.Integer))
+
+# A copy of app.services.links as of this revision, so later changes to the
+# app do not change what this migration does.
+HOST_ALIASES = {
+    "youtu.be": "youtube.com",
+    "old.reddit.com": "reddit.com",
+    "new.reddit.com": "reddit.com",
+    "x.com": "twitter.com",
+}
+HOST_PREFIXES = ("www.", "m.", "mobile.")
+TRACKING_PARAMS = {"fbclid", "gclid", "igshid", "ref_src", "si"}
+
+
+def __canonical_host__(host: str) -> str:
+    host = host.lower().rstrip(".")
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix) :]
+            break
+    return HOST_ALIASES.get(host, host)
+
+
+def __canonicalize_link__(link: str) -> str | None:
+    """``canonicalize_link``, but None for links that are not URLs.
+
+    Placeholders like "N/A" must not merge unrelated contents.
+    """
+    parts = urlsplit(link.strip())
+    if not parts.scheme or not parts.netloc:
+        return None
+    original_host = parts.netloc.lower()
+    host = __canonical_host__(parts.hostname or "")
+    path = parts.path.rstrip("/") or "/"
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.startswith("utm_") and key not in TRACKING_PARAMS
+    ]
+
+    if host == "youtube.com":
+        video_id = None
+        if original_host.endswith("youtu.be"):
+            video_id = path.strip("/")
+        elif path.startswith("/shorts/") or path.startswith("/embed/"):
+            video_id = path.split("/")[2]
+        elif path == "/watch":
+            video_id = dict(query).get("v")
+        if video_id:
+            path, query = "/watch", [("v", video_id)]
+    elif host in ("reddit.com", "twitter.com"):
+        query = []
+
+    return urlunsplit(("https", host, path, urlencode(sorted(query)), ""))
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    # Tables adopted from create_all may already have the column.
+    if "canonical_link" not in {
+        column["name"] for column in inspector.get_columns("contents")
+    }:
+        op.add_column("contents", sa.Column("canonical_link", sa.String()))
+
+    ids_by_link = defaultdict(list)
+    for id, link, canonical_link in bind.execute(
+        sa.select(contents.c.id, contents.c.link, contents.c.canonical_link)
+        .where(contents.c.link.is_not(None))
+        .order_by(contents.c.id)
+    ):
+        canonical_link = canonical_link or __canonicalize_link__(link)
+        # Contents whose link is not a URL keep a NULL canonical_link.
+        if canonical_link is not None:
+            ids_by_link[canonical_link].append(id)
+
+    # Keep the oldest content per canonical link and point the responses of
+    # the others at it before deleting them.
+    for canonical_link, (kept_id, *duplicate_ids) in ids_by_link.items():
+        bind.execute(
+            contents.update()
+            .where(contents.c.id == kept_id)
+            .values(canonical_link=canonical_link)
+        )
+        if duplicate_ids:
+            bind.execute(
+                response_prompts.update()
+                .where(response_prompts.c.content_id.in_(duplicate_ids))
+                .values(content_id=kept_id)
+            )
+            bind.execute(contents.delete().where(contents.c.id.in_(duplicate_ids)))
+
+    if "ix_contents_canonical_link" not in {
+        index["name"] for index in inspector.get_indexes("contents")
+    }:
+        op.create_index(
+            "ix_contents_canonical_link", "contents", ["canonical_link"], unique=True
+        )
+
+
+def downgrade():
+    op.drop_index("ix_contents_canonical_link", table_name="contents")
+    with op.batch_alter_table("contents") as batch_op:
+        batch_op.drop_column("canonical_link")
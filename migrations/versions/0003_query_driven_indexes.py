@@ -0,0 +1,81 @@
+"""Replace per-column indexes with the ones the queries use
+
+Large text columns lose their indexes, which every insert had to update.
+Prompts get a (user_id, is_private, id desc) index for profile, timeline and
+feed reads, which all order and keyset-paginate followed users' prompts on
+id. Follows get a unique (user_id, follow_id) index after dropping
+duplicate rows, and response prompts a (prompt_id, id) index.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:20:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# Primary keys are already indexed, so their ix_*_id indexes go as well.
+DROPPED_INDEXES = {
+    "users": ["id", "full_name", "bio", "profile_picture", "profile_banner"],
+    "contents": [
+        "id",
+        "title",
+        "snippet",
+        "link",
+        "source",
+        "long_description",
+        "image",
+    ],
+    "prompts": ["id", "keywords", "user_id", "created_at"],
+    "response_prompts": [
+        "id",
+        "prompt_id",
+        "content_id",
+        "ai_response_subject",
+        "ai_response_description",
+        "created_at",
+    ],
+    "follows": ["id", "user_id", "created_at"],
+}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table, columns in DROPPED_INDEXES.items():
+        existing = {index["name"] for index in inspector.get_indexes(table)}
+        for column in columns:
+            if f"ix_{table}_{column}" in existing:
+                op.drop_index(f"ix_{table}_{column}", table_name=table)
+
+    op.create_index(
+        "ix_prompts_user_id_is_private_id",
+        "prompts",
+        ["user_id", "is_private", sa.text("id DESC")],
+    )
+    op.create_index(
+        "ix_response_prompts_prompt_id_id", "response_prompts", ["prompt_id", "id"]
+    )
+    op.execute(
+        "DELETE FROM follows WHERE id NOT IN "
+        "(SELECT MIN(id) FROM follows GROUP BY user_id, follow_id)"
+    )
+    op.create_index(
+        "ix_follows_user_id_follow_id",
+        "follows",
+        ["user_id", "follow_id"],
+        unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_follows_user_id_follow_id", table_name="follows")
+    op.drop_index("ix_response_prompts_prompt_id_id", table_name="response_prompts")
+    op.drop_index("ix_prompts_user_id_is_private_id", table_name="prompts")
+    for table, columns in DROPPED_INDEXES.items():
+        for column in columns:
+            op.create_index(f"ix_{table}_{column}", table, [column])
@@ -0,0 +1,52 @@
+"""Add follows_count and followers_count to users
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 09:30:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+users = sa.table(
+    "users",
+    sa.column("id", sa.Integer),
+    sa.column("follows_count", sa.Integer),
+    sa.column("followers_count", sa.Integer),
+)
+follows = sa.table(
+    "follows", sa.column("user_id", sa.Integer), sa.column("follow_id", sa.Integer)
+)
+
+
+def upgrade():
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(
+            sa.Column("follows_count", sa.Integer(), nullable=False, server_default="0")
+        )
+        batch_op.add_column(
+            sa.Column(
+                "followers_count", sa.Integer(), nullable=False, server_default="0"
+            )
+        )
+    op.execute(
+        users.update().values(
+            follows_count=sa.select(sa.func.count())
+            .where(follows.c.user_id == users.c.id)
+            .scalar_subquery(),
+            followers_count=sa.select(sa.func.count())
+            .where(follows.c.follow_id == users.c.id)
+            .scalar_subquery(),
+        )
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("followers_count")
+        batch_op.drop_column("follows_count")
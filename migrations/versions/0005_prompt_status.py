@@ -0,0 +1,26 @@
+"""Add status to prompts for background enrichment
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 14:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("prompts") as batch_op:
+        batch_op.add_column(
+            sa.Column("status", sa.String(), nullable=False, server_default="ready")
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("prompts") as batch_op:
+        batch_op.drop_column("status")
@@ -0,0 +1,257 @@
+import asyncio
+import os
+from contextlib import contextmanager
+
+import pytest
+
+# Settings the app reads at import time; tests never reach the real services.
+os.environ.setdefault("POSGTRES_URI", "sqlite://")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("AUTH_SECRET_KEY", "test")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("PASSWORD_HASH_ROUNDS", "4")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def max_queries():
+    """Fail if a block runs more than ``limit`` SQL statements.
+
+    with max_queries(2) as stats:
+        crud.get_something(db)
+    """
+    from app import database
+
+    @contextmanager
+    def check(limit: int):
+        with database.track_queries() as stats:
+            yield stats
+        statement, repeats = stats.most_repeated()
+        assert stats.count <= limit, (
+            f"{stats.count} queries, expected at most {limit}; "
+            f"ran {repeats} times: {statement}"
+        )
+
+    return check
+
+
+@pytest.fixture
+def db_session():
+    """Sync session on a fresh in-memory database."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app import models
+
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}
+    )
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    yield session
+    session.close()
+    models.Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+async def async_session_factory():
+    """Async session factory of a fresh in-memory database."""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import StaticPool
+    from app import models
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as connection:
+        await connection.run_sync(models.Base.metadata.create_all)
+    yield async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.fixture
+async def async_db_session(async_session_factory):
+    async with async_session_factory() as session:
+        yield session
+
+
+@pytest.fixture
+async def api_db(async_session_factory):
+    """Session factory of an in-memory database holding user1 (id 1)."""
+    from app import models
+
+    async with async_session_factory() as db:
+        db.add(models.User(id=1, email="user1@example.com", username="user1"))
+        await db.commit()
+    return async_session_factory
+
+
+@pytest.fixture
+async def api_client(api_db):
+    """Client of the app on ``api_db``, logged in as user1."""
+    import httpx
+    from app import models
+    from app.database import get_db
+    from app.main import app
+    from app.services.auth import get_current_user
+
+    async def get_test_db():
+        async with api_db() as db:
+            yield db
+
+    async def get_test_user():
+        async with api_db() as db:
+            return await db.get(models.User, 1)
+
+    app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[get_current_user] = get_test_user
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+class FakeLock:
+    def __init__(self, lock: asyncio.Lock):
+        self.lock = lock
+
+    async def acquire(self):
+        await self.lock.acquire()
+        return True
+
+    async def release(self):
+        self.lock.release()
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    async def execute(self):
+        return [
+            await getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.calls
+        ]
+
+
+def __encode__(value) -> bytes:
+    return value if isinstance(value, bytes) else str(value).encode()
+
+
+class FakeRedis:
+    """Just enough of the string, list, set and sorted set commands the app uses.
+
+    Values come back as bytes like from redis-py; keys never expire.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+        self.lists = {}
+        self.sets = {}
+        self.zsets = {}
+        self.locks = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def lock(self, name, timeout=None, blocking_timeout=None):
+        return FakeLock(self.locks.setdefault(name, asyncio.Lock()))
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = __encode__(value)
+        self.ttls[key] = ex
+
+    async def delete(self, *keys):
+        for key in keys:
+            for store in (self.values, self.lists, self.sets, self.zsets):
+                store.pop(key, None)
+
+    async def exists(self, *keys):
+        return sum(
+            any(
+                key in store
+                for store in (self.values, self.lists, self.sets, self.zsets)
+            )
+            for key in keys
+        )
+
+    async def expire(self, key, seconds):
+        self.ttls[key] = seconds
+        return True
+
+    async def lpush(self, key, *values):
+        self.lists.setdefault(key, [])[:0] = [__encode__(v) for v in reversed(values)]
+
+    async def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(__encode__(value) for value in values)
+
+    async def blmove(self, source, destination, timeout, src="LEFT", dest="RIGHT"):
+        items = self.lists.get(source)
+        if not items:
+            return None
+        item = items.pop() if src == "RIGHT" else items.pop(0)
+        if dest == "LEFT":
+            self.lists.setdefault(destination, []).insert(0, item)
+        else:
+            self.lists.setdefault(destination, []).append(item)
+        return item
+
+    async def lrem(self, key, count, value):
+        self.lists.get(key, []).remove(__encode__(value))
+
+    async def lrange(self, key, start, end):
+        return list(self.lists.get(key, []))
+
+    async def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    async def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(__encode__(m) for m in members)
+
+    async def srem(self, key, *members):
+        removed = self.sets.get(key, set()) & {__encode__(m) for m in members}
+        self.sets.get(key, set()).difference_update(removed)
+        return len(removed)
+
+    async def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    async def zrem(self, key, *members):
+        for member in members:
+            self.zsets.get(key, {}).pop(member, None)
+
+    async def zremrangebyrank(self, key, start, end):
+        members = sorted(self.zsets.get(key, {}).items(), key=lambda item: item[1])
+        for member, _ in members[start : max(len(members) + end + 1, 0)]:
+            del self.zsets[key][member]
+
+    async def zrevrangebyscore(self, key, max, min, start, num):
+        members = sorted(
+            self.zsets.get(key, {}).items(), key=lambda item: item[1], reverse=True
+        )
+        if max.startswith("("):
+            members = [m for m in members if m[1] < float(max[1:])]
+        return [__encode__(member) for member, _ in members[start : start + num]]
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """A ``FakeRedis`` installed as the app's Redis client."""
+    from app.services import redis_client
+
+    fake_redis = FakeRedis()
+    monkeypatch.setattr(redis_client, "client", fake_redis)
+    return fake_redis
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from app import models
+from app.services import auth
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(scope="function")
+async def user(async_db_session):
+    user = models.User(
+        email="ada@example.com",
+        username="ada",
+        full_name="Ada Lovelace",
+        hashed_password=auth.get_password_hash("secret"),
+    )
+    async_db_session.add(user)
+    await async_db_session.commit()
+    return user
+
+
+def test_bcrypt_cost_is_configurable():
+    assert auth.pwd_context.hash("secret").startswith(
+        f"$2b${auth.PASSWORD_HASH_ROUNDS:02d}$"
+    )
+
+
+async def test_authenticate_user_verifies_in_password_pool(
+    async_db_session, user, monkeypatch
+):
+    threads = []
+    verify_password = auth.verify_password
+
+    def recording_verify_password(plain_password, hashed_password):
+        threads.append(threading.current_thread().name)
+        return verify_password(plain_password, hashed_password)
+
+    monkeypatch.setattr(auth, "verify_password", recording_verify_password)
+
+    assert (
+        await auth.async_authenticate_user("ada", "secret", async_db_session)
+    ).id == 1
+    assert await auth.async_authenticate_user("ada", "wrong", async_db_session) is False
+    assert (
+        await auth.async_authenticate_user("bob", "secret", async_db_session) is False
+    )
+    assert len(threads) == 2
+    assert all(name.startswith("password-hash") for name in threads)
+
+
+async def test_slow_hashes_do_not_block_the_event_loop(monkeypatch):
+    def slow_hash(password):
+        time.sleep(0.2)
+        return password
+
+    monkeypatch.setattr(auth, "get_password_hash", slow_hash)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticking = asyncio.create_task(ticker())
+    await asyncio.gather(*(auth.async_get_password_hash("secret") for _ in range(4)))
+    ticking.cancel()
+
+    assert ticks >= 10
@@ -0,0 +1,80 @@
+import asyncio
+import json
+from typing import Any
+
+import pytest
+from fastapi import HTTPException
+from langchain.llms.fake import FakeListLLM
+from app.services import chatgpt
+
+LLM_RESPONSE = json.dumps(
+    {
+        "main_subject_of_the_prompt": "Physics",
+        "basic_subjects": [{"detailed_name": "Mechanics", "description": "Motion"}],
+        "deeper_subjects": [{"detailed_name": "Quantum", "description": "Small"}],
+    }
+)
+
+
+class SlowFakeListLLM(FakeListLLM):
+    delay: float = 0.05
+
+    async def _acall(self, prompt: str, *args: Any, **kwargs: Any) -> str:
+        await asyncio.sleep(self.delay)
+        return await super()._acall(prompt, *args, **kwargs)
+
+
+def test_async_gpt_json_response_parses_llm_output(monkeypatch):
+    monkeypatch.setattr(chatgpt, "llm", FakeListLLM(responses=[LLM_RESPONSE]))
+
+    response = asyncio.run(chatgpt.async_gpt_json_response("physics"))
+
+    assert response.main_subject_of_the_prompt == "Physics"
+    assert response.deeper_subjects[0].detailed_name == "Quantum"
+
+
+def test_async_gpt_json_response_fixes_invalid_output(monkeypatch):
+    monkeypatch.setattr(chatgpt, "llm", FakeListLLM(responses=["not json"]))
+    fixing_llm = FakeListLLM(responses=[LLM_RESPONSE])
+    monkeypatch.setattr(chatgpt, "fixing_llm", fixing_llm)
+
+    response = asyncio.run(chatgpt.async_gpt_json_response("physics"))
+
+    assert response.basic_subjects[0].detailed_name == "Mechanics"
+    assert fixing_llm.i == 1
+
+
+def test_gpt_json_response_fixes_invalid_output(monkeypatch):
+    monkeypatch.setattr(chatgpt, "llm", FakeListLLM(responses=["not json"]))
+    fixing_llm = FakeListLLM(responses=[LLM_RESPONSE])
+    monkeypatch.setattr(chatgpt, "fixing_llm", fixing_llm)
+
+    response = chatgpt.gpt_json_response("physics")
+
+    assert response.basic_subjects[0].detailed_name == "Mechanics"
+    assert fixing_llm.i == 1
+
+
+def test_concurrent_identical_prompts_share_one_llm_call(monkeypatch):
+    llm = SlowFakeListLLM(responses=[LLM_RESPONSE])
+    monkeypatch.setattr(chatgpt, "llm", llm)
+
+    async def run():
+        return await asyncio.gather(
+            *(chatgpt.async_gpt_json_response("physics") for _ in range(3))
+        )
+
+    responses = asyncio.run(run())
+
+    assert llm.i == 1
+    assert len({response.json() for response in responses}) == 1
+
+
+def test_async_gpt_json_response_times_out(monkeypatch):
+    monkeypatch.setattr(chatgpt, "llm", SlowFakeListLLM(responses=[LLM_RESPONSE]))
+    monkeypatch.setattr(chatgpt, "LLM_TIMEOUT", 0.01)
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(chatgpt.async_gpt_json_response("physics"))
+
+    assert exc_info.value.status_code == 504
@@ -1,28 +1,14 @@
+import json
+
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from fastapi import HTTPException
+from sqlalchemy import event
 from app import models
 from app.crud import contents as contents_crud
-from app.schemas.contents import Content, ContentBase
-
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
-
-
-def create_test_engine():
-    return create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-    )
-
-
-@pytest.fixture(scope="function")
-def db_session():
-    engine = create_test_engine()
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    models.Base.metadata.create_all(bind=engine)
-    session = TestingSessionLocal()
-    yield session
-    session.close()
-    models.Base.metadata.drop_all(bind=engine)
+from app.routers import contents as contents_router
+from app.schemas.contents import Content, ContentBase, ContentCreate
+from app.services import job_queue, search
+from tests.test_enrichment import LLM_RESPONSE
 
 
 @pytest.fixture(scope="function")
@@ -55,8 +41,39 @@ def test_get_content_by_title(db_session, sample_content):
 
 
 def test_get_contents(db_session, sample_content):
-    contents = contents_crud.get_contents(db_session, skip=0, limit=10)
+    contents, next_cursor = contents_crud.get_contents(db_session, limit=10)
     assert contents[0].id == sample_content.id
+    assert next_cursor is None
+
+
+def test_get_contents_pages_by_cursor(db_session):
+    for index in range(5):
+        contents_crud.create_content(
+            ContentBase(
+                title=f"Title {index}",
+                snippet="Snippet",
+                link=f"https://example.com/{index}",
+                long_description="Long Description",
+                image="https://example.com/image.jpg",
+            ),
+            "Test Source",
+            db_session,
+        )
+
+    pages, cursor = [], None
+    while True:
+        page, cursor = contents_crud.get_contents(db_session, limit=2, cursor=cursor)
+        pages.append([content.title for content in page])
+        if cursor is None:
+            break
+
+    assert pages == [["Title 4", "Title 3"], ["Title 2", "Title 1"], ["Title 0"]]
+
+
+def test_get_contents_rejects_invalid_cursor(db_session):
+    with pytest.raises(HTTPException) as exc_info:
+        contents_crud.get_contents(db_session, cursor="not-a-cursor")
+    assert exc_info.value.status_code == 400
 
 
 def test_create_content(db_session, sample_content):
@@ -70,3 +87,195 @@ def test_create_content(db_session, sample_content):
     source = "Another Test Source"
     content = contents_crud.create_content(content_create, source, db_session)
     assert content.title == "Another Title"
+
+
+def test_create_contents_with_response_prompts(db_session):
+    statements = []
+    commits = []
+    event.listen(
+        db_session.get_bind(),
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    event.listen(db_session, "after_commit", commits.append)
+    subjects = [
+        (
+            f"Subject {i}",
+            f"Description {i}",
+            [
+                ContentCreate(
+                    title=f"Title {i}-{j}",
+                    snippet="Snippet",
+                    link=f"https://example.com/{i}/{j}",
+                    long_description="Long Description",
+                    image="https://example.com/image.jpg",
+                    source="youtube",
+                )
+                for j in range(3)
+            ],
+        )
+        for i in range(4)
+    ]
+
+    grouped_contents = contents_crud.create_contents_with_response_prompts(
+        1, subjects, db_session
+    )
+
+    assert [[content["title"] for content in group] for group in grouped_contents] == [
+        [content.title for content in subject_contents]
+        for _, _, subject_contents in subjects
+    ]
+    # Plain dicts that still match the response schema.
+    assert all(Content(**c).dict() == c for group in grouped_contents for c in group)
+    assert len(statements) == 2
+    assert all(s.startswith("INSERT") for s in statements)
+    assert len(commits) == 1
+    response_prompts = db_session.query(models.ResponsePrompt).all()
+    assert len(response_prompts) == 12
+    assert {rp.content_id for rp in response_prompts} == {
+        content["id"] for group in grouped_contents for content in group
+    }
+
+
+def test_create_contents_upserts_on_canonical_link(db_session):
+    def content(link: str, title: str) -> ContentCreate:
+        return ContentCreate(
+            title=title,
+            snippet="Snippet",
+            link=link,
+            long_description="Long Description",
+            image="https://example.com/image.jpg",
+            source="youtube",
+        )
+
+    first = contents_crud.create_contents_with_response_prompts(
+        1,
+        [("Subject", "Description", [content("https://youtu.be/abc", "Old")])],
+        db_session,
+    )
+    second = contents_crud.create_contents_with_response_prompts(
+        2,
+        [
+            (
+                "Subject",
+                "Description",
+                [
+                    content("https://www.youtube.com/watch?v=abc&t=1", "New"),
+                    content("https://youtube.com/watch?v=abc", "New"),
+                ],
+            )
+        ],
+        db_session,
+    )
+
+    assert first[0][0]["id"] == second[0][0]["id"] == second[0][1]["id"]
+    assert second[0][0]["title"] == "New"
+    assert db_session.query(models.Content).count() == 1
+    assert db_session.query(models.ResponsePrompt).count() == 3
+
+
+def test_create_content_returns_existing_content(db_session, sample_content):
+    content_create = ContentBase(
+        title="Sample Title",
+        snippet="Sample Snippet",
+        link="https://www.example.com/#top",
+        long_description="Long Description",
+        image="https://example.com/image.jpg",
+    )
+    content = contents_crud.create_content(content_create, "Test Source", db_session)
+    assert content.id == sample_content.id
+    assert content.link == "https://www.example.com/#top"
+
+
+@pytest.fixture
+def fake_upstreams(monkeypatch):
+    async def generate(prompt, generate):
+        return LLM_RESPONSE
+
+    async def fake_search(query, search_engine_id):
+        return [
+            {
+                "title": query,
+                "link": f"https://example.com/{search_engine_id}/{query}",
+                "pagemap": {"metatags": [{}]},
+            }
+        ]
+
+    monkeypatch.setattr(contents_router, "get_or_generate", generate)
+    monkeypatch.setattr(search, "__search__", fake_search)
+
+
+CURIOUS_INPUT = {"prompt": "What is physics?", "is_private": False}
+
+
+@pytest.mark.anyio
+async def test_curious_in_background_answers_202_with_location(
+    api_client, fake_upstreams
+):
+    response = await api_client.post(
+        "/curious", params={"background": "true"}, json=CURIOUS_INPUT
+    )
+    prompt = response.json()
+
+    assert response.status_code == 202
+    assert prompt["status"] == "pending"
+    assert response.headers["location"] == f"/prompts/{prompt['id']}/contents"
+    assert await job_queue.local_queue.pop(timeout=1) == {"prompt_id": prompt["id"]}
+    assert (await api_client.get(response.headers["location"])).status_code == 202
+
+
+@pytest.mark.anyio
+async def test_curious_streams_ndjson_events(api_client, fake_upstreams):
+    response = await api_client.post(
+        "/curious", params={"stream": "ndjson"}, json=CURIOUS_INPUT
+    )
+    events = [json.loads(line) for line in response.text.splitlines()]
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [event["event"] for event in events] == [
+        "subjects",
+        "subject",
+        "subject",
+        "done",
+    ]
+    assert events[0]["data"]["main_subject_of_the_prompt"] == "Physics"
+    assert {event["data"]["subject"] for event in events[1:3]} == {
+        "Mechanics",
+        "Quantum",
+    }
+
+
+@pytest.mark.anyio
+async def test_curious_streams_server_sent_events(api_client, fake_upstreams):
+    response = await api_client.post(
+        "/curious", params={"stream": "sse"}, json=CURIOUS_INPUT
+    )
+    frames = response.text.split("\n\n")
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert frames[-1] == ""
+    assert [frame.split("\n")[0] for frame in frames[:-1]] == [
+        "event: subjects",
+        "event: subject",
+        "event: subject",
+        "event: done",
+    ]
+    assert all(frame.split("\n")[1].startswith("data: {") for frame in frames[:-1])
+
+
+@pytest.mark.anyio
+async def test_curious_stream_ends_with_an_error_event(
+    api_client, fake_upstreams, monkeypatch
+):
+    async def failing_save(*args, **kwargs):
+        raise HTTPException(status_code=400, detail="Database down")
+
+    monkeypatch.setattr(search, "save_subjects_and_results", failing_save)
+
+    response = await api_client.post(
+        "/curious", params={"stream": "ndjson"}, json=CURIOUS_INPUT
+    )
+    events = [json.loads(line) for line in response.text.splitlines()]
+
+    assert [event["event"] for event in events] == ["subjects", "error"]
+    assert events[-1]["data"] == {"detail": "Database down"}
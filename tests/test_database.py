@@ -0,0 +1,129 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app import database
+from app.crud import users
+from app.database import async_database_url
+from app.schemas.users import UserCreate
+
+pytestmark = pytest.mark.anyio
+
+
+def test_async_database_url():
+    assert (
+        async_database_url("postgresql://user:secret@db:5432/curious")
+        == "postgresql+asyncpg://user:secret@db:5432/curious"
+    )
+    assert async_database_url("sqlite:///:memory:") == "sqlite+aiosqlite:///:memory:"
+
+
+def test_pool_options_size_only_server_pools():
+    options = database.pool_options(
+        "postgresql://db/curious", "sync", database.InstrumentedQueuePool
+    )
+    assert options["poolclass"] is database.InstrumentedQueuePool
+    assert options["pool_size"] == database.DB_POOL_SIZE
+    assert options["pool_pre_ping"] == database.DB_POOL_PRE_PING
+
+    options = database.pool_options("sqlite://", "sync", database.InstrumentedQueuePool)
+    assert "poolclass" not in options
+    assert "pool_size" not in options
+
+
+def test_instrumented_pool_records_checkouts_and_waits(tmp_path, monkeypatch):
+    metrics = database.PoolMetrics()
+    monkeypatch.setitem(database.pool_metrics, "test", metrics)
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=database.InstrumentedQueuePool,
+        pool_logging_name="test",
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    database.instrument_pool(engine, metrics)
+
+    connection = engine.connect()
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+
+    assert metrics.checkouts == 1
+    assert metrics.checked_out == 1
+    assert metrics.connects == 1
+    assert metrics.checkout_timeouts == 1
+    assert metrics.max_checkout_wait_seconds >= 0.05
+
+    connection.close()
+    engine.dispose()
+
+    assert metrics.checked_out == 0
+    assert metrics.max_checked_out == 1
+    assert metrics.closes == 1
+
+
+async def test_awaitable_crud_runs_on_async_session(async_db_session):
+    created = await users.async_create_user(
+        UserCreate(
+            email="async@example.com",
+            username="async",
+            full_name="Async User",
+            password="password",
+        ),
+        db=async_db_session,
+    )
+
+    user = await users.async_get_user_by_username("async", async_db_session)
+
+    assert user.id == created.id
+    assert user.email == "async@example.com"
+
+
+async def test_awaitable_crud_raises_like_sync_crud(async_db_session):
+    with pytest.raises(HTTPException) as exc_info:
+        await users.async_get_user(42, async_db_session)
+
+    assert exc_info.value.status_code == 404
+
+
+async def test_track_queries_counts_async_session_statements(async_db_session):
+    with database.track_queries() as stats:
+        for _ in range(3):
+            await async_db_session.execute(text("SELECT 1"))
+        await users.async_get_users(async_db_session)
+
+    assert stats.count == 4
+    assert stats.most_repeated() == ("SELECT 1", 3)
+    assert stats.seconds > 0
+
+
+def test_warn_on_queries_names_the_repeated_statement(caplog):
+    stats = database.QueryStats(count=7)
+    stats.statements["SELECT 1"] = 2
+    stats.statements["SELECT contents.id\nFROM contents"] = 5
+
+    database.warn_on_queries("GET /prompts/profile/me", stats)
+
+    assert caplog.messages == [
+        "GET /prompts/profile/me: 7 queries in 0.0 ms, this one 5 times: "
+        "SELECT contents.id FROM contents"
+    ]
+
+
+def test_warn_on_queries_stays_quiet_under_thresholds(caplog):
+    stats = database.QueryStats(count=3)
+    stats.statements["SELECT 1"] = 3
+
+    database.warn_on_queries("GET /users/me", stats)
+
+    assert caplog.messages == []
+
+
+async def test_track_queries_adds_nested_blocks_to_the_outer_one(async_db_session):
+    with database.track_queries() as outer:
+        await async_db_session.execute(text("SELECT 1"))
+        with database.track_queries() as inner:
+            await async_db_session.execute(text("SELECT 2"))
+
+    assert inner.count == 1
+    assert outer.count == 2
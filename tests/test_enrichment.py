@@ -0,0 +1,258 @@
+import asyncio
+
+import pytest
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from app import models
+from app.crud import prompts as prompts_crud
+from app.schemas.openai_response import LLMResponse, Subject
+from app.services import enrichment, job_queue, search
+
+pytestmark = pytest.mark.anyio
+
+LLM_RESPONSE = LLMResponse(
+    main_subject_of_the_prompt="Physics",
+    basic_subjects=[Subject(detailed_name="Mechanics", description="Motion")],
+    deeper_subjects=[Subject(detailed_name="Quantum", description="Small")],
+)
+
+
+@pytest.fixture(scope="function")
+async def pending_prompt(async_session_factory):
+    async with async_session_factory() as db:
+        prompt = models.Prompt(
+            title="What is physics?", keywords="", user_id=1, status="pending"
+        )
+        db.add(prompt)
+        await db.commit()
+        return prompt.id
+
+
+@pytest.fixture(autouse=True)
+def fake_upstreams(monkeypatch):
+    async def generate(prompt, generate):
+        return LLM_RESPONSE
+
+    async def fake_search(query, search_engine_id):
+        return [
+            {
+                "title": query,
+                "link": f"https://example.com/{search_engine_id}/{query}",
+                "pagemap": {"metatags": [{}]},
+            }
+        ]
+
+    monkeypatch.setattr(enrichment, "get_or_generate", generate)
+    monkeypatch.setattr(search, "__search__", fake_search)
+
+
+async def test_enrich_prompt_stores_contents_and_marks_ready(
+    async_session_factory, pending_prompt
+):
+    async with async_session_factory() as db:
+        status = await enrichment.enrich_prompt(pending_prompt, db)
+        prompt = await prompts_crud.async_get_prompt_by_id(pending_prompt, db)
+        history = await prompts_crud.async_get_prompt_contents_history(
+            pending_prompt, db
+        )
+
+    assert status == prompt.status == "ready"
+    assert prompt.keywords == "Physics"
+    assert [subject["subject"] for subject in history] == ["Mechanics", "Quantum"]
+
+
+async def test_enrich_prompt_marks_failed_on_llm_error(
+    async_session_factory, pending_prompt, monkeypatch
+):
+    async def failing_generate(prompt, generate):
+        raise RuntimeError("LLM down")
+
+    monkeypatch.setattr(enrichment, "get_or_generate", failing_generate)
+
+    async with async_session_factory() as db:
+        status = await enrichment.enrich_prompt(pending_prompt, db)
+        prompt = await prompts_crud.async_get_prompt_by_id(pending_prompt, db)
+
+    assert status == prompt.status == "failed"
+
+
+async def test_worker_consumes_queued_jobs(
+    async_session_factory, pending_prompt, monkeypatch
+):
+    queue = job_queue.MemoryJobQueue()
+    await queue.push({"prompt_id": pending_prompt})
+    enriched = asyncio.Event()
+    enrich_prompt = enrichment.enrich_prompt
+
+    async def tracked_enrich_prompt(prompt_id, db):
+        status = await enrich_prompt(prompt_id, db)
+        enriched.set()
+        return status
+
+    monkeypatch.setattr(enrichment, "enrich_prompt", tracked_enrich_prompt)
+    worker = asyncio.create_task(
+        enrichment.run_worker(queue, async_session_factory, concurrency=2)
+    )
+    try:
+        await asyncio.wait_for(enriched.wait(), 5)
+    finally:
+        worker.cancel()
+
+    async with async_session_factory() as db:
+        prompt = await prompts_crud.async_get_prompt_by_id(pending_prompt, db)
+    assert prompt.status == "ready"
+    assert await queue.size() == 0
+
+
+async def test_enrich_prompt_leaves_prompt_pending_when_cancelled(
+    async_session_factory, pending_prompt, monkeypatch
+):
+    started = asyncio.Event()
+
+    async def hanging_generate(prompt, generate):
+        started.set()
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(enrichment, "get_or_generate", hanging_generate)
+
+    async with async_session_factory() as db:
+        task = asyncio.create_task(enrichment.enrich_prompt(pending_prompt, db))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    async with async_session_factory() as db:
+        prompt = await prompts_crud.async_get_prompt_by_id(pending_prompt, db)
+    assert prompt.status == "pending"
+
+
+async def test_cancelled_worker_does_not_ack_its_job(
+    async_session_factory, pending_prompt, monkeypatch
+):
+    queue = job_queue.MemoryJobQueue()
+    await queue.push({"prompt_id": pending_prompt})
+    started = asyncio.Event()
+    acked = []
+
+    async def hanging_generate(prompt, generate):
+        started.set()
+        await asyncio.sleep(60)
+
+    async def ack(job):
+        acked.append(job)
+
+    monkeypatch.setattr(enrichment, "get_or_generate", hanging_generate)
+    monkeypatch.setattr(queue, "ack", ack)
+    worker = asyncio.create_task(enrichment.run_worker(queue, async_session_factory, 1))
+    await asyncio.wait_for(started.wait(), 5)
+    worker.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await worker
+
+    assert acked == []
+    assert await enrichment.requeue_pending_prompts(queue, async_session_factory) == 1
+
+
+async def test_redelivered_prompt_replaces_earlier_results(
+    async_session_factory, pending_prompt
+):
+    async with async_session_factory() as db:
+        db.add(
+            models.ResponsePrompt(
+                prompt_id=pending_prompt,
+                ai_response_subject="Mechanics",
+                ai_response_description="From the crashed run",
+            )
+        )
+        await db.commit()
+        await enrichment.enrich_prompt(pending_prompt, db)
+        descriptions = await db.scalars(
+            select(models.ResponsePrompt.ai_response_description).where(
+                models.ResponsePrompt.prompt_id == pending_prompt
+            )
+        )
+
+    # One response_prompt per subject and source, none left from the crash.
+    assert sorted(descriptions.all()) == ["Motion"] * 3 + ["Small"] * 3
+
+
+async def test_worker_survives_redis_errors(
+    async_session_factory, pending_prompt, monkeypatch
+):
+    queue = job_queue.MemoryJobQueue()
+    await queue.push({"prompt_id": pending_prompt})
+    pop, ack = queue.pop, queue.ack
+    failures = {"pop": 1, "ack": 1}
+    acked = asyncio.Event()
+
+    async def flaky_pop(timeout):
+        if failures["pop"]:
+            failures["pop"] -= 1
+            raise RedisError("connection lost")
+        return await pop(timeout)
+
+    async def flaky_ack(job):
+        if failures["ack"]:
+            failures["ack"] -= 1
+            raise RedisError("connection lost")
+        await ack(job)
+        acked.set()
+
+    monkeypatch.setattr(enrichment, "JOB_QUEUE_RETRY_DELAY", 0)
+    monkeypatch.setattr(queue, "pop", flaky_pop)
+    monkeypatch.setattr(queue, "ack", flaky_ack)
+    worker = asyncio.create_task(enrichment.run_worker(queue, async_session_factory, 1))
+    try:
+        await asyncio.wait_for(acked.wait(), 5)
+    finally:
+        worker.cancel()
+
+    async with async_session_factory() as db:
+        prompt = await prompts_crud.async_get_prompt_by_id(pending_prompt, db)
+    assert prompt.status == "ready"
+
+
+async def test_enrich_prompt_skips_prompts_no_longer_pending(
+    async_session_factory, pending_prompt
+):
+    async with async_session_factory() as db:
+        await prompts_crud.async_set_prompt_status(pending_prompt, "ready", db)
+        status = await enrichment.enrich_prompt(pending_prompt, db)
+        history = await prompts_crud.async_get_prompt_contents_history(
+            pending_prompt, db
+        )
+
+    assert status == "ready"
+    assert history == []
+
+
+async def test_worker_fails_jobs_over_max_attempts(
+    async_session_factory, pending_prompt, monkeypatch
+):
+    queue = job_queue.MemoryJobQueue()
+    await queue.push(
+        {"prompt_id": pending_prompt, "attempts": enrichment.JOB_MAX_ATTEMPTS}
+    )
+    acked = asyncio.Event()
+
+    async def ack(job):
+        acked.set()
+
+    monkeypatch.setattr(queue, "ack", ack)
+    worker = asyncio.create_task(enrichment.run_worker(queue, async_session_factory, 1))
+    try:
+        await asyncio.wait_for(acked.wait(), 5)
+    finally:
+        worker.cancel()
+
+    async with async_session_factory() as db:
+        prompt = await prompts_crud.async_get_prompt_by_id(pending_prompt, db)
+    assert prompt.status == "failed"
+
+
+async def test_pending_prompts_are_requeued(async_session_factory, pending_prompt):
+    queue = job_queue.MemoryJobQueue()
+
+    assert await enrichment.requeue_pending_prompts(queue, async_session_factory) == 1
+    assert await queue.pop(timeout=1) == {"prompt_id": pending_prompt}
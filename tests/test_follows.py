@@ -1,29 +1,9 @@
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from fastapi import HTTPException
 from app import models
 from app.crud import follows as follows_crud
 from app.schemas.follows import FollowCreate
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
-
-
-def create_test_engine():
-    return create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-    )
-
-
-@pytest.fixture(scope="function")
-def db_session():
-    engine = create_test_engine()
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    models.Base.metadata.create_all(bind=engine)
-    session = TestingSessionLocal()
-    yield session
-    session.close()
-    models.Base.metadata.drop_all(bind=engine)
-
 
 @pytest.fixture(scope="function")
 def sample_follow(db_session):
@@ -50,3 +30,139 @@ def test_create_follow(db_session):
     follow_create = FollowCreate(user_id=3, follow_id=4)
     follow = follows_crud.create_follow(follow_create, db_session)
     assert follow.user_id == 3 and follow.follow_id == 4
+
+
+@pytest.fixture(scope="function")
+def users(db_session):
+    for user_id in range(1, 4):
+        db_session.add(models.User(id=user_id, username=f"user{user_id}"))
+    db_session.commit()
+
+
+def test_follow_counters_follow_creates_and_deletes(db_session, users):
+    follows_crud.create_follow(FollowCreate(user_id=1, follow_id=2), db_session)
+    follows_crud.create_follow(FollowCreate(user_id=3, follow_id=2), db_session)
+    follows_crud.delete_follow(3, 2, db_session)
+
+    assert follows_crud.get_follow_counts(1, db_session) == (1, 0)
+    assert follows_crud.get_follow_counts(2, db_session) == (0, 1)
+    assert follows_crud.get_follow_counts(3, db_session) == (0, 0)
+
+
+def test_second_unfollow_leaves_counters_at_zero(db_session, users):
+    follows_crud.create_follow(FollowCreate(user_id=1, follow_id=2), db_session)
+    follows_crud.delete_follow(1, 2, db_session)
+
+    with pytest.raises(HTTPException) as exc_info:
+        follows_crud.delete_follow(1, 2, db_session)
+
+    assert exc_info.value.status_code == 400
+    assert follows_crud.get_follow_counts(1, db_session) == (0, 0)
+    assert follows_crud.get_follow_counts(2, db_session) == (0, 0)
+
+
+def test_duplicate_follow_is_a_conflict(db_session, users):
+    follows_crud.create_follow(FollowCreate(user_id=1, follow_id=2), db_session)
+
+    with pytest.raises(HTTPException) as exc_info:
+        follows_crud.create_follow(FollowCreate(user_id=1, follow_id=2), db_session)
+
+    assert exc_info.value.status_code == 409
+    assert follows_crud.get_follow_counts(2, db_session) == (0, 1)
+
+
+def test_reconcile_follow_counts_repairs_drift(db_session, users):
+    follows_crud.create_follow(FollowCreate(user_id=1, follow_id=2), db_session)
+    db_session.add(models.Follows(user_id=3, follow_id=2))
+    db_session.get(models.User, 1).follows_count = 5
+    db_session.commit()
+
+    assert follows_crud.reconcile_follow_counts(db_session) == 3
+    assert follows_crud.get_follow_counts(1, db_session) == (1, 0)
+    assert follows_crud.get_follow_counts(2, db_session) == (0, 2)
+    assert follows_crud.get_follow_counts(3, db_session) == (1, 0)
+    assert follows_crud.reconcile_follow_counts(db_session) == 0
+
+
+def test_followed_users_are_paginated_latest_first(db_session, users):
+    for follow_id in (2, 3):
+        follows_crud.create_follow(
+            FollowCreate(user_id=1, follow_id=follow_id), db_session
+        )
+
+    first_page, cursor = follows_crud.get_followed_users(1, db_session, limit=1)
+    second_page, last_cursor = follows_crud.get_followed_users(
+        1, db_session, limit=1, cursor=cursor
+    )
+
+    assert [user.username for user in first_page] == ["user3"]
+    assert [user.username for user in second_page] == ["user2"]
+    assert last_cursor is None
+
+
+def test_follow_listings_use_one_query_per_page(db_session, users, max_queries):
+    for user_id in (2, 3):
+        follows_crud.create_follow(
+            FollowCreate(user_id=1, follow_id=user_id), db_session
+        )
+        follows_crud.create_follow(
+            FollowCreate(user_id=user_id, follow_id=1), db_session
+        )
+    db_session.expire_all()
+
+    with max_queries(1):
+        follows_crud.get_followed_users(1, db_session)
+    with max_queries(1):
+        follows_crud.get_follower_users(1, db_session, usernames_only=True)
+
+
+def test_follower_users_usernames_only(db_session, users):
+    follows_crud.create_follow(FollowCreate(user_id=1, follow_id=3), db_session)
+    follows_crud.create_follow(FollowCreate(user_id=2, follow_id=3), db_session)
+
+    followers, cursor = follows_crud.get_follower_users(
+        3, db_session, usernames_only=True
+    )
+
+    assert [(row.id, row.username) for row in followers] == [
+        (2, "user2"),
+        (1, "user1"),
+    ]
+    assert cursor is None
+
+
+@pytest.mark.anyio
+async def test_follow_listings_come_in_a_next_cursor_envelope(api_client, api_db):
+    async with api_db() as db:
+        for user_id in range(2, 5):
+            db.add(
+                models.User(
+                    id=user_id,
+                    email=f"user{user_id}@example.com",
+                    username=f"user{user_id}",
+                )
+            )
+            db.add(models.Follows(user_id=1, follow_id=user_id))
+            await db.commit()
+
+    first = await api_client.get(
+        "/users/follows/me", params={"limit": 2, "fields": "username"}
+    )
+    second = await api_client.get(
+        "/users/follows/me",
+        params={
+            "limit": 2,
+            "fields": "username",
+            "cursor": first.json()["next_cursor"],
+        },
+    )
+
+    assert "X-Next-Cursor" not in first.headers
+    assert first.json()["items"] == [
+        {"id": 4, "username": "user4"},
+        {"id": 3, "username": "user3"},
+    ]
+    assert second.json() == {
+        "items": [{"id": 2, "username": "user2"}],
+        "next_cursor": None,
+    }
@@ -0,0 +1,49 @@
+import asyncio
+
+import httpx
+import pytest
+from app.services import http_client, search, search_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_search_cache(monkeypatch):
+    monkeypatch.setattr(
+        search_cache, "local_cache", search_cache.LRUCache(max_entries=16)
+    )
+
+
+def test_search_uses_shared_client(monkeypatch):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"items": [{"title": "Title"}]})
+
+    monkeypatch.setattr(
+        http_client, "client", httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+    monkeypatch.setattr(http_client, "counters", http_client.RequestCounters())
+
+    items = asyncio.run(search.__search__("physics", "engine"))
+
+    assert items == [{"title": "Title"}]
+    assert requests[0].url.params["q"] == "physics"
+    assert http_client.counters.requests_total == 1
+    assert http_client.counters.requests_in_flight == 0
+
+
+def test_pool_stats_counts_errors(monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("Connection refused")
+
+    monkeypatch.setattr(
+        http_client, "client", httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+    monkeypatch.setattr(http_client, "counters", http_client.RequestCounters())
+
+    assert asyncio.run(search.__search__("physics", "engine")) == []
+
+    stats = http_client.pool_stats()
+    assert stats["open"] is True
+    assert stats["requests_total"] == 1
+    assert stats["request_errors"] == 1
@@ -0,0 +1,38 @@
+import pytest
+from app.services import job_queue
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_popped_jobs_stay_in_processing_until_acked(fake_redis):
+    queue = job_queue.RedisJobQueue(fake_redis)
+    await queue.push({"prompt_id": 1})
+    await queue.push({"prompt_id": 2})
+
+    job = await queue.pop(timeout=1)
+
+    assert job == {"prompt_id": 1}
+    assert await queue.size() == 1
+    processing_key = f"{queue.key}:processing:{queue.worker_id}"
+    assert fake_redis.lists[processing_key] == [b'{"prompt_id": 1}']
+    await queue.ack(job)
+    assert fake_redis.lists[processing_key] == []
+
+
+async def test_jobs_of_dead_workers_are_requeued_once(fake_redis):
+    dead = job_queue.RedisJobQueue(fake_redis)
+    await dead.heartbeat()
+    await dead.push({"prompt_id": 1})
+    await dead.pop(timeout=1)
+    await dead.push({"prompt_id": 2})
+    alive = job_queue.RedisJobQueue(fake_redis)
+    await alive.heartbeat()
+
+    assert await alive.recover() == 0
+
+    del fake_redis.values[f"{dead.key}:lease:{dead.worker_id}"]
+    assert await alive.recover() == 1
+    assert await job_queue.RedisJobQueue(fake_redis).recover() == 0
+
+    assert await alive.pop(timeout=1) == {"prompt_id": 1, "attempts": 1}
+    assert await alive.pop(timeout=1) == {"prompt_id": 2}
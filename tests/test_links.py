@@ -0,0 +1,27 @@
+import pytest
+from app.services.links import canonicalize_link
+
+
+@pytest.mark.parametrize(
+    "link, canonical_link",
+    [
+        (
+            "https://www.youtube.com/watch?v=abc&t=10s",
+            "https://youtube.com/watch?v=abc",
+        ),
+        ("https://youtu.be/abc?si=share", "https://youtube.com/watch?v=abc"),
+        ("http://m.youtube.com/shorts/abc/", "https://youtube.com/watch?v=abc"),
+        (
+            "https://old.reddit.com/r/physics/comments/1/x/?utm_source=share#c",
+            "https://reddit.com/r/physics/comments/1/x",
+        ),
+        ("https://x.com/user/status/1?s=20", "https://twitter.com/user/status/1"),
+        (
+            "https://Example.com/a/?b=2&a=1&utm_medium=x",
+            "https://example.com/a?a=1&b=2",
+        ),
+        ("https://example.com", "https://example.com/"),
+    ],
+)
+def test_canonicalize_link(link, canonical_link):
+    assert canonicalize_link(link) == canonical_link
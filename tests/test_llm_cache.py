@@ -0,0 +1,79 @@
+import asyncio
+import zlib
+
+import pytest
+from app.schemas.openai_response import LLMResponse, Subject
+from app.services import llm_cache, redis_client
+
+LLM_RESPONSE = LLMResponse(
+    main_subject_of_the_prompt="Physics",
+    basic_subjects=[Subject(detailed_name="Mechanics", description="Motion")],
+    deeper_subjects=[Subject(detailed_name="Quantum", description="Small")],
+)
+
+
+class FakeGenerate:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return LLM_RESPONSE
+
+
+@pytest.fixture(autouse=True)
+def reset_counters(fake_redis, monkeypatch):
+    monkeypatch.setattr(llm_cache, "counters", llm_cache.CacheCounters())
+
+
+def test_cache_key_normalizes_prompt():
+    assert llm_cache.cache_key("Quantum physics") == llm_cache.cache_key(
+        " quantum   physics "
+    )
+    assert llm_cache.cache_key("Quantum physics").startswith(
+        f"llm:v{llm_cache.JSON_TEMPLATE_VERSION}:"
+    )
+
+
+def test_cached_response_is_compressed_with_ttl(fake_redis):
+    generate = FakeGenerate()
+
+    asyncio.run(llm_cache.get_or_generate("Quantum physics", generate))
+    response = asyncio.run(llm_cache.get_or_generate("quantum physics ", generate))
+
+    key = llm_cache.cache_key("Quantum physics")
+    assert response == LLM_RESPONSE
+    assert generate.calls == 1
+    assert LLMResponse.parse_raw(zlib.decompress(fake_redis.values[key])) == (
+        LLM_RESPONSE
+    )
+    assert fake_redis.ttls[key] == llm_cache.LLM_CACHE_TTL
+    assert llm_cache.cache_stats()["hit_ratio"] == 0.5
+
+
+def test_lock_lets_one_worker_generate_on_cold_key():
+    generate = FakeGenerate()
+    key = llm_cache.cache_key("Quantum physics")
+
+    async def run():
+        # Calling __load__ directly bypasses the in-worker single-flight, like
+        # separate workers racing on the same cold key.
+        return await asyncio.gather(
+            *(llm_cache.__load__(key, generate) for _ in range(3))
+        )
+
+    responses = asyncio.run(run())
+
+    assert generate.calls == 1
+    assert responses == [LLM_RESPONSE] * 3
+
+
+def test_without_redis_responses_are_generated(monkeypatch):
+    monkeypatch.setattr(redis_client, "client", None)
+    generate = FakeGenerate()
+
+    asyncio.run(llm_cache.get_or_generate("Quantum physics", generate))
+    asyncio.run(llm_cache.get_or_generate("Quantum physics", generate))
+
+    assert generate.calls == 2
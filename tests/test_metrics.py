@@ -0,0 +1,100 @@
+import asyncio
+
+import httpx
+import pytest
+from app.services import chatgpt, http_client, metrics, search, search_cache
+from langchain.llms.fake import FakeListLLM
+
+from tests.test_chatgpt import LLM_RESPONSE
+
+
+def sample(name: str, **labels) -> float:
+    return metrics.registry.get_sample_value(name, labels) or 0.0
+
+
+@pytest.fixture
+def metrics_token(monkeypatch):
+    from app.routers import stats
+
+    monkeypatch.setattr(stats, "METRICS_TOKEN", "scrape-token")
+    return {"Authorization": "Bearer scrape-token"}
+
+
+@pytest.mark.anyio
+async def test_metrics_are_labelled_by_route_template(metrics_token):
+    from app.main import app
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        await client.get("/prompts/42/contents")
+        response = await client.get("/metrics", headers=metrics_token)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert (
+        'curious_http_request_seconds_count{method="GET",'
+        'route="/prompts/{prompt_id}/contents",status="401"}'
+    ) in body
+    assert "/prompts/42/contents" not in body
+    assert 'curious_http_requests_in_flight{method="GET",route="/metrics"} 1.0' in body
+    assert "curious_llm_cache_hit_ratio" in body
+    assert 'curious_search_cache_lookups_total{result="local_hit"}' in body
+    assert 'curious_db_pool_checkouts_total{pool="async"}' in body
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("path", ["/metrics", "/stats/db"])
+@pytest.mark.parametrize("token", [None, "wrong-token"])
+async def test_metrics_and_stats_require_the_metrics_token(metrics_token, path, token):
+    from app.main import app
+
+    headers = {} if token is None else {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        rejected = await client.get(path, headers=headers)
+        accepted = await client.get(path, headers=metrics_token)
+
+    assert rejected.status_code == 401
+    assert accepted.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_metrics_are_closed_without_a_configured_token():
+    from app.main import app
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get(
+            "/metrics", headers={"Authorization": "Bearer anything"}
+        )
+
+    assert response.status_code == 401
+
+
+def test_search_errors_are_counted_by_source(monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(429)
+
+    monkeypatch.setattr(
+        http_client, "client", httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+    monkeypatch.setattr(search_cache, "local_cache", search_cache.LRUCache(16))
+    monkeypatch.setattr(search, "SEARCH_SOURCES", [("reddit", "reddit-engine")])
+    labels = {"source": "reddit", "error": "HTTPStatusError"}
+    errors = sample("curious_search_errors_total", **labels)
+    calls = sample("curious_search_request_seconds_count", source="reddit")
+
+    assert asyncio.run(search.__search__("physics", "reddit-engine")) == []
+
+    assert sample("curious_search_errors_total", **labels) == errors + 1
+    assert sample("curious_search_request_seconds_count", source="reddit") == calls + 1
+
+
+def test_llm_parse_fallbacks_are_counted(monkeypatch):
+    monkeypatch.setattr(chatgpt, "llm", FakeListLLM(responses=["not json"]))
+    monkeypatch.setattr(chatgpt, "fixing_llm", FakeListLLM(responses=[LLM_RESPONSE]))
+    fallbacks = sample("curious_llm_parse_fallbacks_total")
+    fixes = sample("curious_llm_request_seconds_count", call="fix")
+
+    asyncio.run(chatgpt.async_gpt_json_response("metrics"))
+
+    assert sample("curious_llm_parse_fallbacks_total") == fallbacks + 1
+    assert sample("curious_llm_request_seconds_count", call="fix") == fixes + 1
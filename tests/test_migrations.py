@@ -0,0 +1,101 @@
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, inspect, text
+from app import models
+
+ALEMBIC_INI = Path(__file__).parents[1] / "alembic.ini"
+
+
+@pytest.fixture(scope="function")
+def database_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'migrations.db'}"
+
+
+def alembic_config(database_url: str) -> Config:
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("sqlalchemy.url", database_url)
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def test_migrations_match_models(database_url):
+    command.upgrade(alembic_config(database_url), "head")
+
+    engine = create_engine(database_url)
+    with engine.connect() as connection:
+        diff = compare_metadata(
+            MigrationContext.configure(connection), models.Base.metadata
+        )
+    indexes = {index["name"] for index in inspect(engine).get_indexes("contents")}
+
+    assert diff == []
+    assert indexes == {"ix_contents_canonical_link"}
+
+
+def test_upgrade_merges_duplicate_contents_and_follows(database_url):
+    config = alembic_config(database_url)
+    command.upgrade(config, "0001")
+    engine = create_engine(database_url)
+    with engine.begin() as connection:
+        connection.execute(
+            text("INSERT INTO users (id, username) VALUES (1, 'a'), (2, 'b')")
+        )
+        connection.execute(
+            text(
+                "INSERT INTO contents (id, link) VALUES "
+                "(1, 'https://www.youtube.com/watch?v=abc&utm_source=x'), "
+                "(2, 'https://youtu.be/abc'), "
+                "(3, 'https://reddit.com/r/physics'), "
+                "(4, 'N/A'), "
+                "(5, 'N/A')"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO response_prompts (id, content_id) "
+                "VALUES (1, 1), (2, 2), (3, 3), (4, 4), (5, 5)"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO follows (id, user_id, follow_id) "
+                "VALUES (1, 1, 2), (2, 1, 2), (3, 2, 1)"
+            )
+        )
+
+    command.upgrade(config, "head")
+
+    with engine.connect() as connection:
+        contents = connection.execute(
+            text("SELECT id, canonical_link FROM contents ORDER BY id")
+        ).all()
+        response_content_ids = connection.execute(
+            text("SELECT content_id FROM response_prompts ORDER BY id")
+        ).scalars()
+        follow_ids = connection.execute(
+            text("SELECT id FROM follows ORDER BY id")
+        ).scalars()
+        assert contents == [
+            (1, "https://youtube.com/watch?v=abc"),
+            (3, "https://reddit.com/r/physics"),
+            (4, None),
+            (5, None),
+        ]
+        assert list(response_content_ids) == [1, 1, 3, 4, 5]
+        assert list(follow_ids) == [1, 3]
+        assert connection.execute(
+            text("SELECT follows_count, followers_count FROM users ORDER BY id")
+        ).all() == [(1, 1), (1, 1)]
+
+
+def test_downgrade_to_base(database_url):
+    config = alembic_config(database_url)
+    command.upgrade(config, "head")
+    command.downgrade(config, "base")
+
+    assert inspect(create_engine(database_url)).get_table_names() == ["alembic_version"]
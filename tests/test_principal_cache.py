@@ -0,0 +1,162 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from app import models
+from app.services import auth, principal_cache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def reset_cache(fake_redis, monkeypatch):
+    monkeypatch.setattr(principal_cache, "counters", principal_cache.CacheCounters())
+    principal_cache.local_cache.clear()
+
+
+@pytest.fixture(scope="function")
+async def user(async_db_session):
+    user = models.User(
+        email="ada@example.com",
+        username="ada",
+        full_name="Ada Lovelace",
+        hashed_password="hash",
+    )
+    async_db_session.add(user)
+    await async_db_session.commit()
+    return user
+
+
+def access_token(data: dict) -> str:
+    return auth.create_access_token(data, expires_delta=timedelta(minutes=5))
+
+
+def count_lookups(monkeypatch) -> list:
+    lookups = []
+    get_user_by_id = auth.async_get_user_by_id
+
+    async def counting_get_user_by_id(user_id, db):
+        lookups.append(user_id)
+        return await get_user_by_id(user_id, db=db)
+
+    monkeypatch.setattr(auth, "async_get_user_by_id", counting_get_user_by_id)
+    return lookups
+
+
+async def test_current_user_is_loaded_by_id_once(async_db_session, user, monkeypatch):
+    lookups = count_lookups(monkeypatch)
+    token = access_token({"sub": user.username, "uid": user.id})
+
+    first = await auth.get_current_user(token, async_db_session)
+    second = await auth.get_current_user(token, async_db_session)
+
+    assert first == second
+    assert first.username == "ada"
+    assert lookups == [user.id]
+    assert principal_cache.counters.local_hits == 1
+
+
+async def test_redis_tier_is_shared_across_workers(
+    async_db_session, user, fake_redis, monkeypatch
+):
+    lookups = count_lookups(monkeypatch)
+    token = access_token({"sub": user.username, "uid": user.id})
+
+    await auth.get_current_user(token, async_db_session)
+    # Another worker starts with an empty local cache.
+    principal_cache.local_cache.clear()
+    await auth.get_current_user(token, async_db_session)
+
+    assert principal_cache.cache_key(user.id) in fake_redis.values
+    assert lookups == [user.id]
+    assert principal_cache.counters.redis_hits == 1
+
+
+async def test_tokens_without_user_id_are_still_accepted(async_db_session, user):
+    current_user = await auth.get_current_user(
+        access_token({"sub": user.username}), async_db_session
+    )
+
+    assert current_user.id == user.id
+    assert len(principal_cache.local_cache) == 0
+
+
+async def test_user_update_invalidates_cached_principal(
+    async_db_session, user, fake_redis
+):
+    token = access_token({"sub": user.username, "uid": user.id})
+    await auth.get_current_user(token, async_db_session)
+
+    user.is_active = False
+    await async_db_session.commit()
+    await asyncio.gather(*principal_cache.pending_invalidations)
+
+    assert principal_cache.cache_key(user.id) not in fake_redis.values
+    current_user = await auth.get_current_user(token, async_db_session)
+    assert current_user.is_active is False
+    assert principal_cache.counters.misses == 2
+
+
+async def test_principal_is_invalidated_on_commit_not_flush(
+    async_db_session, user, fake_redis
+):
+    token = access_token({"sub": user.username, "uid": user.id})
+    await auth.get_current_user(token, async_db_session)
+
+    user.is_active = False
+    await async_db_session.flush()
+    await asyncio.gather(*principal_cache.pending_invalidations)
+    assert principal_cache.cache_key(user.id) in fake_redis.values
+
+    await async_db_session.commit()
+    await asyncio.gather(*principal_cache.pending_invalidations)
+    assert principal_cache.cache_key(user.id) not in fake_redis.values
+
+
+async def test_rolled_back_write_keeps_cached_principal(
+    async_db_session, user, fake_redis
+):
+    key = principal_cache.cache_key(user.id)
+    token = access_token({"sub": user.username, "uid": user.id})
+    await auth.get_current_user(token, async_db_session)
+
+    user.full_name = "Countess of Lovelace"
+    await async_db_session.flush()
+    await async_db_session.rollback()
+    await async_db_session.commit()
+
+    assert key in fake_redis.values
+    assert principal_cache.counters.invalidations == 0
+
+
+async def test_user_delete_invalidates_cached_principal(
+    async_db_session, user, fake_redis
+):
+    token = access_token({"sub": user.username, "uid": user.id})
+    await auth.get_current_user(token, async_db_session)
+
+    await async_db_session.delete(user)
+    await async_db_session.commit()
+    await asyncio.gather(*principal_cache.pending_invalidations)
+
+    assert principal_cache.cache_key(user.id) not in fake_redis.values
+
+
+async def test_corrupt_cached_principal_is_reloaded(async_db_session, user, fake_redis):
+    fake_redis.values[principal_cache.cache_key(user.id)] = b"not json"
+    token = access_token({"sub": user.username, "uid": user.id})
+
+    current_user = await auth.get_current_user(token, async_db_session)
+
+    assert current_user.username == "ada"
+    assert principal_cache.counters.redis_errors == 1
+
+
+async def test_unknown_user_is_rejected(async_db_session):
+    with pytest.raises(auth.HTTPException) as exc_info:
+        await auth.get_current_user(
+            access_token({"sub": "ghost", "uid": 42}), async_db_session
+        )
+
+    assert exc_info.value.status_code == 401
+    assert len(principal_cache.local_cache) == 0
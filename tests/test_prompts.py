@@ -0,0 +1,235 @@
+import pytest
+from app import models
+from app.crud import prompts as prompts_crud
+from app.schemas.contents import UserPromptSubjectAndContents
+
+
+def create_prompt_with_contents(
+    db_session,
+    title: str,
+    subjects: int,
+    contents_per_subject: int,
+    user_id: int = 1,
+    is_private: bool = False,
+) -> models.Prompt:
+    prompt = models.Prompt(
+        title=title, keywords="physics", user_id=user_id, is_private=is_private
+    )
+    db_session.add(prompt)
+    db_session.flush()
+    for i in range(subjects):
+        for j in range(contents_per_subject):
+            content = models.Content(
+                title=f"{title} {i}-{j}",
+                link=f"https://example.com/{title}/{i}/{j}",
+                canonical_link=f"https://example.com/{title}/{i}/{j}",
+                snippet="Snippet",
+                long_description="Long Description",
+                image="https://example.com/image.jpg",
+                source="youtube",
+            )
+            db_session.add(content)
+            db_session.flush()
+            db_session.add(
+                models.ResponsePrompt(
+                    prompt_id=prompt.id,
+                    content_id=content.id,
+                    ai_response_subject=f"Subject {i}",
+                    ai_response_description=f"Description {i}",
+                )
+            )
+    db_session.commit()
+    return prompt
+
+
+def test_get_prompt_contents_history(db_session):
+    prompt = create_prompt_with_contents(db_session, "small", 2, 3)
+    # Same subject names in another prompt must not leak into this one.
+    create_prompt_with_contents(db_session, "other", 2, 3)
+
+    history = prompts_crud.get_prompt_contents_history(prompt.id, db_session)
+
+    assert [item["subject"] for item in history] == ["Subject 0", "Subject 1"]
+    assert [item["description"] for item in history] == [
+        "Description 0",
+        "Description 1",
+    ]
+    assert [[c["title"] for c in item["contents"]] for item in history] == [
+        ["small 0-0", "small 0-1", "small 0-2"],
+        ["small 1-0", "small 1-1", "small 1-2"],
+    ]
+
+
+def test_get_prompt_contents_history_query_count_is_constant(db_session, max_queries):
+    small_id = create_prompt_with_contents(db_session, "small", 1, 1).id
+    large_id = create_prompt_with_contents(db_session, "large", 10, 6).id
+    db_session.expire_all()
+
+    with max_queries(2) as small_queries:
+        prompts_crud.get_prompt_contents_history(small_id, db_session)
+    db_session.expire_all()
+    with max_queries(2) as large_queries:
+        prompts_crud.get_prompt_contents_history(large_id, db_session)
+
+    assert small_queries.count == large_queries.count
+
+
+@pytest.fixture(scope="function")
+def feed_users(db_session):
+    for user_id in range(1, 5):
+        db_session.add(
+            models.User(
+                id=user_id,
+                email=f"user{user_id}@example.com",
+                username=f"user{user_id}",
+                full_name=f"User {user_id}",
+            )
+        )
+    db_session.add(models.Follows(user_id=1, follow_id=2))
+    db_session.add(models.Follows(user_id=1, follow_id=3))
+    db_session.commit()
+
+
+def test_get_feed_pages_through_followed_public_prompts(db_session, feed_users):
+    for i in range(5):
+        create_prompt_with_contents(db_session, f"user2-{i}", 2, 2, user_id=2)
+        create_prompt_with_contents(db_session, f"user3-{i}", 1, 4, user_id=3)
+    create_prompt_with_contents(db_session, "private", 1, 1, user_id=2, is_private=True)
+    create_prompt_with_contents(db_session, "not-followed", 1, 1, user_id=4)
+
+    titles = []
+    cursor = None
+    pages = 0
+    while True:
+        feed, cursor = prompts_crud.get_feed(1, db_session, limit=3, cursor=cursor)
+        titles.extend(item["prompt"]["title"] for item in feed)
+        pages += 1
+        for item in feed:
+            assert item["user"]["id"] == item["prompt"]["user_id"]
+            assert len(item["contents"]) == 3
+            # Served without validation, so the dicts must match the schema.
+            assert UserPromptSubjectAndContents(**item).dict() == item
+        if cursor is None:
+            break
+
+    assert pages == 4
+    assert titles == [
+        f"user{user_id}-{i}" for i in reversed(range(5)) for user_id in (3, 2)
+    ]
+
+
+def test_get_feed_uses_one_query(db_session, feed_users, max_queries):
+    for i in range(10):
+        create_prompt_with_contents(db_session, f"user2-{i}", 3, 3, user_id=2)
+    db_session.expire_all()
+
+    with max_queries(1):
+        prompts_crud.get_feed(1, db_session, limit=5)
+
+
+def test_get_prompt_contents_loads_contents_in_one_query(
+    db_session, feed_users, max_queries
+):
+    prompt_id = create_prompt_with_contents(db_session, "large", 2, 3).id
+    db_session.expire_all()
+
+    with max_queries(3):
+        summary = prompts_crud.get_prompt_contents(prompt_id, db_session)
+
+    assert [content.title for content in summary.contents] == [
+        "large 0-0",
+        "large 0-1",
+        "large 0-2",
+    ]
+    assert summary.subject == "Subject 0"
+
+
+@pytest.mark.anyio
+async def test_post_prompts_creates_a_ready_prompt(api_client):
+    response = await api_client.post(
+        "/prompts",
+        json={
+            "title": "What is physics?",
+            "keywords": "physics",
+            "user_id": 1,
+            "is_private": False,
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.json()["title"] == "What is physics?"
+    assert response.json()["status"] == "ready"
+
+
+@pytest.mark.anyio
+async def test_feed_pages_come_in_a_next_cursor_envelope(api_client, api_db):
+    async with api_db() as db:
+        db.add(models.User(id=2, email="user2@example.com", username="user2"))
+        db.add(models.Follows(user_id=1, follow_id=2))
+        await db.commit()
+        for i in range(3):
+            await db.run_sync(
+                lambda session, i=i: create_prompt_with_contents(
+                    session, f"user2-{i}", 1, 1, user_id=2
+                )
+            )
+
+    first = (await api_client.get("/feed", params={"limit": 2})).json()
+    second = (
+        await api_client.get(
+            "/feed", params={"limit": 2, "cursor": first["next_cursor"]}
+        )
+    ).json()
+
+    assert [item["prompt"]["title"] for item in first["items"]] == [
+        "user2-2",
+        "user2-1",
+    ]
+    assert [item["prompt"]["title"] for item in second["items"]] == ["user2-0"]
+    assert second["next_cursor"] is None
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "status, status_code", [("pending", 202), ("failed", 502), ("ready", 200)]
+)
+async def test_prompt_contents_answer_by_enrichment_status(
+    api_client, api_db, status, status_code
+):
+    async with api_db() as db:
+        prompt = models.Prompt(
+            title="What is physics?", keywords="", user_id=1, status=status
+        )
+        db.add(prompt)
+        await db.commit()
+
+    response = await api_client.get(f"/prompts/{prompt.id}/contents")
+
+    assert response.status_code == status_code
+    if status_code != 502:
+        assert response.json() == []
+
+
+@pytest.mark.anyio
+async def test_profile_prompts_load_in_constant_queries(
+    api_client, api_db, max_queries
+):
+    async with api_db() as db:
+        for i, is_private in enumerate([False, True, False, False]):
+            await db.run_sync(
+                lambda session, i=i, is_private=is_private: (
+                    create_prompt_with_contents(
+                        session, f"profile-{i}", 3, 3, is_private=is_private
+                    )
+                )
+            )
+
+    with max_queries(3):
+        response = await api_client.get("/prompts/profile/me")
+
+    assert [item["prompt"]["title"] for item in response.json()] == [
+        "profile-3",
+        "profile-2",
+        "profile-1",
+    ]
+    assert [len(item["contents"]) for item in response.json()] == [3, 3, 3]
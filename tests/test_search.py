@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+from app import models
+from app.schemas.openai_response import Subject
+from app.services import search
+
+
+@pytest.fixture(scope="function")
+async def sample_prompt(async_db_session):
+    prompt = models.Prompt(title="Sample Prompt", keywords="physics", user_id=1)
+    async_db_session.add(prompt)
+    await async_db_session.commit()
+    await async_db_session.refresh(prompt)
+    return prompt
+
+
+def search_item(query: str, search_engine_id: str) -> dict:
+    return {
+        "title": f"{search_engine_id}|{query}",
+        "snippet": "Snippet",
+        "link": f"https://example.com/{search_engine_id}/{query}",
+        "pagemap": {"metatags": [{"og:description": "Long Description"}]},
+    }
+
+
+class FakeSearch:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, query: str, search_engine_id: str):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # Later subjects finish first to check the response order is stable,
+        # 20 ms apart so the order holds on a busy machine.
+        await asyncio.sleep(0.02 * max(1, 13 - len(query)))
+        self.in_flight -= 1
+        return [search_item(query, search_engine_id)]
+
+
+@pytest.mark.anyio
+async def test_search_subjects_runs_searches_concurrently(
+    async_db_session, sample_prompt, monkeypatch
+):
+    fake_search = FakeSearch()
+    monkeypatch.setattr(search, "__search__", fake_search)
+    monkeypatch.setattr(search, "search_limiter", search.SearchLimiter(100, 100))
+    subjects = [
+        Subject(detailed_name="a" * (i + 1), description=f"Description {i}")
+        for i in range(4)
+    ]
+
+    results = await search.search_subjects(
+        sample_prompt, subjects, async_db_session, user_id=1
+    )
+
+    assert fake_search.max_in_flight == 4 * len(search.SEARCH_SOURCES)
+    assert [result["subject"] for result in results] == [
+        subject.detailed_name for subject in subjects
+    ]
+    for result in results:
+        assert [content["title"] for content in result["contents"]] == [
+            f"{engine_id}|physics {result['subject']}"
+            for _, engine_id in search.SEARCH_SOURCES
+        ]
+
+
+@pytest.mark.anyio
+async def test_search_subjects_respects_per_user_limit(
+    async_db_session, sample_prompt, monkeypatch
+):
+    fake_search = FakeSearch()
+    monkeypatch.setattr(search, "__search__", fake_search)
+    monkeypatch.setattr(search, "search_limiter", search.SearchLimiter(10, 2))
+    subjects = [Subject(detailed_name="subject", description="Description")] * 3
+
+    await search.search_subjects(sample_prompt, subjects, async_db_session, user_id=1)
+
+    assert fake_search.max_in_flight == 2
+
+
+def test_search_limiter_respects_global_limit():
+    limiter = search.SearchLimiter(3, 2)
+    in_flight = 0
+    max_in_flight = 0
+
+    async def task(user_id: int):
+        nonlocal in_flight, max_in_flight
+        async with limiter.slot(user_id):
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    async def run():
+        await asyncio.gather(*(task(user_id) for user_id in range(6)))
+
+    asyncio.run(run())
+
+    assert max_in_flight == 3
+
+
+@pytest.mark.anyio
+async def test_stream_subjects_yields_subjects_as_they_complete(
+    async_db_session, sample_prompt, monkeypatch
+):
+    monkeypatch.setattr(search, "__search__", FakeSearch())
+    monkeypatch.setattr(search, "search_limiter", search.SearchLimiter(100, 100))
+    subjects = [
+        Subject(detailed_name="a" * (i + 1), description=f"Description {i}")
+        for i in range(3)
+    ]
+
+    streamed = [
+        result
+        async for result in search.stream_subjects(
+            sample_prompt, subjects, async_db_session, user_id=1
+        )
+    ]
+
+    # Longer queries finish first in FakeSearch.
+    assert [result["subject"] for result in streamed] == ["aaa", "aa", "a"]
+    assert all(
+        len(result["contents"]) == len(search.SEARCH_SOURCES) for result in streamed
+    )
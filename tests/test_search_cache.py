@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+from app.services import redis_client, search_cache
+
+
+class FakeFetch:
+    def __init__(self, items):
+        self.items = items
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if isinstance(self.items, Exception):
+            raise self.items
+        return self.items
+
+
+@pytest.fixture(autouse=True)
+def empty_search_cache(monkeypatch):
+    monkeypatch.setattr(
+        search_cache, "local_cache", search_cache.LRUCache(max_entries=16)
+    )
+    monkeypatch.setattr(search_cache, "counters", search_cache.CacheCounters())
+    monkeypatch.setattr(redis_client, "client", None)
+
+
+def test_cache_key_normalizes_query():
+    assert search_cache.cache_key("yt", "Quantum  Physics ", 2) == (
+        search_cache.cache_key("yt", "quantum physics", 2)
+    )
+    assert search_cache.cache_key("yt", "physics", 2) != (
+        search_cache.cache_key("reddit", "physics", 2)
+    )
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = search_cache.LRUCache(max_entries=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.get("a")
+    cache.set("c", 3, ttl=60)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_lru_cache_expires_entries():
+    cache = search_cache.LRUCache(max_entries=2)
+    cache.set("a", 1, ttl=0)
+    assert cache.get("a") is None
+
+
+def test_concurrent_identical_queries_share_one_fetch():
+    fetch = FakeFetch([{"title": "Title"}])
+
+    async def run():
+        return await asyncio.gather(
+            *(
+                search_cache.get_or_fetch("yt", query, 2, fetch)
+                for query in ["physics", "Physics", " physics "]
+            )
+        )
+
+    results = asyncio.run(run())
+
+    assert fetch.calls == 1
+    assert results == [[{"title": "Title"}]] * 3
+    asyncio.run(search_cache.get_or_fetch("yt", "physics", 2, fetch))
+    assert fetch.calls == 1
+    assert search_cache.counters.local_hits == 1
+
+
+def test_empty_results_are_cached_and_errors_are_not(fake_redis):
+    empty_fetch = FakeFetch([])
+    failing_fetch = FakeFetch(RuntimeError("Quota exceeded"))
+
+    asyncio.run(search_cache.get_or_fetch("yt", "nothing", 2, empty_fetch))
+    asyncio.run(search_cache.get_or_fetch("yt", "nothing", 2, empty_fetch))
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            asyncio.run(search_cache.get_or_fetch("yt", "failing", 2, failing_fetch))
+
+    assert empty_fetch.calls == 1
+    assert failing_fetch.calls == 2
+    assert list(fake_redis.ttls.values()) == [search_cache.SEARCH_CACHE_NEGATIVE_TTL]
+
+
+def test_redis_tier_is_shared_between_workers(fake_redis):
+    fetch = FakeFetch([{"title": "Title"}])
+
+    asyncio.run(search_cache.get_or_fetch("yt", "physics", 2, fetch))
+    search_cache.local_cache.clear()
+    items = asyncio.run(search_cache.get_or_fetch("yt", "physics", 2, fetch))
+
+    assert items == [{"title": "Title"}]
+    assert fetch.calls == 1
+    assert search_cache.counters.redis_hits == 1
+
+
+def test_corrupt_redis_value_is_a_miss(fake_redis):
+    fake_redis.values[search_cache.cache_key("yt", "physics", 2)] = b"not json"
+    fetch = FakeFetch([{"title": "Title"}])
+
+    items = asyncio.run(search_cache.get_or_fetch("yt", "physics", 2, fetch))
+
+    assert items == [{"title": "Title"}]
+    assert fetch.calls == 1
+    assert search_cache.counters.redis_errors == 1
@@ -0,0 +1,161 @@
+import pytest
+from app import models
+from app.services import timeline
+
+pytestmark = [pytest.mark.anyio, pytest.mark.usefixtures("fake_redis")]
+
+
+@pytest.fixture(scope="function")
+async def users(async_db_session):
+    for user_id in range(1, 5):
+        async_db_session.add(
+            models.User(
+                id=user_id,
+                email=f"user{user_id}@example.com",
+                username=f"user{user_id}",
+                full_name=f"User {user_id}",
+            )
+        )
+    async_db_session.add(models.Follows(user_id=1, follow_id=2))
+    await async_db_session.commit()
+
+
+async def create_prompt(async_db_session, title: str, user_id: int) -> models.Prompt:
+    prompt = models.Prompt(title=title, keywords="physics", user_id=user_id)
+    content = models.Content(
+        title=title,
+        link=f"https://example.com/{title}",
+        canonical_link=f"https://example.com/{title}",
+        snippet="Snippet",
+        long_description="Long Description",
+        image="https://example.com/image.jpg",
+        source="youtube",
+    )
+    async_db_session.add_all([prompt, content])
+    await async_db_session.flush()
+    async_db_session.add(
+        models.ResponsePrompt(
+            prompt_id=prompt.id,
+            content_id=content.id,
+            ai_response_subject="Subject",
+            ai_response_description="Description",
+        )
+    )
+    await async_db_session.commit()
+    return prompt
+
+
+async def feed_titles(async_db_session, user_id: int, limit: int = 20, cursor=None):
+    feed, next_cursor = await timeline.get_feed(
+        user_id, async_db_session, limit, cursor
+    )
+    return [item["prompt"]["title"] for item in feed], next_cursor
+
+
+async def test_cold_timeline_is_rebuilt_then_fanned_out_to(
+    async_db_session, users, fake_redis
+):
+    await create_prompt(async_db_session, "first", 2)
+
+    assert await feed_titles(async_db_session, 1) == (["first"], None)
+    assert timeline.timeline_key(1) in fake_redis.zsets
+
+    second = await create_prompt(async_db_session, "second", 2)
+    await timeline.fan_out_prompt(second, async_db_session)
+
+    assert await feed_titles(async_db_session, 1) == (["second", "first"], None)
+    # Users without a timeline yet are left for the rebuild on read.
+    assert timeline.timeline_key(3) not in fake_redis.zsets
+
+
+async def test_capped_timeline_pages_on_from_the_database(
+    async_db_session, users, fake_redis, monkeypatch
+):
+    monkeypatch.setattr(timeline, "TIMELINE_MAX_LENGTH", 3)
+    await feed_titles(async_db_session, 1)
+    for i in range(5):
+        prompt = await create_prompt(async_db_session, f"prompt-{i}", 2)
+        await timeline.fan_out_prompt(prompt, async_db_session)
+
+    first_page, cursor = await feed_titles(async_db_session, 1, limit=2)
+    second_page, cursor = await feed_titles(async_db_session, 1, limit=2, cursor=cursor)
+    third_page, last_cursor = await feed_titles(
+        async_db_session, 1, limit=2, cursor=cursor
+    )
+
+    assert len(fake_redis.zsets[timeline.timeline_key(1)]) == 3
+    assert first_page == ["prompt-4", "prompt-3"]
+    assert second_page == ["prompt-2", "prompt-1"]
+    assert third_page == ["prompt-0"]
+    assert last_cursor is None
+
+
+async def test_empty_timeline_is_rebuilt_once(async_db_session, users, monkeypatch):
+    rebuilds = []
+    rebuild = timeline.__rebuild__
+
+    async def counting_rebuild(user_id, db):
+        rebuilds.append(user_id)
+        await rebuild(user_id, db)
+
+    monkeypatch.setattr(timeline, "__rebuild__", counting_rebuild)
+
+    assert await feed_titles(async_db_session, 1) == ([], None)
+    assert await feed_titles(async_db_session, 1) == ([], None)
+    assert rebuilds == [1]
+
+
+async def test_feed_pages_past_prompts_hidden_since_fan_out(async_db_session, users):
+    await feed_titles(async_db_session, 1)
+    for title in ["old", "hidden"]:
+        prompt = await create_prompt(async_db_session, title, 2)
+        await timeline.fan_out_prompt(prompt, async_db_session)
+    prompt.is_private = True
+    await async_db_session.commit()
+
+    first_page, cursor = await feed_titles(async_db_session, 1, limit=1)
+    second_page, last_cursor = await feed_titles(
+        async_db_session, 1, limit=1, cursor=cursor
+    )
+
+    assert first_page == []
+    assert second_page == ["old"]
+    assert last_cursor is None
+
+
+async def test_follow_backfills_and_unfollow_prunes(async_db_session, users):
+    await create_prompt(async_db_session, "followed", 2)
+    await create_prompt(async_db_session, "new-follow", 3)
+    await feed_titles(async_db_session, 1)
+
+    async_db_session.add(models.Follows(user_id=1, follow_id=3))
+    await async_db_session.commit()
+    await timeline.backfill(1, 3, async_db_session)
+    assert (await feed_titles(async_db_session, 1))[0] == ["new-follow", "followed"]
+
+    await timeline.prune(1, 2, async_db_session)
+    assert (await feed_titles(async_db_session, 1))[0] == ["new-follow"]
+
+
+async def test_celebrity_prompts_are_merged_on_read(
+    async_db_session, users, monkeypatch
+):
+    monkeypatch.setattr(timeline, "TIMELINE_CELEBRITY_FOLLOWERS", 0)
+    await create_prompt(async_db_session, "before", 2)
+    await feed_titles(async_db_session, 1)
+
+    celebrity_prompt = await create_prompt(async_db_session, "celebrity", 2)
+    await timeline.fan_out_prompt(celebrity_prompt, async_db_session)
+
+    assert (await feed_titles(async_db_session, 1))[0] == ["celebrity", "before"]
+
+
+async def test_private_prompt_is_removed(async_db_session, users):
+    prompt = await create_prompt(async_db_session, "private", 2)
+    await feed_titles(async_db_session, 1)
+
+    prompt.is_private = True
+    await async_db_session.commit()
+    await timeline.remove_prompt(prompt, async_db_session)
+
+    assert await feed_titles(async_db_session, 1) == ([], None)
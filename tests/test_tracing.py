@@ -0,0 +1,121 @@
+import asyncio
+import json
+from collections import deque
+
+import httpx
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+from app.services import tracing
+
+pytestmark = pytest.mark.anyio
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture(autouse=True)
+def sampled(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(tracing, "finished", deque())
+
+
+def spans_by_name() -> dict[str, list[tracing.Span]]:
+    spans = {}
+    for span in tracing.finished:
+        spans.setdefault(span.name, []).append(span)
+    return spans
+
+
+async def test_spans_follow_asyncio_tasks():
+    async def work(index: int):
+        with tracing.span("work", index=index):
+            await asyncio.sleep(0)
+
+    with tracing.start_trace("root") as root:
+        await asyncio.gather(work(0), work(1))
+
+    spans = spans_by_name()
+    assert [span.parent_id for span in spans["work"]] == [root.span_id] * 2
+    assert {span.trace_id for span in spans["work"]} == {root.trace_id}
+    assert spans["root"][0].end_ns >= spans["root"][0].start_ns
+
+
+async def test_unsampled_traces_record_nothing(monkeypatch):
+    with tracing.start_trace("root", f"00-{TRACE_ID}-{PARENT_ID}-00") as root:
+        with tracing.span("work") as span:
+            pass
+    assert root is None and span is None
+
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+    with tracing.start_trace("root", f"00-{TRACE_ID}-{PARENT_ID}-01") as root:
+        pass
+    assert root is None
+    assert not tracing.finished
+
+
+async def test_traceparent_header_continues_the_trace():
+    with tracing.start_trace("root", f"00-{TRACE_ID}-{PARENT_ID}-01") as root:
+        pass
+
+    assert root.trace_id == TRACE_ID
+    assert root.parent_id == PARENT_ID
+
+
+async def test_failed_spans_keep_the_error():
+    with pytest.raises(ValueError):
+        with tracing.start_trace("root"):
+
+            @tracing.traced("failing")
+            async def failing():
+                raise ValueError("no subjects")
+
+            await failing()
+
+    assert spans_by_name()["failing"][0].error == "ValueError: no subjects"
+
+
+async def test_sql_statements_are_spans():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+        with tracing.start_trace("root") as root:
+            await connection.execute(text("SELECT   2"))
+    await engine.dispose()
+
+    queries = spans_by_name()["db.query"]
+    assert len(queries) == 1
+    assert queries[0].parent_id == root.span_id
+    assert queries[0].attributes["db.statement"] == "SELECT 2"
+
+
+async def test_flush_appends_otlp_json(monkeypatch, tmp_path):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_FILE", str(path))
+    with tracing.start_trace("root", prompt_id=3):
+        with tracing.span("work", tracing.CLIENT):
+            pass
+
+    await tracing.flush()
+    await tracing.flush()
+
+    [line] = path.read_text().splitlines()
+    spans = json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert [span["name"] for span in spans] == ["work", "root"]
+    assert spans[0]["parentSpanId"] == spans[1]["spanId"]
+    assert spans[0]["kind"] == tracing.CLIENT
+    assert spans[1]["attributes"] == [{"key": "prompt_id", "value": {"intValue": "3"}}]
+    assert not tracing.finished
+
+
+async def test_requests_get_a_root_span():
+    from app.main import app
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/")
+
+    [root] = spans_by_name()["GET /"]
+    assert response.headers["X-Trace-Id"] == root.trace_id
+    assert root.parent_id is None
+    assert root.attributes["http.status_code"] == 200